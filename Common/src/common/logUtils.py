@@ -0,0 +1,93 @@
+"""Logging setup with a background writer and rate limiting of debug records."""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+
+__author__ = "EnriqueMoran"
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s::%(funcName)s - %(message)s'
+
+
+def setup_logging(
+    log_file: str,
+    level="DEBUG",
+    debug_rate: float = 0.0,
+    debug_burst: int = 10,
+) -> logging.handlers.QueueListener:
+    """
+    Configure the root logger to only enqueue records. A QueueListener thread does the stdout and
+    file writes, so threads that log never block on I/O. The message itself is still formatted in
+    the calling thread, when QueueHandler prepares the record.
+
+    :param log_file: Path of the log file, opened in append mode.
+    :param level: Root logger level.
+    :param debug_rate: Max DEBUG records per second for each logging call site, 0 for no limit.
+    :param debug_burst: DEBUG records a call site may log at once before the rate applies.
+    :return: Started listener, stopped at interpreter exit.
+    """
+    formatter = logging.Formatter(LOG_FORMAT)
+    stream_handler = logging.StreamHandler(sys.stdout)
+    file_handler = logging.FileHandler(log_file, mode="a")
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    if debug_rate > 0:
+        queue_handler.addFilter(RateLimitFilter(debug_rate, debug_burst))
+    root = logging.getLogger()
+    root.setLevel(level)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, file_handler,
+                                              respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per logging call site (file and line) for records at or below max_level. Records
+    over the rate are dropped; the next record let through reports how many were. Buckets are not
+    locked, concurrent callers may only make the suppressed count slightly off.
+    """
+
+    def __init__(self, rate: float, burst: int = 10, max_level: int = logging.DEBUG,
+                 clock=time.monotonic) -> None:
+        """
+        :param rate: Records per second allowed for each call site.
+        :param burst: Records a call site may log back to back.
+        """
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        self.clock = clock
+        self._buckets = {}    # (pathname, lineno) -> [tokens, last update, suppressed]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level:
+            return True
+        now = self.clock()
+        key = (record.pathname, record.lineno)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens < 1.0:
+            bucket[0] = tokens
+            bucket[2] += 1
+            return False
+        bucket[0] = tokens - 1.0
+        if bucket[2]:
+            record.msg = f"{record.msg} ({bucket[2]} similar records suppressed)"
+            bucket[2] = 0
+        return True
@@ -0,0 +1,341 @@
+"""Process-wide counters and histograms, served over HTTP in Prometheus text format."""
+
+import abc
+import bisect
+import http.server
+import logging
+import math
+import threading
+import time
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("Metrics")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5)    # Seconds
+LOCK_WAIT_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 0.001, 0.005, 0.01, 0.1)    # Seconds
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric(abc.ABC):
+    """
+    Named family of values, one child per combination of label values. Children are created on
+    first use and never removed, so label values must come from a small fixed set.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    @abc.abstractmethod
+    def _new_child(self):
+        """Return the value holder of one combination of label values."""
+
+    def labels(self, *values):
+        """Return the child for the given label values, in labelnames order."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    @abc.abstractmethod
+    def _samples(self):
+        """Yield (suffix, label names, label values, value) for every sample."""
+
+    def expose(self) -> str:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}",
+                 f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} "
+                         f"{_format_value(value)}")
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """
+    Monotonic total. Unlabelled counters are incremented with inc(), labelled ones with
+    labels(...).inc().
+    """
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._children[()].inc(amount)
+
+    def get(self, *values) -> float:
+        return self.labels(*values).value
+
+    def _samples(self):
+        for values, child in list(self._children.items()):
+            yield "", self.labelnames, values, child.value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)    # Per bucket, last one is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        """Context manager observing the seconds spent in its block."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child: _HistogramChild) -> None:
+        self.child = child
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values in fixed buckets, exposed cumulative as Prometheus expects.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def get_count(self, *values) -> int:
+        return sum(self.labels(*values).counts)
+
+    def _samples(self):
+        bucket_names = self.labelnames + ("le",)
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                yield "_bucket", bucket_names, values + (_format_value(bound),), cumulative
+            yield "_sum", self.labelnames, values, total
+            yield "_count", self.labelnames, values, cumulative
+
+
+class CallbackMetric(_Metric):
+    """
+    Metric read from existing state at scrape time, so it costs nothing between scrapes. Several
+    sources may feed it, each function returning {label values: value}.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 kind: str = "gauge") -> None:
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self._functions = {}
+
+    def _new_child(self) -> None:
+        return None
+
+    def add_source(self, key, function) -> None:
+        """Register function under key, replacing the previous source with the same key."""
+        with self._lock:
+            self._functions[key] = function
+
+    def remove_source(self, key) -> None:
+        with self._lock:
+            self._functions.pop(key, None)
+
+    def _samples(self):
+        with self._lock:
+            functions = list(self._functions.values())
+        for function in functions:
+            for values, value in function().items():
+                yield "", self.labelnames, tuple(values), value
+
+
+class Registry:
+    """
+    Set of metrics by name. Asking twice for the same name returns the same metric, so modules
+    can declare their metrics at import time.
+    """
+
+    def __init__(self) -> None:
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} already registered as {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (),
+                  buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets)
+
+    def callback(self, name: str, documentation: str, labelnames: tuple = (),
+                 kind: str = "gauge") -> CallbackMetric:
+        return self._get_or_create(CallbackMetric, name, documentation, labelnames, kind)
+
+    def get(self, name: str) -> _Metric:
+        return self._metrics[name]
+
+    def expose(self) -> str:
+        """Return every metric in Prometheus text exposition format."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return "\n".join(metric.expose() for metric in metrics) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class TimedLock:
+    """
+    threading.Lock that observes in histogram how long each contended acquisition waited.
+    Uncontended acquisitions are not timed, so they cost a single non-blocking acquire.
+
+    Wrapping an existing lock times only the callers going through the wrapper; hot readers can
+    keep using the bare lock and its C level with statement.
+    """
+
+    __slots__ = ("_acquire", "_release", "_locked", "_histogram")
+
+    def __init__(self, histogram, lock: threading.Lock = None) -> None:
+        if lock is None:
+            lock = threading.Lock()
+        self._acquire = lock.acquire    # Bound once, the with statement is on hot paths
+        self._release = lock.release
+        self._locked = lock.locked
+        self._histogram = histogram
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._acquire(False):
+            return True
+        if not blocking:
+            return False
+        start = time.perf_counter()
+        acquired = self._acquire(True, timeout)
+        self._histogram.observe(time.perf_counter() - start)
+        return acquired
+
+    def release(self) -> None:
+        self._release()
+
+    def locked(self) -> bool:
+        return self._locked()
+
+    def __enter__(self) -> bool:
+        if self._acquire(False):
+            return True
+        return self.acquire()
+
+    def __exit__(self, *exc) -> None:
+        self._release()
+
+
+class _MetricsHandler(http.server.BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def start_http_server(port: int, host: str = "127.0.0.1",
+                      registry: Registry = REGISTRY) -> http.server.ThreadingHTTPServer:
+    """
+    Serve registry on http://host:port/metrics from a daemon thread.
+
+    :param port: TCP port, 0 picks a free one (see server.server_address).
+    :return: The server, stop it with shutdown() and server_close().
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = http.server.ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="MetricsServer", daemon=True)
+    thread.start()
+    logger.info("Serving metrics on http://%s:%d/metrics", *server.server_address[:2])
+    return server
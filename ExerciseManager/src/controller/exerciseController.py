@@ -19,5 +19,8 @@ class ExerciseController:
     def get_exercise_time(self):
         return self.data_model.get_exercise_time()
     
+    def get_fleet_status(self):
+        return self.data_model.get_fleet_status()
+
     def get_exercise_status(self):
         return self.data_model.exercise_manager.get_exercise_status().to_string()
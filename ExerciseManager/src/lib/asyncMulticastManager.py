@@ -0,0 +1,98 @@
+"""asyncio transport for exercise control PDUs."""
+
+import asyncio
+import logging
+import threading
+
+from io import BytesIO
+from opendis.DataOutputStream import DataOutputStream
+
+import lib.multicastManager as multicastManager
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("AsyncMulticastManager")
+
+
+class _PduProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.closed = asyncio.get_running_loop().create_future()    # Done on connection_lost
+
+    def datagram_received(self, data, addr):
+        self.manager.process_datagram(data)
+
+    def error_received(self, exc):
+        # asyncio reports send and receive errors of datagram transports through this callback
+        multicastManager.SOCKET_ERRORS.labels("transport").inc()
+        logger.error("Socket error: %s", exc)
+
+    def connection_lost(self, exc):
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+class AsyncMulticastManager(multicastManager.MulticastManager):
+    """
+    MulticastManager whose socket is served by an asyncio event loop.
+
+    The loop runs in a single background thread (tkinter owns the main one) and is shared by the
+    transport and every coroutine scheduled with run_coroutine, so periodic work does not need a
+    thread of its own. Methods are safe to call from any thread.
+    """
+    def __init__(self, multicast_group="0.0.0.0", multicast_port=3000, multicast_iface='0.0.0.0',
+                 ttl=2):
+        super().__init__(multicast_group, multicast_port, multicast_iface, ttl)
+        self.loop = None
+        self.transport = None
+        self._protocol = None
+        self._loop_thread = None
+
+    def create_connection(self):
+        """Create the socket and start the event loop serving it."""
+        super().create_connection()
+        self.sock.setblocking(False)
+        self.loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._loop_thread.start()
+        self.run_coroutine(self._create_endpoint()).result()
+
+    async def _create_endpoint(self):
+        self.transport, self._protocol = await self.loop.create_datagram_endpoint(
+            lambda: _PduProtocol(self), sock=self.sock)
+
+    async def _close_endpoint(self):
+        self.transport.close()
+        await self._protocol.closed    # The socket is closed once connection_lost ran
+
+    def send_pdu(self, pdu):
+        """Serialize pdu in the calling thread and send it from the event loop."""
+        memory_stream = BytesIO()
+        output_stream = DataOutputStream(memory_stream)
+        pdu.serialize(output_stream)
+        data = memory_stream.getvalue()
+        self.loop.call_soon_threadsafe(self.transport.sendto, data,
+                                       (self.multicast_group, self.multicast_port))
+
+    def start_receiving(self):
+        """Nothing to start, the event loop receives as soon as the connection exists."""
+
+    def run_coroutine(self, coro):
+        """Schedule coro on the event loop, return a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def close(self):
+        """Close the transport and wait for its socket to be closed, then stop the event loop."""
+        if self.loop is None:
+            return
+        if self.transport is not None:
+            self.run_coroutine(self._close_endpoint()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._loop_thread.join()
+        self.loop.close()
+        self.loop = None
+        self.transport = None
+        self._protocol = None
+        self.sock = None
+        logger.info("Event loop stopped")
@@ -0,0 +1,268 @@
+"""Exercise control PDUs retransmitted until every simulator of the fleet acknowledges them."""
+
+import logging
+import threading
+import time
+
+import common.metrics as metrics
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("ControlRequest")
+
+ACKNOWLEDGE_PDU = 15
+ACKNOWLEDGE_START_RESUME = 3    # AcknowledgePdu.acknowledgeFlag values
+ACKNOWLEDGE_STOP_FREEZE = 4
+ABLE_TO_COMPLY = 1    # AcknowledgePdu.responseFlag
+
+FLEET_READY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+RETRANSMISSIONS = metrics.REGISTRY.counter("exercise_pdus_retransmitted_total",
+                                           "Control PDUs sent again to unacknowledged simulators, "
+                                           "by PDU type", ("type",))
+ACKNOWLEDGEMENTS = metrics.REGISTRY.counter("exercise_acknowledgements_total",
+                                            "Acknowledge PDUs received for the pending control "
+                                            "request, by PDU type", ("type",))
+FLEET_READY = metrics.REGISTRY.histogram("exercise_fleet_ready_seconds",
+                                         "Time from the first transmission of a control PDU until "
+                                         "the whole fleet acknowledged it, by PDU type", ("type",),
+                                         buckets=FLEET_READY_BUCKETS)
+
+
+class ControlRequest:
+    """
+    One StartResume or StopFreeze PDU and the simulators that acknowledged it. Simulators are
+    identified by the (site, application, entity) of their Acknowledge PDU.
+    """
+
+    def __init__(self, pdu, expected: int, sent_at: float, retry_interval: float) -> None:
+        """
+        :param expected: Simulators that must acknowledge, 0 if the fleet is unknown.
+        :param sent_at: Clock value of the first transmission.
+        :param retry_interval: Seconds before the first retransmission.
+        """
+        self.pdu = pdu
+        self.request_id = pdu.requestID
+        self.type_name = pdu.__class__.__name__
+        self.expected = expected
+        self.sent_at = sent_at
+        self.transmissions = 1
+        self.retry_interval = retry_interval    # Current backoff interval
+        self.retransmit_at = sent_at + retry_interval    # Clock value of the next transmission
+        self.acknowledged = {}    # Simulator -> seconds from first transmission to its ack
+        self.last_ack_at = None    # Clock value of the latest new acknowledgement
+        self.settled = False    # Unknown fleet, no new simulator acknowledged for a while
+        self.ready_time = None    # Seconds until the whole fleet acknowledged
+        self.given_up = False    # Max transmissions reached before the fleet was complete
+
+    @property
+    def complete(self) -> bool:
+        if self.expected == 0:
+            return self.settled
+        return len(self.acknowledged) >= self.expected
+
+
+class ControlRequestSender:
+    """
+    Send control PDUs with a fresh requestID and send them again, with exponential backoff, until
+    the expected simulators acknowledge or max_transmissions is reached. Retransmissions go to the
+    multicast group like the first one, simulators that already acknowledged answer again and
+    ignore the duplicate. Only the latest request is retransmitted, submitting one supersedes the
+    previous.
+
+    The fleet size is fleet_size if set, otherwise the number of known simulators: those that
+    acknowledged, forgotten once max_missed_requests requests in a row were given up without their
+    ack. While no simulator is known, the fleet is unknown: the request is retransmitted until the
+    first acks arrive, and is complete once settle_time passed without a new simulator
+    acknowledging; the simulators seen by then are the fleet of the next requests.
+
+    Methods are safe to call from any thread. Retransmissions run in a short lived thread per
+    request, or as call_later callbacks when loop is set to the asyncio event loop of the
+    transport.
+    """
+
+    def __init__(self, send, fleet_size: int = 0, retry_interval: float = 0.25,
+                 max_retry_interval: float = 1.0, max_transmissions: int = 10,
+                 settle_time: float = 1.0, max_missed_requests: int = 3, clock=time.monotonic,
+                 loop=None) -> None:
+        """
+        :param send: Function sending a PDU to the multicast group.
+        :param fleet_size: Simulators expected to acknowledge, 0 to learn them from the acks.
+        :param retry_interval: Seconds before the first retransmission, doubled after each one.
+        :param max_retry_interval: Max seconds between retransmissions.
+        :param max_transmissions: Times a PDU is sent before giving up, including the first.
+        :param settle_time: Seconds without a new simulator acknowledging after which a request
+                            to an unknown fleet is complete.
+        :param max_missed_requests: Requests in a row given up without the ack of a known
+                                    simulator after which it is no longer part of the fleet.
+        :param clock: Function returning monotonic seconds.
+        :param loop: asyncio event loop to schedule retransmissions on, None to use threads.
+        """
+        self.send = send
+        self.fleet_size = fleet_size
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self.max_transmissions = max(max_transmissions, 1)
+        self.settle_time = settle_time
+        self.max_missed_requests = max(max_missed_requests, 1)
+        self.clock = clock
+        self.loop = loop
+        self.known = {}    # Simulator -> requests given up in a row without its ack
+        self.request = None    # Latest request
+        self._next_request_id = 1
+        self._condition = threading.Condition()
+        self._thread = None
+        self._timer = None    # asyncio.TimerHandle of the next retransmission check
+
+    def submit(self, pdu) -> ControlRequest:
+        """
+        Number pdu, send it and retransmit it until the fleet acknowledges.
+        """
+        with self._condition:
+            pdu.requestID = self._next_request_id
+            self._next_request_id = self._next_request_id % 0xFFFFFFFF + 1    # 32 bit, never 0
+            request = ControlRequest(pdu, max(self.fleet_size, len(self.known)), self.clock(),
+                                     self.retry_interval)
+            self.request = request
+            self._condition.notify_all()    # Stop retransmitting the previous request
+            timer, self._timer = self._timer, None
+        self.send(pdu)
+        if self.loop is not None:
+            if timer is not None:
+                self.loop.call_soon_threadsafe(timer.cancel)
+            self.loop.call_soon_threadsafe(self._on_timer, request)
+        else:
+            self._thread = threading.Thread(target=self._retransmit, args=(request,),
+                                            daemon=True)
+            self._thread.start()
+        return request
+
+    def _retransmit(self, request: ControlRequest) -> None:
+        with self._condition:
+            delay = self._advance(request)
+            while delay is not None:
+                self._condition.wait(delay)
+                delay = self._advance(request)
+
+    def _on_timer(self, request: ControlRequest) -> None:
+        """Event loop counterpart of _retransmit, rescheduled with call_later until done."""
+        with self._condition:
+            delay = self._advance(request)
+            self._timer = None if delay is None else \
+                self.loop.call_later(delay, self._on_timer, request)
+
+    def _advance(self, request: ControlRequest) -> float:
+        """
+        Send request again if due, settle or give it up. Called with the condition held.
+
+        :return: Seconds until the next check, None once nothing is left to do.
+        """
+        now = self.clock()
+        if self.request is not request or request.complete or request.given_up:
+            return None
+        settle_at = None
+        if request.expected == 0 and request.acknowledged:
+            settle_at = request.last_ack_at + self.settle_time
+            if now >= settle_at:
+                self._settle(request)
+                return None
+        if request.transmissions >= self.max_transmissions:
+            if settle_at is not None:
+                return settle_at - now    # Stragglers had their chances, just wait to settle
+            self._give_up(request)
+            return None
+        if now >= request.retransmit_at:
+            request.transmissions += 1
+            RETRANSMISSIONS.labels(request.type_name).inc()
+            logger.debug("%s %d retransmission %d, %d of %d acknowledged", request.type_name,
+                         request.request_id, request.transmissions - 1,
+                         len(request.acknowledged), request.expected or "?")
+            try:
+                self.send(request.pdu)
+            except OSError as exc:    # Counted by the multicast manager, try again later
+                logger.error("%s %d retransmission failed: %s", request.type_name,
+                             request.request_id, exc)
+            request.retry_interval = min(request.retry_interval * 2, self.max_retry_interval)
+            request.retransmit_at = now + request.retry_interval
+        delay = request.retransmit_at - now
+        return delay if settle_at is None else min(delay, settle_at - now)
+
+    def _settle(self, request: ControlRequest) -> None:
+        request.settled = True
+        request.ready_time = request.last_ack_at - request.sent_at
+        FLEET_READY.labels(request.type_name).observe(request.ready_time)
+        self._condition.notify_all()
+        logger.info("%s %d acknowledged by %d simulators in %.1f ms, none new for %.1f s, "
+                    "%d transmissions", request.type_name, request.request_id,
+                    len(request.acknowledged), request.ready_time * 1000, self.settle_time,
+                    request.transmissions)
+
+    def _give_up(self, request: ControlRequest) -> None:
+        request.given_up = True
+        self._condition.notify_all()
+        if request.expected == 0:
+            logger.warning("%s %d not acknowledged by any simulator after %d transmissions",
+                           request.type_name, request.request_id, request.transmissions)
+            return
+        missing = sorted(set(self.known).difference(request.acknowledged))
+        logger.warning("%s %d not acknowledged by %d of %d simulators after %d transmissions, "
+                       "missing: %s", request.type_name, request.request_id,
+                       request.expected - len(request.acknowledged), request.expected,
+                       request.transmissions, missing or "unknown")
+        for simulator in missing:
+            self.known[simulator] += 1
+            if self.known[simulator] >= self.max_missed_requests:
+                del self.known[simulator]
+                logger.warning("Simulator %s missed %d requests in a row, removed from the fleet",
+                               simulator, self.max_missed_requests)
+
+    def on_acknowledge(self, pdu) -> None:
+        """
+        Record an Acknowledge PDU. Acks of older requests and duplicates are ignored.
+        """
+        simulator = (pdu.originatingEntityID.siteID, pdu.originatingEntityID.applicationID,
+                     pdu.originatingEntityID.entityID)
+        with self._condition:
+            request = self.request
+            if request is None or pdu.requestID != request.request_id or \
+                    simulator in request.acknowledged:
+                return
+            now = self.clock()
+            elapsed = now - request.sent_at
+            request.acknowledged[simulator] = elapsed
+            request.last_ack_at = now
+            self.known[simulator] = 0
+            ACKNOWLEDGEMENTS.labels(request.type_name).inc()
+            if pdu.responseFlag != ABLE_TO_COMPLY:
+                logger.warning("Simulator %s acknowledged %s %d with response %d", simulator,
+                               request.type_name, request.request_id, pdu.responseFlag)
+            if request.complete and request.ready_time is None:
+                request.ready_time = elapsed
+                FLEET_READY.labels(request.type_name).observe(elapsed)
+                self._condition.notify_all()
+                logger.info("%s %d acknowledged by the whole fleet (%d simulators) in %.1f ms, "
+                            "%d transmissions", request.type_name, request.request_id,
+                            len(request.acknowledged), elapsed * 1000, request.transmissions)
+
+    def wait(self, request: ControlRequest, timeout: float = None) -> bool:
+        """
+        Block until request is acknowledged by the fleet, given up or superseded.
+
+        :return: True if the whole fleet acknowledged request.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: request.complete or request.given_up or
+                                     self.request is not request, timeout)
+            return request.complete
+
+    def close(self) -> None:
+        """Stop retransmitting."""
+        with self._condition:
+            self.request = None
+            self._condition.notify_all()
+            timer, self._timer = self._timer, None
+        if timer is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(timer.cancel)
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
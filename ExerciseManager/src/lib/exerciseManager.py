@@ -1,9 +1,10 @@
 """TBD"""
 
 import logging
-import threading
-import time
 
+import common.metrics as metrics
+import lib.controlRequest as controlRequest
+import lib.exerciseClock as exerciseClock
 import lib.multicastManager as multicastManager
 
 from enum import Enum
@@ -14,6 +15,9 @@ __author__ = "EnriqueMoran"
 
 logger = logging.getLogger("ExerciseManager")
 
+PDUS_SENT = metrics.REGISTRY.counter("exercise_pdus_sent_total",
+                                     "Exercise control PDUs sent, by PDU type", ("type",))
+
 class ExerciseStatus(Enum):
     UNINITIALIZED = 0
     RUNNING = 1
@@ -29,15 +33,21 @@ class ExerciseManager():
         self.exercise_id = exercise_id
         self.application_id = application_id
         self.site_id = site_id
-        self.exercise_time = 0
+        self.exercise_clock = exerciseClock.ExerciseClock()
         self.exercise_status = ExerciseStatus.UNINITIALIZED
         self.multicast_manager = multicastManager.MulticastManager()
-        self.time_thread = None
-        self.time_lock = threading.Lock()
+        self.control_sender = controlRequest.ControlRequestSender(self.send_control_pdu)
+        metrics.REGISTRY.callback("exercise_time_seconds", "Exercise time").add_source(
+            "exercise", lambda: {(): self.exercise_time})
+        metrics.REGISTRY.callback("exercise_status",
+                                  "Exercise status: 0 uninitialized, 1 running, 2 paused, "
+                                  "3 terminated").add_source(
+            "exercise", lambda: {(): self.exercise_status.value})
     
-    def __del__(self):
-        if self.time_thread:
-            self.time_thread.join()
+    @property
+    def exercise_time(self) -> float:
+        """Elapsed exercise time in seconds, millisecond resolution or better."""
+        return self.exercise_clock.elapsed()
 
     def start_resume_exercise(self) -> None:
         """TBD"""
@@ -47,20 +57,22 @@ class ExerciseManager():
             pdu.originatingEntityID.applicationID = self.application_id
             pdu.originatingEntityID.siteID = self.site_id
             pdu.protocolFamily = 0
+            if self.exercise_status == ExerciseStatus.PAUSED:
+                self.exercise_clock.resume()
+            else:
+                self.exercise_clock.start()
+            pdu.simulationTime.hour, pdu.simulationTime.timePastHour = \
+                self.exercise_clock.clock_time()
+            pdu.timestamp = self.exercise_clock.dis_timestamp()
             
             logger.info("StartResumePDU sent to %s:%d - exercise_id: %d, application_id: %d, site_id: %d",\
                         self.multicast_manager.multicast_group, self.multicast_manager.multicast_port,\
                         pdu.exerciseID, pdu.originatingEntityID.applicationID,\
                         pdu.originatingEntityID.siteID)
             
-            self.multicast_manager.send_pdu(pdu)
+            self.control_sender.submit(pdu)
 
-            with self.time_lock:
-                if self.exercise_status != ExerciseStatus.PAUSED:
-                    self.exercise_time = 0
-                self.exercise_status = ExerciseStatus.RUNNING
-            self.time_thread = threading.Thread(target=self._time_tick)
-            self.time_thread.start()
+            self.exercise_status = ExerciseStatus.RUNNING
 
 
     def pause_exercise(self) -> None:
@@ -72,19 +84,17 @@ class ExerciseManager():
             pdu.originatingEntityID.siteID = self.site_id
             pdu.reason = 1
             pdu.frozenBehavior = 1
+            self.exercise_clock.pause()
+            pdu.timestamp = self.exercise_clock.dis_timestamp()
 
             logger.info("StopFreezePDU sent to %s:%d - exercise_id: %d, application_id: %d, site_id: %d",\
                         self.multicast_manager.multicast_group, self.multicast_manager.multicast_port,\
                         pdu.exerciseID, pdu.originatingEntityID.applicationID,\
                         pdu.originatingEntityID.siteID)
             
-            self.multicast_manager.send_pdu(pdu)            
+            self.control_sender.submit(pdu)
 
-            with self.time_lock:
-                self.exercise_status = ExerciseStatus.PAUSED
-            if self.time_thread:
-                self.time_thread.join()
-                self.time_thread = None
+            self.exercise_status = ExerciseStatus.PAUSED
 
     def stop_exercise(self) -> None:
         """TBD"""
@@ -95,26 +105,29 @@ class ExerciseManager():
             pdu.originatingEntityID.siteID = self.site_id
             pdu.reason = 2
             pdu.frozenBehavior = 4
+            self.exercise_clock.pause()
+            pdu.timestamp = self.exercise_clock.dis_timestamp()
 
             logger.info("StopFreezePDU sent to %s:%d - exercise_id: %d, application_id: %d, site_id: %d",\
                         self.multicast_manager.multicast_group, self.multicast_manager.multicast_port,\
                         pdu.exerciseID, pdu.originatingEntityID.applicationID,\
                         pdu.originatingEntityID.siteID)
 
-            self.multicast_manager.send_pdu(pdu)
+            self.control_sender.submit(pdu)
 
-            with self.time_lock:
-                self.exercise_status = ExerciseStatus.TERMINATED
-            if self.time_thread:
-                self.time_thread.join()
-                self.time_thread = None
-    
-    def _time_tick(self) -> None:
-        """Increase exercise time every second."""
-        while self.exercise_status == ExerciseStatus.RUNNING:
-            with self.time_lock:
-                self.exercise_time += 1
-            time.sleep(1)
+            self.exercise_status = ExerciseStatus.TERMINATED
     
+    def send_control_pdu(self, pdu) -> None:
+        """Send a control PDU to the multicast group, the first time or again."""
+        self.multicast_manager.send_pdu(pdu)
+        PDUS_SENT.labels(pdu.__class__.__name__).inc()
+
+    def on_pdu_received(self, pdu) -> None:
+        """Hand Acknowledge PDUs addressed to this exercise manager to the control sender."""
+        if pdu.pduType == controlRequest.ACKNOWLEDGE_PDU and pdu.exerciseID == self.exercise_id \
+                and pdu.receivingEntityID.siteID == self.site_id \
+                and pdu.receivingEntityID.applicationID == self.application_id:
+            self.control_sender.on_acknowledge(pdu)
+
     def get_exercise_status(self) -> ExerciseStatus:
         return self.exercise_status
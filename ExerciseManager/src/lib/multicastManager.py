@@ -1,9 +1,25 @@
 """TBD"""
 
+import logging
 import socket
+import struct
+import threading
 
 from io import BytesIO
 from opendis.DataOutputStream import DataOutputStream
+from opendis.PduFactory import createPdu
+
+import common.metrics as metrics
+
+logger = logging.getLogger("MulticastManager")
+
+MAX_DATAGRAM_SIZE = 8192    # DIS PDUs are limited to 8192 bytes
+
+SOCKET_ERRORS = metrics.REGISTRY.counter("socket_errors_total", "Socket errors, by operation",
+                                         ("operation",))
+PDUS_UNDECODABLE = metrics.REGISTRY.counter("dis_pdus_undecodable_total",
+                                            "Datagrams of unknown PDU type or too short for their "
+                                            "type")
 
 
 class MulticastManager:
@@ -15,14 +31,20 @@ class MulticastManager:
         self.multicast_iface = multicast_iface
         self.ttl = ttl
         self.sock = None
+        self.listeners = []
+        self.receive_thread = None
 
     def create_connection(self):
-        """TBD"""
+        """
+        Create the socket. It is bound to an ephemeral port, simulators send their replies
+        (Acknowledge PDUs) to it.
+        """
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, self.ttl)
         # self.sock.setsockopt(socket.SOL_SOCKET, socket.IP_MULTICAST_TTL, self.ttl)
         self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
                               socket.inet_aton(self.multicast_iface))
+        self.sock.bind(("", 0))
 
     def send_pdu(self, pdu):
         """TBD"""
@@ -30,4 +52,60 @@ class MulticastManager:
         output_stream = DataOutputStream(memory_stream)
         pdu.serialize(output_stream)
         data = memory_stream.getvalue()
-        self.sock.sendto(data, (self.multicast_group, self.multicast_port))
+        try:
+            self.sock.sendto(data, (self.multicast_group, self.multicast_port))
+        except OSError:
+            SOCKET_ERRORS.labels("send").inc()
+            raise
+
+    def add_listener(self, listener):
+        """Call listener.on_pdu_received(pdu) for every PDU received on the socket."""
+        self.listeners.append(listener)
+
+    def start_receiving(self):
+        """Receive replies in a background thread until close is called."""
+        self.receive_thread = threading.Thread(target=self.receive_pdu, args=(self.sock,),
+                                               daemon=True)
+        self.receive_thread.start()
+
+    def receive_pdu(self, sock):
+        """Decode datagrams received on sock and hand them to the listeners."""
+        while True:
+            try:
+                data = sock.recv(MAX_DATAGRAM_SIZE)
+            except OSError as exc:
+                if self.sock is not sock:    # Closed
+                    return
+                SOCKET_ERRORS.labels("receive").inc()
+                logger.error("Socket error: %s", exc)
+                continue
+            if not data and self.sock is not sock:    # Woken up by shutdown
+                return
+            self.process_datagram(data)
+
+    def process_datagram(self, data):
+        """Decode one datagram and hand the PDU to the listeners, count it if undecodable."""
+        try:
+            pdu = createPdu(data)    # None if the PDU type has no decoder
+        except struct.error:    # Shorter than its type requires
+            pdu = None
+        if pdu is None:
+            PDUS_UNDECODABLE.inc()
+            logger.debug("Undecodable datagram of %d bytes", len(data))
+            return
+        for listener in self.listeners:
+            listener.on_pdu_received(pdu)
+
+    def close(self):
+        """TBD"""
+        sock, self.sock = self.sock, None
+        if sock:
+            if self.receive_thread is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)    # Wake up the receive thread
+                except OSError:
+                    pass
+            sock.close()
+        if self.receive_thread is not None:
+            self.receive_thread.join()
+            self.receive_thread = None
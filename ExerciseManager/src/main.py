@@ -1,25 +1,20 @@
 """TBD"""
 import logging
 import os
-import sys
 
 import tkinter as tk
 import controller.exerciseController as Controller
 import model.exerciseDataModel as Model
 import view.exerciseView as View
+import common.logUtils as logUtils
 
 __author__ = "EnriqueMoran"
 
 log_dir = os.environ.get("LOG_DIR", os.path.join(os.path.dirname(__file__), "logs"))
 os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    format='%(asctime)s - %(levelname)s - %(name)s::%(funcName)s - %(message)s',
-    level=os.environ.get("LOGLEVEL", "DEBUG"),
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(os.path.join(log_dir, "exercisemanager.log"), mode="a")
-    ],
-)
+logUtils.setup_logging(os.path.join(log_dir, "exercisemanager.log"),
+                       level=os.environ.get("LOGLEVEL", "DEBUG"),
+                       debug_rate=float(os.environ.get("LOG_DEBUG_RATE", 20)))    # Per call site
 
 logger = logging.getLogger("Main")
 
@@ -34,6 +29,7 @@ class MainApp:
     
     def run(self):
         self.view.run()
+        self.model.close()
 
 if __name__ == "__main__":
     app = MainApp()
@@ -1,6 +1,8 @@
 import configparser
 import logging
 
+import common.metrics as metrics
+import lib.asyncMulticastManager as asyncMulticastManager
 import lib.multicastManager as multicastManager
 import lib.exerciseManager as exerciseManager
 
@@ -15,7 +17,17 @@ class ExerciseDataModel:
         self.multicast_port = 3000
         self.multicast_iface = '0.0.0.0'
         self.ttl = 1
+        self.transport = "threaded"    # threaded or asyncio
         self.exercise_manager = None
+        self.metrics_port = 0    # Prometheus endpoint port, 0 disables it
+        self.metrics_host = '127.0.0.1'
+        self.metrics_server = None
+        self.fleet_size = 0    # Simulators expected to acknowledge control PDUs, 0 to learn them
+        self.retry_interval = 0.25
+        self.max_retry_interval = 1.0
+        self.max_transmissions = 10
+        self.settle_time = 1.0
+        self.max_missed_requests = 3
         self.initialize()
     
     def read_config(self):
@@ -31,6 +43,19 @@ class ExerciseDataModel:
         self.multicast_port = int(config.get("CONNECTION", 'multicast_port'))
         self.multicast_iface = str(config.get("CONNECTION", 'multicast_iface'))
         self.ttl = int(config.get("CONNECTION", 'ttl'))
+        self.transport = str(config.get("CONNECTION", 'transport', fallback="threaded"))
+
+        self.metrics_port = config.getint("METRICS", 'port', fallback=0)
+        self.metrics_host = config.get("METRICS", 'host', fallback='127.0.0.1')
+
+        self.fleet_size = config.getint("ACKNOWLEDGE", 'fleet_size', fallback=0)
+        self.retry_interval = config.getfloat("ACKNOWLEDGE", 'retry_interval', fallback=0.25)
+        self.max_retry_interval = config.getfloat("ACKNOWLEDGE", 'max_retry_interval',
+                                                  fallback=1.0)
+        self.max_transmissions = config.getint("ACKNOWLEDGE", 'max_transmissions', fallback=10)
+        self.settle_time = config.getfloat("ACKNOWLEDGE", 'settle_time', fallback=1.0)
+        self.max_missed_requests = config.getint("ACKNOWLEDGE", 'max_missed_requests',
+                                                 fallback=3)
     
     def initialize(self):
         """TBD"""
@@ -38,13 +63,36 @@ class ExerciseDataModel:
         self.exercise_manager = exerciseManager.ExerciseManager(self.exercise_id,
                                                                   self.application_id,
                                                                   self.site_id)
-        multicast_manager = multicastManager.MulticastManager(self.multicast_group,
-                                                                self.multicast_port,
-                                                                self.multicast_iface,
-                                                                self.ttl)
+        if self.transport == "asyncio":
+            manager_class = asyncMulticastManager.AsyncMulticastManager
+        else:
+            manager_class = multicastManager.MulticastManager
+        multicast_manager = manager_class(self.multicast_group, self.multicast_port,
+                                          self.multicast_iface, self.ttl)
         self.exercise_manager.multicast_manager = multicast_manager
         self.exercise_manager.multicast_manager.create_connection()
+        multicast_manager.add_listener(self.exercise_manager)
+        multicast_manager.start_receiving()
+        control_sender = self.exercise_manager.control_sender
+        control_sender.fleet_size = self.fleet_size
+        control_sender.retry_interval = self.retry_interval
+        control_sender.max_retry_interval = self.max_retry_interval
+        control_sender.max_transmissions = self.max_transmissions
+        control_sender.settle_time = self.settle_time
+        control_sender.max_missed_requests = self.max_missed_requests
+        if self.transport == "asyncio":
+            control_sender.loop = multicast_manager.loop    # Retransmit with call_later
+        if self.metrics_port:
+            self.metrics_server = metrics.start_http_server(self.metrics_port, self.metrics_host)
     
+    def close(self):
+        """TBD"""
+        self.exercise_manager.control_sender.close()
+        self.exercise_manager.multicast_manager.close()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+
     def start_exercise(self):
         """TBD"""
         self.exercise_manager.start_resume_exercise()
@@ -62,8 +110,22 @@ class ExerciseDataModel:
         self.exercise_manager.stop_exercise()
     
     def get_exercise_time(self):
-        milliseconds = self.exercise_manager.exercise_time * 1000
-        seconds,_ = divmod(milliseconds, 1000)
+        milliseconds = self.exercise_manager.exercise_clock.elapsed_ms()
+        seconds, milliseconds = divmod(milliseconds, 1000)
         minutes, seconds = divmod(seconds, 60)
         hours, minutes = divmod(minutes, 60)
-        return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}.{milliseconds:03d}"
+
+    def get_fleet_status(self):
+        """Simulators that acknowledged the last control PDU, and the time the fleet took."""
+        request = self.exercise_manager.control_sender.request
+        if request is None:
+            return "-"
+        acknowledged = len(request.acknowledged)
+        expected = max(request.expected, acknowledged) if request.expected else "?"
+        status = f"{acknowledged}/{expected}"
+        if request.ready_time is not None:
+            status += f" in {request.ready_time * 1000:.0f} ms"
+        elif request.given_up:
+            status += " (gave up)"
+        return status
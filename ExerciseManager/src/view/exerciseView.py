@@ -27,6 +27,12 @@ class ExerciseView:
         self.time_label = ttk.Label(self.time_frame, text="Exercise time: ")
         self.time_label.pack(side=tk.LEFT)
 
+        self.fleet_frame = ttk.Frame(self.info_frame, padding=20)
+        self.fleet_frame.pack(side=tk.LEFT, pady=20)
+
+        self.fleet_label = ttk.Label(self.fleet_frame, text="Fleet acknowledged: ")
+        self.fleet_label.pack(side=tk.LEFT)
+
     def set_controller(self, controller):
         self.controller = controller
 
@@ -39,6 +45,9 @@ class ExerciseView:
         self.exercise_time_label = ttk.Label(self.time_frame, text=self.controller.get_exercise_time(), width=15)
         self.exercise_time_label.pack(side=tk.LEFT)
 
+        self.fleet_status_label = ttk.Label(self.fleet_frame, text=self.controller.get_fleet_status(), width=15)
+        self.fleet_status_label.pack(side=tk.LEFT)
+
         self.start_btn = ttk.Button(self.btn_frame, text="Start exercise", command=self.on_start_exercise_btn)
         self.start_btn.configure(state='normal')
         self.start_btn.pack(side=tk.LEFT, padx=10)
@@ -58,6 +67,7 @@ class ExerciseView:
     def update_data(self):
         self.exercise_status_label.config(text=self.controller.get_exercise_status(), width=15)
         self.exercise_time_label.config(text=self.controller.get_exercise_time(), width=15)
+        self.fleet_status_label.config(text=self.controller.get_fleet_status(), width=15)
         self.root.after(100, self.update_data)
     
     def on_start_exercise_btn(self):
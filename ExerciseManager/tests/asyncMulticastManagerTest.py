@@ -0,0 +1,87 @@
+import socket
+import threading
+import unittest
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import AcknowledgePdu, StartResumePdu
+from opendis.PduFactory import createPdu
+
+import lib.multicastManager as multicastManager
+from lib.asyncMulticastManager import AsyncMulticastManager
+
+
+class Listener:
+    def __init__(self):
+        self.pdus = []
+        self.received = threading.Event()
+
+    def on_pdu_received(self, pdu):
+        self.pdus.append(pdu)
+        self.received.set()
+
+
+class TestAsyncMulticastManager(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_loopback_round_trip(self):
+        simulator = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        simulator.bind(("127.0.0.1", 0))
+        simulator.settimeout(2.0)
+        manager = AsyncMulticastManager("127.0.0.1", simulator.getsockname()[1])
+        try:
+            manager.create_connection()
+            listener = Listener()
+            manager.add_listener(listener)
+
+            start = StartResumePdu()
+            start.requestID = 9
+            manager.send_pdu(start)
+            data, address = simulator.recvfrom(8192)
+            self.assertEqual(createPdu(data).requestID, 9)
+
+            ack = AcknowledgePdu()
+            ack.requestID = 9
+            memory_stream = BytesIO()
+            ack.serialize(DataOutputStream(memory_stream))
+            simulator.sendto(memory_stream.getvalue(), ("127.0.0.1", address[1]))
+            self.assertTrue(listener.received.wait(2.0))
+            self.assertIsInstance(listener.pdus[0], AcknowledgePdu)
+            self.assertEqual(listener.pdus[0].requestID, 9)
+
+            errors = multicastManager.SOCKET_ERRORS.get("transport")
+            with self.assertLogs("AsyncMulticastManager", "ERROR"):
+                manager.run_coroutine(self._error_received(manager)).result(2.0)
+            self.assertEqual(multicastManager.SOCKET_ERRORS.get("transport"), errors + 1)
+
+            sock = manager.sock
+            manager.close()
+            self.assertEqual(sock.fileno(), -1)    # Closed before close returns
+            self.assertIsNone(manager.loop)
+            manager.close()    # Closing twice is harmless
+        finally:
+            manager.close()
+            simulator.close()
+
+    def test_undecodable_datagram(self):
+        manager = multicastManager.MulticastManager()
+        listener = Listener()
+        manager.add_listener(listener)
+        ack = AcknowledgePdu()
+        memory_stream = BytesIO()
+        ack.serialize(DataOutputStream(memory_stream))
+        data = memory_stream.getvalue()
+
+        undecodable = multicastManager.PDUS_UNDECODABLE.get()
+        manager.process_datagram(data[:16])    # Truncated body
+        manager.process_datagram(data[:2] + bytes([255]) + data[3:])    # Unknown PDU type
+        self.assertEqual(multicastManager.PDUS_UNDECODABLE.get(), undecodable + 2)
+        self.assertEqual(listener.pdus, [])
+        manager.process_datagram(data)
+        self.assertIsInstance(listener.pdus[0], AcknowledgePdu)
+
+    @staticmethod
+    async def _error_received(manager):
+        manager._protocol.error_received(OSError("ICMP port unreachable"))
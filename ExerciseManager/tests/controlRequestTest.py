@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import random
+import unittest
+
+from opendis.dis7 import AcknowledgePdu, StartResumePdu
+
+import lib.controlRequest as controlRequest
+from lib.exerciseManager import ExerciseManager
+
+from fakeClock import FakeClock
+
+
+class TimerHandle:
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeLoop:
+    """Event loop stand-in running callbacks in due order as the fake clock is advanced."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._timers = []
+        self._order = itertools.count()    # Callbacks due at the same time run in call order
+
+    def call_later(self, delay, callback, *args):
+        handle = TimerHandle()
+        heapq.heappush(self._timers, (self.clock.now + delay, next(self._order), handle, callback,
+                                      args))
+        return handle
+
+    def call_soon_threadsafe(self, callback, *args):
+        return self.call_later(0.0, callback, *args)
+
+    def is_closed(self):
+        return False
+
+    def run_until(self, end):
+        while self._timers and self._timers[0][0] <= end:
+            due, _, handle, callback, args = heapq.heappop(self._timers)
+            self.clock.now = max(self.clock.now, due)
+            if not handle.cancelled:
+                callback(*args)
+        self.clock.now = max(self.clock.now, end)
+
+
+class FakeNetwork:
+    """
+    Multicast manager stand-in: every control PDU sent reaches the simulators, which answer 10 ms
+    later. Transmissions and acknowledgements are lost with the given probability.
+    """
+
+    def __init__(self, loop, manager, simulators, loss=0.0, seed=3):
+        self.loop = loop
+        self.manager = manager
+        self.simulators = simulators    # Entity IDs of the simulators
+        self.loss = loss
+        self.rng = random.Random(seed)
+        self.sent = []
+        self.multicast_group = "127.0.0.1"
+        self.multicast_port = 3000
+
+    def send_pdu(self, pdu):
+        self.sent.append(pdu.requestID)
+        for entity_id in self.simulators:
+            if self.rng.random() >= self.loss and self.rng.random() >= self.loss:
+                self.loop.call_later(0.01, self.manager.on_pdu_received,
+                                     self.acknowledge(pdu, entity_id))
+
+    def acknowledge(self, pdu, entity_id, site_id=None):
+        ack = AcknowledgePdu()
+        ack.exerciseID = self.manager.exercise_id
+        ack.originatingEntityID.siteID = ack.originatingEntityID.applicationID = 1
+        ack.originatingEntityID.entityID = entity_id
+        ack.receivingEntityID.siteID = self.manager.site_id if site_id is None else site_id
+        ack.receivingEntityID.applicationID = self.manager.application_id
+        ack.requestID = pdu.requestID
+        ack.acknowledgeFlag = controlRequest.ACKNOWLEDGE_START_RESUME
+        ack.responseFlag = controlRequest.ABLE_TO_COMPLY
+        return ack
+
+
+class TestControlRequest(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def _exercise_manager(self, simulators, loss=0.0, **options):
+        """ExerciseManager whose control sender runs on a fake clock and event loop."""
+        clock = FakeClock(100.0)
+        loop = FakeLoop(clock)
+        manager = ExerciseManager(exercise_id=1, application_id=2, site_id=3)
+        network = FakeNetwork(loop, manager, simulators, loss)
+        manager.multicast_manager = network
+        sender = manager.control_sender
+        sender.clock = clock
+        sender.loop = loop
+        for name, value in options.items():
+            setattr(sender, name, value)
+        return manager, network, loop
+
+    def test_unknown_fleet(self):
+        manager, network, loop = self._exercise_manager([], settle_time=1.0)
+        sender = manager.control_sender
+        manager.start_resume_exercise()
+        request = sender.request
+        self.assertEqual(request.expected, 0)
+
+        loop.run_until(100.8)    # No simulator up yet, keeps retransmitting
+        self.assertEqual(len(network.sent), 3)    # At 0, 0.25 and 0.75 s
+        network.simulators = [1, 2]
+        loop.run_until(101.8)
+        self.assertEqual(len(network.sent), 4)    # At 1.75 s, interval capped to 1 s
+        self.assertEqual(len(request.acknowledged), 2)
+        self.assertFalse(request.complete)    # Settle window still open
+
+        pdu = request.pdu
+        manager.on_pdu_received(network.acknowledge(pdu, 9, site_id=4))    # To another manager
+        loop.clock.now = 102.2
+        manager.on_pdu_received(network.acknowledge(pdu, 3))    # Late simulator restarts window
+        loop.run_until(103.1)
+        self.assertFalse(request.complete)
+        loop.run_until(103.3)
+        self.assertTrue(request.complete)
+        self.assertAlmostEqual(request.ready_time, 2.2)
+        self.assertEqual(sorted(request.acknowledged), [(1, 1, 1), (1, 1, 2), (1, 1, 3)])
+        sent = len(network.sent)
+        loop.run_until(110.0)
+        self.assertEqual(len(network.sent), sent)    # Settled, no more retransmissions
+
+        manager.pause_exercise()    # The fleet is known from now on
+        self.assertEqual(sender.request.expected, 3)
+
+    def test_unknown_fleet_gives_up(self):
+        manager, network, loop = self._exercise_manager([], max_transmissions=3)
+        manager.start_resume_exercise()
+        with self.assertLogs("ControlRequest", "WARNING"):
+            loop.run_until(110.0)
+        self.assertTrue(manager.control_sender.request.given_up)
+        self.assertEqual(len(network.sent), 3)
+
+    def test_departed_simulator_expires(self):
+        manager, network, loop = self._exercise_manager([1, 2, 3], max_transmissions=3,
+                                                        max_missed_requests=2)
+        sender = manager.control_sender
+        manager.start_resume_exercise()
+        loop.run_until(110.0)
+        self.assertTrue(sender.request.complete)
+        self.assertEqual(len(sender.known), 3)
+
+        network.simulators = [1, 2]    # Simulator 3 left
+        for submit, end in ((manager.pause_exercise, 120.0),
+                            (manager.start_resume_exercise, 130.0)):
+            submit()
+            self.assertEqual(sender.request.expected, 3)
+            with self.assertLogs("ControlRequest", "WARNING"):
+                loop.run_until(end)
+            self.assertTrue(sender.request.given_up)
+        self.assertEqual(sorted(sender.known), [(1, 1, 1), (1, 1, 2)])
+
+        manager.pause_exercise()
+        self.assertEqual(sender.request.expected, 2)
+        loop.run_until(140.0)
+        self.assertTrue(sender.request.complete)
+
+    def test_lossy_fleet_converges(self):
+        simulators = list(range(1, 13))
+        manager, network, loop = self._exercise_manager(simulators, loss=0.3, fleet_size=12,
+                                                        max_transmissions=20)
+        retransmissions = controlRequest.RETRANSMISSIONS.get("StartResumePdu")
+        manager.start_resume_exercise()
+        request = manager.control_sender.request
+        loop.run_until(120.0)
+
+        self.assertTrue(request.complete)
+        self.assertFalse(request.given_up)
+        self.assertEqual(len(request.acknowledged), 12)
+        self.assertGreater(request.transmissions, 1)
+        self.assertEqual(len(network.sent), request.transmissions)
+        self.assertEqual(set(network.sent), {request.request_id})    # Same requestID every time
+        self.assertEqual(controlRequest.RETRANSMISSIONS.get("StartResumePdu"),
+                         retransmissions + request.transmissions - 1)
+        self.assertEqual(request.ready_time, max(request.acknowledged.values()))
+
+    def test_retransmission_thread(self):
+        acknowledged = []
+        sender = None
+
+        def send(pdu):
+            if sender.request.transmissions == 2:    # The first transmission is lost
+                ack = AcknowledgePdu()
+                ack.originatingEntityID.entityID = 1
+                ack.requestID = pdu.requestID
+                ack.responseFlag = controlRequest.ABLE_TO_COMPLY
+                sender.on_acknowledge(ack)
+                acknowledged.append(pdu.requestID)
+
+        sender = controlRequest.ControlRequestSender(send, fleet_size=1, retry_interval=0.01)
+        try:
+            request = sender.submit(StartResumePdu())
+            self.assertTrue(sender.wait(request, 2.0))
+            self.assertEqual(acknowledged, [request.request_id])
+            self.assertEqual(request.transmissions, 2)
+        finally:
+            sender.close()
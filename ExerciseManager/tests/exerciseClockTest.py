@@ -0,0 +1,59 @@
+import unittest
+
+from lib.exerciseClock import DIS_TIME_UNITS_PER_HOUR, ExerciseClock
+
+from fakeClock import FakeClock
+
+SECOND_NS = 1_000_000_000
+
+
+class TestExerciseClock(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.clock = FakeClock(123 * SECOND_NS)    # Monotonic clocks do not start at zero
+
+    def test_start_pause_resume_stop(self):
+        exercise_clock = ExerciseClock(self.clock)
+        self.assertFalse(exercise_clock.running)
+        self.assertEqual(exercise_clock.elapsed_ns(), 0)
+
+        exercise_clock.start()
+        self.clock.now += 10 * SECOND_NS
+        self.assertTrue(exercise_clock.running)
+        self.assertEqual(exercise_clock.elapsed_ms(), 10_000)
+
+        exercise_clock.pause()
+        self.clock.now += 60 * SECOND_NS    # Frozen time is not counted
+        self.assertFalse(exercise_clock.running)
+        self.assertEqual(exercise_clock.elapsed(), 10.0)
+        exercise_clock.pause()    # Pausing twice changes nothing
+        self.assertEqual(exercise_clock.elapsed(), 10.0)
+
+        exercise_clock.resume()
+        self.clock.now += 5 * SECOND_NS
+        exercise_clock.resume()    # Already running, must not restart the current run
+        self.clock.now += 5 * SECOND_NS
+        self.assertEqual(exercise_clock.elapsed(), 20.0)
+
+        exercise_clock.start()    # Stop and start again begins from zero
+        self.assertEqual(exercise_clock.elapsed_ns(), 0)
+        self.clock.now += 1_500_000
+        self.assertEqual(exercise_clock.elapsed_ms(), 1)
+
+    def test_no_drift(self):
+        exercise_clock = ExerciseClock(self.clock)
+        exercise_clock.start()
+        for _ in range(100_000):    # Odd nanosecond steps, float seconds would round each time
+            self.clock.now += 16_666_667
+            exercise_clock.pause()
+            self.clock.now += 3
+            exercise_clock.resume()
+        self.assertEqual(exercise_clock.elapsed_ns(), 100_000 * 16_666_667)
+
+    def test_dis_time(self):
+        exercise_clock = ExerciseClock(self.clock)
+        exercise_clock.start()
+        self.clock.now += (2 * 3600 + 1800) * SECOND_NS    # 2 h 30 min
+        self.assertEqual(exercise_clock.clock_time(), (2, DIS_TIME_UNITS_PER_HOUR // 2))
+        self.assertEqual(exercise_clock.dis_timestamp(), DIS_TIME_UNITS_PER_HOUR)
+        self.assertEqual(exercise_clock.dis_timestamp() & 1, 0)    # Relative timestamp
@@ -0,0 +1,14 @@
+"""Manual clock for the tests of time dependent code."""
+
+
+class FakeClock:
+    """
+    Clock that only moves when a test sets or advances now, in the unit of the clock it replaces
+    (seconds for time.monotonic, nanoseconds for time.monotonic_ns).
+    """
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
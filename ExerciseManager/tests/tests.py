@@ -0,0 +1,35 @@
+import asyncMulticastManagerTest
+import controlRequestTest
+import exerciseClockTest
+
+
+def run_async_multicast_manager_tests():
+    test = asyncMulticastManagerTest.TestAsyncMulticastManager()
+    test.test_loopback_round_trip()
+    print("asyncio transport loopback round trip tests passed. OK")
+    test.test_undecodable_datagram()
+    print("Undecodable datagram tests passed. OK")
+
+
+def run_exercise_clock_tests():
+    test = exerciseClockTest.TestExerciseClock()
+    test.test_start_pause_resume_stop()
+    print("Exercise clock start/pause/resume tests passed. OK")
+    test.test_no_drift()
+    print("Exercise clock drift tests passed. OK")
+    test.test_dis_time()
+    print("Exercise clock DIS time tests passed. OK")
+
+
+def run_control_request_tests():
+    test = controlRequestTest.TestControlRequest()
+    test.test_unknown_fleet()
+    print("Unknown fleet retransmission and settle tests passed. OK")
+    test.test_unknown_fleet_gives_up()
+    print("Unknown fleet give up tests passed. OK")
+    test.test_departed_simulator_expires()
+    print("Departed simulator expiry tests passed. OK")
+    test.test_lossy_fleet_converges()
+    print("Lossy fleet acknowledge tests passed. OK")
+    test.test_retransmission_thread()
+    print("Threaded retransmission tests passed. OK")
@@ -0,0 +1,299 @@
+"""Micro-benchmarks of the simulator hot paths, compared against a stored baseline.
+
+Each benchmark times one call of a hot path (best of several repeats, so scheduler noise only
+makes a measurement look faster, never slower). Results are compared with baseline.json; the run
+fails when a benchmark is slower than its baseline by more than the tolerance. Results are kept in
+units of a fixed calibration loop timed right after each measurement (median over rounds), so CPU
+frequency changes and a baseline recorded on a different machine only partly skew the
+comparison; a baseline recorded on the machine running the check remains the most accurate.
+
+Run from the cfg folder, so config.ini and pdu_filter.json are found:
+    export PYTHONPATH=../src:../../Common/src
+    python ../benchmarks/microBenchmark.py                                 # check
+    python ../benchmarks/microBenchmark.py --save                          # record a new baseline
+    python ../benchmarks/microBenchmark.py -k kinematics --tolerance 0.5
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import sys
+import timeit
+
+from io import BytesIO
+
+import numpy as np
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.PduFactory import createPdu
+from opendis.dis7 import EntityStatePdu
+
+from common import metrics
+
+from lib.entity.entityManager import EntityManager
+from lib.entity.entityStore import EntityStore
+from lib.kinematics import geodesy
+from lib.kinematics.kinematicsManager import KinematicsManager
+from lib.simulation import simulationManager
+from lib.simulation.communication import espduEncoder, pduPreFilter
+
+__author__ = "EnriqueMoran"
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_TOLERANCE = 0.25    # Allowed slowdown over the baseline, 0.25 is 25 %
+REPEAT = 5
+REPEAT_TIME = 0.01    # Seconds each repeat runs for, roughly
+ROUNDS = 10
+
+BENCHMARKS = {}    # name -> setup function returning the callable to time
+
+
+def benchmark(name: str):
+    """Register a setup function under name."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _calibration() -> float:
+    """Fixed pure Python workload, timed to scale baselines to the current machine."""
+    total = 0.0
+    for i in range(1000):
+        total += math.sqrt(i) * math.sin(i)
+    return total
+
+
+def _espdu() -> EntityStatePdu:
+    pdu = EntityStatePdu()
+    pdu.exerciseID = 1
+    pdu.entityID.siteID, pdu.entityID.applicationID, pdu.entityID.entityID = 1, 1, 42
+    pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z = 5.0e6, -6.9e5, 3.8e6
+    pdu.entityLinearVelocity.x, pdu.entityLinearVelocity.y = 12.5, -3.0
+    pdu.entityOrientation.psi = 1.2
+    pdu.marking.setString("BENCH")
+    return pdu
+
+
+def _encoded(pdu) -> bytes:
+    memory_stream = BytesIO()
+    pdu.serialize(DataOutputStream(memory_stream))
+    return memory_stream.getvalue()
+
+
+def _kinematics() -> KinematicsManager:
+    manager = KinematicsManager()
+    manager.set_position(36.98, -7.93, 150.0)
+    manager.set_orientation(0.0, 2.0, 45.0)
+    manager.set_speed(120.0)
+    return manager
+
+
+@benchmark("kinematics.process_kinematics")
+def _process_kinematics():
+    manager = _kinematics()
+    return lambda: manager.process_kinematics(0.1)
+
+
+@benchmark("kinematics.set_speed")
+def _set_speed():
+    manager = _kinematics()
+    return lambda: manager.set_speed(120.0)
+
+
+@benchmark("kinematics.get_lat_lon_alt")
+def _get_lat_lon_alt():
+    manager = _kinematics()
+    return manager.get_lat_lon_alt
+
+
+@benchmark("kinematics.step_entities_1000")
+def _step_entities():
+    rng = np.random.default_rng(0)
+    manager = KinematicsManager(EntityStore(1000))
+    for i in range(1000):
+        entity_id = (1, 1, i)
+        manager.entity_store.add_entity(entity_id)
+        manager.set_position(rng.uniform(-60, 60), rng.uniform(-90, 90), 150.0, entity_id)
+        manager.set_orientation(0.0, 2.0, rng.uniform(0, 360), entity_id)
+        manager.set_speed(120.0, entity_id)
+    return lambda: manager.process_entities_kinematics(0.1)
+
+
+@benchmark("geodesy.ecef2lla_1000")
+def _ecef2lla_batch():
+    rng = np.random.default_rng(0)
+    x, y, z = geodesy.lla2ecef(rng.uniform(-1.5, 1.5, 1000), rng.uniform(-3.1, 3.1, 1000),
+                               rng.uniform(0, 10000, 1000))
+    return lambda: geodesy.ecef2lla(x, y, z)
+
+
+@benchmark("geodesy.ecef2lla_point")
+def _ecef2lla_point():
+    x, y, z = (float(value) for value in geodesy.lla2ecef(0.65, -0.14, 150.0))
+    return lambda: geodesy.ecef2lla_point(x, y, z)
+
+
+@benchmark("geodesy.ned2ecef_vectors_1000")
+def _ned2ecef_batch():
+    rng = np.random.default_rng(0)
+    lat, lon = rng.uniform(-1.5, 1.5, 1000), rng.uniform(-3.1, 3.1, 1000)
+    ned = rng.uniform(-300, 300, (1000, 3))
+    return lambda: geodesy.ned2ecef_vectors(lat, lon, ned)
+
+
+@benchmark("codec.espdu_serialize")
+def _espdu_serialize():
+    pdu = _espdu()
+    return lambda: _encoded(pdu)
+
+
+@benchmark("codec.espdu_encoder")
+def _espdu_encoder():
+    pdu = _espdu()
+    encoder = espduEncoder.EntityStatePduEncoder()
+    encoder.set_static(pdu)
+    return lambda: encoder.encode(pdu)
+
+
+@benchmark("codec.espdu_decode")
+def _espdu_decode():
+    data = _encoded(_espdu())
+    return lambda: createPdu(data)
+
+
+@benchmark("filter.can_process_pdu")
+def _can_process_pdu():
+    sim = simulationManager.SimulationManager(start_threads=False)
+    sim.multicast_manager.sock.close()
+    pdu = _espdu()
+    return lambda: sim.can_process_pdu(pdu)
+
+
+@benchmark("filter.pre_filter_accept")
+def _pre_filter_accept():
+    pre_filter = pduPreFilter.PduPreFilter(lambda exercise, app, site: exercise == 1)
+    data = _encoded(_espdu())
+    return lambda: pre_filter.accept(data)
+
+
+@benchmark("entity.getters")
+def _entity_getters():
+    entity = EntityManager()
+
+    def get_state():
+        entity.get_entity_location()
+        entity.get_entity_orientation()
+        entity.get_entity_linear_velocity()
+    return get_state
+
+
+@benchmark("metrics.counter_inc")
+def _counter_inc():
+    counter = metrics.Registry().counter("bench_total", "Benchmark", ("type",))
+    return lambda: counter.labels("EntityStatePdu").inc()
+
+
+def measure(function) -> float:
+    """
+    :return: Seconds per call, best of REPEAT repeats.
+    """
+    timer = timeit.Timer(function)
+    number = 1
+    while True:    # Calls needed for a repeat to last REPEAT_TIME
+        elapsed = timer.timeit(number)
+        if elapsed >= REPEAT_TIME / 10:
+            break
+        number *= 10
+    number = max(1, int(number * REPEAT_TIME / elapsed))
+    return min(timer.repeat(REPEAT, number)) / number
+
+
+def run(names: list, rounds: int = ROUNDS) -> dict:
+    """
+    Time every benchmark once per round next to the calibration loop, rounds interleaved so a
+    slow spell of the machine does not hit all the measurements of one benchmark.
+
+    :return: (best seconds per call, median seconds per call in calibration units) of each
+             benchmark by name.
+    """
+    functions = {name: BENCHMARKS[name]() for name in names}
+    seconds = {name: [] for name in names}
+    units = {name: [] for name in names}
+    for _ in range(rounds):
+        for name, function in functions.items():
+            elapsed = measure(function)
+            seconds[name].append(elapsed)
+            units[name].append(elapsed / measure(_calibration))
+    return {name: (min(seconds[name]), float(np.median(units[name]))) for name in names}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Print every result next to its baseline, both in calibration units.
+
+    :return: Names of the benchmarks slower than baseline by more than tolerance.
+    """
+    regressions = []
+    print(f"{'benchmark':32} {'time (us)':>10} {'units':>8} {'baseline':>8} {'ratio':>6}")
+    for name, (seconds, units) in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            print(f"{name:32} {seconds * 1e6:10.2f} {units:8.4f} {'-':>8} {'new':>6}")
+            continue
+        ratio = units / expected
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:32} {seconds * 1e6:10.2f} {units:8.4f} {expected:8.4f} {ratio:6.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Hot path micro-benchmarks")
+    parser.add_argument("-k", dest="pattern", default="",
+                        help="only run benchmarks whose name contains this")
+    parser.add_argument("--save", action="store_true",
+                        help="record the results as the new baseline instead of checking")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--rounds", type=int, default=ROUNDS,
+                        help="times each benchmark is measured")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown ratio over the baseline, 0.25 for 25 %%")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)    # Hot paths are timed with DEBUG disabled
+    names = [name for name in BENCHMARKS if args.pattern in name]
+    results = run(names, args.rounds)
+
+    if args.save:
+        baseline = {}
+        if os.path.exists(args.baseline) and args.pattern:    # Keep the other benchmarks
+            with open(args.baseline, "r") as f:
+                baseline = json.load(f)["results"]
+        baseline.update({name: units for name, (_, units) in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": baseline}, f, indent=4, sort_keys=True)
+        for name, (seconds, units) in results.items():
+            print(f"{name:32} {seconds * 1e6:10.2f} us {units:8.4f} units")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        sys.exit(f"No baseline at {args.baseline}, record one with --save")
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        sys.exit(f"{len(regressions)} benchmark(s) regressed more than "
+                 f"{args.tolerance:.0%}: {', '.join(regressions)}")
+    print("No regression")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Load test of the SimulationManager receive path over loopback.
+
+A separate process sends synthetic DIS traffic (see trafficGenerator) to the configured multicast
+address at each target rate, while this process runs the same receive loop as
+MulticastManager.receive_pdu, timing the decode and dispatch of every datagram the pre-filter
+accepts.
+
+Run from the cfg folder, so config.ini and pdu_filter.json are found:
+    PYTHONPATH=../src:../../Common/src python ../benchmarks/receiveBenchmark.py --rates 1000 5000 20000
+"""
+
+import argparse
+import configparser
+import json
+import logging
+import multiprocessing
+import select
+import time
+
+import numpy as np
+
+from opendis.PduFactory import createPdu
+
+from lib.entity import remoteEntityTable
+from lib.simulation import simulationManager
+from lib.simulation.communication import trafficGenerator
+
+__author__ = "EnriqueMoran"
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def _generate(filters, address, rate, duration, options, sent) -> None:
+    generator = trafficGenerator.TrafficGenerator(filters, **options)
+    sent.value = generator.run(trafficGenerator.udp_sender(address), rate, duration)
+
+
+def _latency_stats(samples: np.ndarray) -> dict:
+    """Percentiles and max of samples given in nanoseconds, in microseconds."""
+    if not len(samples):
+        return {}
+    stats = {f"p{p}": float(np.percentile(samples, p)) / 1e3 for p in PERCENTILES}
+    stats["max"] = float(samples.max()) / 1e3
+    return stats
+
+
+def run_load(sim, filters: list, rate: float, duration: float, options: dict,
+             idle_timeout: float = 0.2) -> dict:
+    """
+    Send rate datagrams per second for duration seconds and process them through sim.
+
+    :param idle_timeout: Seconds without datagrams after the sender is done that end the run.
+    :return: Throughput, latencies (us), drops and CPU use of the run.
+    """
+    manager = sim.multicast_manager
+    pre_filter = manager.pre_filter
+    on_pdu_received = sim.on_pdu_received
+    clock = time.perf_counter_ns
+    capacity = int(rate * duration * 1.1) + manager.burst_size
+    decode_times = np.zeros(capacity, dtype=np.int64)
+    dispatch_times = np.zeros(capacity, dtype=np.int64)
+    decoded = 0
+    received = 0
+    rejected = 0
+    kernel_drops = manager.kernel_drops
+
+    sent = multiprocessing.Value("q", 0)
+    address = (manager.multicast_group, manager.multicast_port)
+    sender = multiprocessing.Process(target=_generate,
+                                     args=(filters, address, rate, duration, options, sent))
+    sender.start()
+    cpu_start = time.thread_time()
+    first_datagram = last_datagram = None
+    while True:
+        readable, _, _ = select.select([manager.sock], [], [], idle_timeout)
+        if not readable:
+            if not sender.is_alive():
+                break
+            continue
+        count = manager.receive_burst()
+        last_datagram = time.perf_counter()
+        if first_datagram is None:
+            first_datagram = last_datagram
+        received += count
+        for index in range(count):
+            data = manager.get_datagram(index)
+            if not pre_filter.accept(data):
+                rejected += 1
+                continue
+            manager.sender = manager.get_sender(index)    # Control PDUs are acknowledged to it
+            start = clock()
+            pdu = createPdu(data)
+            decoded_at = clock()
+            on_pdu_received(pdu)
+            if decoded < capacity:
+                decode_times[decoded] = decoded_at - start
+                dispatch_times[decoded] = clock() - decoded_at
+            decoded += 1
+    cpu = time.thread_time() - cpu_start    # Includes idle_timeout waits, which use no CPU
+    elapsed = last_datagram - first_datagram if first_datagram is not None else 0.0
+    sender.join()
+
+    recorded = min(decoded, capacity)
+    return {
+        "target_rate": rate,
+        "sent": sent.value,
+        "received": received,
+        "rejected_by_pre_filter": rejected,
+        "decoded": decoded,
+        "dropped": sent.value - received,
+        "kernel_drops": manager.kernel_drops - kernel_drops,
+        "throughput": received / elapsed if elapsed > 0 else 0.0,
+        "decode_us": _latency_stats(decode_times[:recorded]),
+        "dispatch_us": _latency_stats(dispatch_times[:recorded]),
+        "cpu_seconds": cpu,
+        "cpu_percent": 100 * cpu / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def _print_result(result: dict) -> None:
+    print(f"Target {result['target_rate']:.0f} PDU/s: sent {result['sent']}, "
+          f"received {result['received']} ({result['throughput']:.0f} PDU/s), "
+          f"dropped {result['dropped']} (kernel {result['kernel_drops']}), "
+          f"pre-filter rejected {result['rejected_by_pre_filter']}, "
+          f"receive thread CPU {result['cpu_percent']:.1f} %")
+    for name in ("decode_us", "dispatch_us"):
+        stats = " ".join(f"{key}={value:.1f}" for key, value in result[name].items())
+        print(f"    {name}: {stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Receive path load test over loopback")
+    parser.add_argument("--rates", type=float, nargs="+", default=[1000, 5000, 20000],
+                        help="target PDU/s, one run each")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--entities", type=int, default=1000, help="distinct remote entities")
+    parser.add_argument("--match-ratio", type=float, default=0.5,
+                        help="share of the traffic accepted by pdu_filter.json")
+    parser.add_argument("--mix", type=trafficGenerator.parse_mix, default=None,
+                        help="PDU kind weights, e.g. espdu=0.9,start_resume=0.05,stop_freeze=0.05")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    config = configparser.ConfigParser(inline_comment_prefixes=";")
+    config.read("config.ini")
+    with open(config.get("FILES", "pdu_filter_path"), "r") as f:
+        filters = json.load(f)
+
+    sim = simulationManager.SimulationManager(entity_store=remoteEntityTable.RemoteEntityTable(),
+                                              start_threads=False)
+    options = {"entity_count": args.entities, "match_ratio": args.match_ratio, "mix": args.mix,
+               "exclude_entity": sim.entity_id}
+    results = []
+    for rate in args.rates:
+        result = run_load(sim, filters, rate, args.duration, options)
+        _print_result(result)
+        results.append(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Scaling of the sharded fleet step with the number of worker processes.
+
+Steps a fleet of random entities with every worker count given and reports steps per second,
+entity updates per second and the speedup over the in-process step (0 workers). Scaling is
+bounded by the physical cores available; on a single core every worker count runs at most as
+fast as 0 workers.
+
+    PYTHONPATH=../src python ../benchmarks/shardBenchmark.py --entities 100000 1000000 --workers 0 1 2 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+import numpy as np
+
+from lib.kinematics.shardedEngine import ShardedEngine
+
+__author__ = "EnriqueMoran"
+
+
+def run_steps(entities: int, workers: int, duration: float) -> dict:
+    """
+    Step a fleet of entities for about duration seconds.
+
+    :return: Steps and entity updates per second.
+    """
+    rng = np.random.default_rng(0)
+    with ShardedEngine(entities, workers, consumption_rate=5.0, initial_fuel=1000.0) as engine:
+        for lat, lon, yaw, speed in zip(rng.uniform(-80, 80, entities),
+                                        rng.uniform(-180, 180, entities),
+                                        rng.uniform(0, 360, entities),
+                                        rng.uniform(0, 300, entities)):
+            engine.add_entity(lat, lon, 100.0, yaw=yaw, speed=speed)
+        engine.step(0.01)    # Warm up the workers
+        steps = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            engine.step(0.01)
+            steps += 1
+        elapsed = time.perf_counter() - start
+    return {"entities": entities, "workers": workers, "steps_per_second": steps / elapsed,
+            "updates_per_second": steps * entities / elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sharded fleet step scaling")
+    parser.add_argument("--entities", type=int, nargs="+", default=[100000])
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per run")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"{os.cpu_count()} CPUs")
+    results = []
+    for entities in args.entities:
+        single = None
+        for workers in args.workers:
+            result = run_steps(entities, workers, args.duration)
+            single = single or result["updates_per_second"]
+            result["speedup"] = result["updates_per_second"] / single
+            print(f"{entities:>9} entities {workers:>2} workers: "
+                  f"{result['steps_per_second']:8.1f} steps/s "
+                  f"{result['updates_per_second'] / 1e6:8.2f} M updates/s "
+                  f"x{result['speedup']:.2f}")
+            results.append(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
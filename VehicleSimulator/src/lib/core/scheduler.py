@@ -0,0 +1,289 @@
+"""Run periodic tasks on monotonic deadlines, without accumulating drift."""
+
+import asyncio
+import collections
+import logging
+import math
+import threading
+import time
+
+from enum import Enum
+
+from common import metrics
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("Scheduler")
+
+
+class OverrunPolicy(Enum):
+    SKIP = "skip"            # Drop missed frames and realign to the period grid
+    CATCH_UP = "catch_up"    # Run missed frames back to back, up to max_catch_up of them
+
+    def to_string(self) -> str:
+        return self.name
+
+
+class PeriodicTask:
+    """
+    Callback run every period seconds. Frame n is due at start + n * period, so the time spent in
+    the callback never shifts later frames.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        period: float,
+        callback,
+        policy: OverrunPolicy = OverrunPolicy.SKIP,
+        max_catch_up: int = 5,
+    ) -> None:
+        """
+        :param period: Seconds between frames.
+        :param callback: Function called without arguments on every frame.
+        :param max_catch_up: With CATCH_UP, frames further behind than this are skipped anyway.
+        """
+        if period <= 0:
+            raise ValueError(f"Task {name} period must be positive, got {period}")
+        self.name = name
+        self.period = period
+        self.callback = callback
+        self.policy = policy
+        self.max_catch_up = max_catch_up
+        self.deadline = None    # Monotonic time the next frame is due, set on first run_pending
+        self.frames = 0
+        self.overruns = 0    # Frames that ended after the next one was due
+        self.errors = 0    # Frames whose callback raised
+        self.skipped_frames = 0
+        self.max_lateness = 0.0    # Seconds, worst delay between deadline and frame start
+
+    def run(self, now: float, clock) -> None:
+        """
+        Run the due frame that started at now, then move the deadline according to the policy.
+        An exception raised by the callback is logged and counted, it does not stop the task nor
+        its siblings.
+        """
+        self.max_lateness = max(self.max_lateness, now - self.deadline)
+        try:
+            self.callback()
+        except Exception:
+            self.errors += 1
+            if self.errors == 1 or self.errors % 100 == 0:
+                logger.exception("Task %s frame failed (%d errors so far)", self.name, self.errors)
+        self.frames += 1
+        self.deadline += self.period
+        end = clock()
+        if end <= self.deadline:
+            return
+        self.overruns += 1
+        if self.overruns == 1 or self.overruns % 100 == 0:
+            logger.warning("Task %s overran its %.1f ms period (%d overruns so far)",
+                           self.name, self.period * 1000, self.overruns)
+        behind = math.floor((end - self.deadline) / self.period)    # Whole frames already missed
+        if self.policy == OverrunPolicy.CATCH_UP:
+            behind -= self.max_catch_up
+        if behind > 0:
+            self.deadline += behind * self.period
+            self.skipped_frames += behind
+
+    def get_stats(self) -> dict:
+        return {
+            "period": self.period,
+            "frames": self.frames,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "skipped_frames": self.skipped_frames,
+            "max_lateness": self.max_lateness,
+        }
+
+
+class Scheduler:
+    """
+    Fixed-rate scheduler for several periodic tasks sharing one thread or coroutine. Tasks run in
+    deadline order, the scheduler sleeps until the earliest next deadline.
+
+    A paused scheduler blocks on a condition (or an asyncio event) until resume() or stop() is
+    called from any thread, so it uses no CPU while idle. Frames restart right away on resume,
+    frames missed while paused are not run.
+
+    Other threads hand one-shot work to the scheduler thread with call_soon, e.g. to reset state
+    the tasks use without racing them. Calls run before the next frame, also while paused.
+    """
+
+    def __init__(self, clock=time.monotonic, paused: bool = False) -> None:
+        self.clock = clock
+        self._tasks = {}    # name -> PeriodicTask
+        self._lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._paused = paused
+        self._stopped = False
+        self._restart = False    # Deadlines must be reset by the running thread on next frame
+        self._calls = collections.deque()    # One-shot callbacks posted by call_soon
+        self._loop = None    # Event loop of run_async, if running
+        self._wakeup = None    # asyncio.Event set on resume and stop
+
+    def add_task(
+        self,
+        name: str,
+        period: float,
+        callback,
+        policy: OverrunPolicy = OverrunPolicy.SKIP,
+        max_catch_up: int = 5,
+    ) -> PeriodicTask:
+        """
+        Register callback to run every period seconds, first frame on the next run_pending call.
+        A task with the same name is replaced.
+        """
+        task = PeriodicTask(name, period, callback, policy, max_catch_up)
+        with self._lock:
+            self._tasks[name] = task
+        return task
+
+    def remove_task(self, name: str) -> None:
+        with self._lock:
+            self._tasks.pop(name, None)
+
+    def get_task(self, name: str) -> PeriodicTask:
+        return self._tasks[name]
+
+    def call_soon(self, callback) -> None:
+        """
+        Run callback once on the scheduler thread (or coroutine), before the next frame, even
+        while paused. Safe to call from any thread.
+        """
+        with self._condition:
+            self._calls.append(callback)
+            self._condition.notify_all()
+        self._wake_loop()
+
+    def run_calls(self) -> None:
+        """
+        Run the callbacks posted with call_soon, in order. An exception is logged, it does not
+        stop the callbacks that follow.
+        """
+        while self._calls:
+            callback = self._calls.popleft()
+            try:
+                callback()
+            except Exception:
+                logger.exception("Call %s failed", getattr(callback, "__name__", callback))
+
+    def run_pending(self) -> float:
+        """
+        Run the posted calls, then every due frame.
+
+        :return: Seconds until the earliest next deadline, 0 if a frame is already due.
+        """
+        self.run_calls()
+        with self._lock:
+            tasks = list(self._tasks.values())
+        if not tasks:
+            return 0.1
+        now = self.clock()
+        restart, self._restart = self._restart, False
+        for task in tasks:
+            if task.deadline is None or restart:
+                task.deadline = now
+        for task in sorted(tasks, key=lambda t: t.deadline):
+            if task.deadline <= now:
+                task.run(now, self.clock)
+                now = self.clock()
+        return max(0.0, min(task.deadline for task in tasks) - self.clock())
+
+    def run(self) -> None:
+        """
+        Run tasks in the calling thread until stop() is called.
+        """
+        with self._condition:
+            self._stopped = False
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._stopped or not self._paused or self._calls)
+                if self._stopped:
+                    return
+                paused = self._paused
+            if paused:
+                self.run_calls()
+                continue
+            delay = self.run_pending()
+            if delay > 0:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._stopped or self._paused or self._calls,
+                                             delay)
+
+    async def run_async(self) -> None:
+        """
+        Coroutine counterpart of run. Cancel it or call stop() to end it.
+        """
+        self._wakeup = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        self._stopped = False
+        try:
+            while not self._stopped:
+                if self._paused:
+                    self._wakeup.clear()
+                    self.run_calls()
+                    if self._paused and not self._stopped and not self._calls:
+                        await self._wakeup.wait()
+                    continue
+                await asyncio.sleep(self.run_pending())
+        finally:
+            self._loop = None
+
+    @property
+    def paused(self) -> bool:
+        return self._paused
+
+    def pause(self) -> None:
+        """
+        Stop running frames after the current one. Safe to call from any thread.
+        """
+        with self._condition:
+            self._paused = True
+            self._condition.notify_all()
+
+    def resume(self) -> None:
+        """
+        Run a frame of every task right away and continue from there. Safe to call from any
+        thread.
+        """
+        with self._condition:
+            self._restart = True
+            self._paused = False
+            self._condition.notify_all()
+        self._wake_loop()
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self._wake_loop()
+
+    def _wake_loop(self) -> None:
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self._wakeup.set)
+
+    def get_stats(self) -> dict:
+        """Return the statistics of every task, by name."""
+        with self._lock:
+            return {name: task.get_stats() for name, task in self._tasks.items()}
+
+    def export_metrics(self, name: str, registry: metrics.Registry = metrics.REGISTRY) -> None:
+        """
+        Expose the task statistics in registry with a scheduler=name label, read at scrape time.
+        """
+        for stat, metric_name, kind, documentation in (
+                ("frames", "scheduler_task_frames_total", "counter",
+                 "Frames run by scheduler task"),
+                ("overruns", "scheduler_task_overruns_total", "counter",
+                 "Frames that ended after the next one was due"),
+                ("errors", "scheduler_task_errors_total", "counter",
+                 "Frames whose callback raised an exception"),
+                ("skipped_frames", "scheduler_task_skipped_frames_total", "counter",
+                 "Frames dropped to realign an overrun task"),
+                ("max_lateness", "scheduler_task_max_lateness_seconds", "gauge",
+                 "Worst delay between a frame deadline and its start")):
+            registry.callback(metric_name, documentation, ("scheduler", "task"), kind).add_source(
+                name, lambda stat=stat: {(name, task): stats[stat]
+                                         for task, stats in self.get_stats().items()})
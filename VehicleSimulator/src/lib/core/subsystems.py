@@ -0,0 +1,174 @@
+"""Vehicle subsystems stepped at their own fixed rates by a shared scheduler."""
+
+import abc
+import logging
+import time
+
+from common import metrics
+
+from lib.core import scheduler
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("Subsystems")
+
+STEP_DURATION = metrics.REGISTRY.histogram("subsystem_step_seconds",
+                                           "Duration of one subsystem step", ("subsystem",))
+
+
+class Subsystem(abc.ABC):
+    """
+    Part of the vehicle advanced in fixed time steps. Subclasses set name and implement step.
+    """
+
+    name = "subsystem"
+
+    @abc.abstractmethod
+    def step(self, dt: float) -> None:
+        """
+        Advance the subsystem state.
+
+        :param dt: Simulated seconds since the previous step, always the stage period.
+        """
+
+
+class KinematicsSubsystem(Subsystem):
+    """
+    Move the own entity and the locally simulated store entities along their heading, pitch and
+    speed.
+    """
+
+    name = "kinematics"
+
+    def __init__(self, kinematics_system) -> None:
+        self.kinematics_system = kinematics_system
+
+    def step(self, dt: float) -> None:
+        self.kinematics_system.process_kinematics(dt)
+        self.kinematics_system.process_entities_kinematics(dt)
+
+
+class FuelSubsystem(Subsystem):
+    """
+    Burn the own entity fuel for the distance covered at its current speed. At a low rate the
+    distance is approximate, speed changes between steps are not seen.
+    """
+
+    name = "fuel"
+
+    def __init__(self, fuel_system, kinematics_system) -> None:
+        self.fuel_system = fuel_system
+        self.kinematics_system = kinematics_system
+
+    def step(self, dt: float) -> None:
+        self.fuel_system.process_fuel_consumption(self.kinematics_system.get_speed() * dt)
+
+
+class FleetSubsystem(Subsystem):
+    """
+    Move the locally simulated fleet along its great-circle tracks and burn its fuel, in the
+    engine worker processes.
+    """
+
+    name = "fleet"
+
+    def __init__(self, fleet) -> None:
+        self.fleet = fleet
+
+    def step(self, dt: float) -> None:
+        self.fleet.step(dt)
+
+
+class Stage:
+    """
+    Registered subsystem with its rate and step timing.
+    """
+
+    def __init__(self, subsystem: Subsystem, rate: float, budget: float) -> None:
+        """
+        :param rate: Steps per second.
+        :param budget: Max seconds a step should take, a longer step is logged.
+        """
+        self.subsystem = subsystem
+        self.rate = rate
+        self.period = 1 / rate
+        self.budget = budget
+        self.steps = 0
+        self.over_budget = 0
+        self.total_time = 0.0    # Seconds spent in step
+        self.max_time = 0.0
+        self._histogram = STEP_DURATION.labels(subsystem.name)
+
+    def record(self, elapsed: float) -> None:
+        self.steps += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+        self._histogram.observe(elapsed)
+        if elapsed <= self.budget:
+            return
+        self.over_budget += 1
+        if self.over_budget == 1 or self.over_budget % 100 == 0:
+            logger.warning("Subsystem %s step took %.2f ms, budget %.2f ms (%d times so far)",
+                           self.subsystem.name, elapsed * 1000, self.budget * 1000,
+                           self.over_budget)
+
+    def get_stats(self) -> dict:
+        mean_time = self.total_time / self.steps if self.steps else 0.0
+        return {
+            "rate": self.rate,
+            "steps": self.steps,
+            "mean_time": mean_time,
+            "max_time": self.max_time,
+            "over_budget": self.over_budget,
+            "load": mean_time * self.rate,    # Share of wall time spent in this stage
+        }
+
+
+class SubsystemPipeline:
+    """
+    Fixed-timestep pipeline: every registered subsystem is a scheduler task with its own period
+    and is always stepped by that period, so expensive subsystems can run at a lower rate without
+    slowing the others. Late frames are caught up (up to the scheduler max_catch_up) so the
+    simulated time of each subsystem keeps up with the wall clock.
+    """
+
+    def __init__(self, task_scheduler: scheduler.Scheduler, clock=time.perf_counter) -> None:
+        """
+        :param clock: Function returning seconds, used to time the steps.
+        """
+        self.scheduler = task_scheduler
+        self.clock = clock
+        self._stages = {}    # name -> Stage
+
+    def register(self, subsystem: Subsystem, rate: float, budget: float = None) -> Stage:
+        """
+        Step subsystem rate times per second, replacing a subsystem with the same name.
+
+        :param budget: Max seconds per step before it is logged, the period if None.
+        """
+        stage = Stage(subsystem, rate, budget if budget is not None else 1 / rate)
+        self._stages[subsystem.name] = stage
+        self.scheduler.add_task(self._task_name(subsystem.name), stage.period,
+                                lambda: self._run_stage(stage), scheduler.OverrunPolicy.CATCH_UP)
+        logger.info("Subsystem %s registered at %.1f Hz", subsystem.name, rate)
+        return stage
+
+    def unregister(self, name: str) -> None:
+        self.scheduler.remove_task(self._task_name(name))
+        self._stages.pop(name, None)
+
+    @staticmethod
+    def _task_name(name: str) -> str:
+        return f"subsystem.{name}"
+
+    def _run_stage(self, stage: Stage) -> None:
+        start = self.clock()
+        stage.subsystem.step(stage.period)
+        stage.record(self.clock() - start)
+
+    def get_subsystem(self, name: str) -> Subsystem:
+        return self._stages[name].subsystem
+
+    def get_stats(self) -> dict:
+        """Return the timing statistics of every stage, by subsystem name."""
+        return {name: stage.get_stats() for name, stage in self._stages.items()}
@@ -1,45 +1,220 @@
 """Manage the different systems that define the basic operation of a vehicle."""
 
+import asyncio
+import configparser
+import json
 import threading
-import time
 
-from lib.kinematics import kinematicsManager
-from lib.entity import entityManager
+import numpy as np
+
+from common import metrics
+
+from lib.core import scheduler, subsystems
+from lib.kinematics import kinematicsManager, shardedEngine
+from lib.entity import entityManager, fleet, remoteEntityTable, spatialIndex
 from lib.fuel import fuelManager
 from lib.simulation import simulationManager
+from lib.simulation.communication import stateFeed
+
+TICK_DURATION = metrics.REGISTRY.histogram("simulation_tick_seconds",
+                                           "Duration of the SystemsManager simulation tick")
 
 class SystemsManager:
 
-    def __init__(self) -> None:
+    def __init__(self, start_threads: bool = True) -> None:
+        """
+        :param start_threads: Start the SimulationManager receive and send threads.
+        """
         self.entity_system = entityManager.EntityManager()
-        self.fuel_system = fuelManager.FuelManager()
-        self.kinematics_system = kinematicsManager.KinematicsManager()
-        self.simulation_system = simulationManager.SimulationManager(self.kinematics_system)
+        self.spatial_index = spatialIndex.SpatialIndex()    # Remote entities, for range queries
+        self.entity_store = remoteEntityTable.RemoteEntityTable(
+            spatial_index=self.spatial_index)
+        self.fuel_system = fuelManager.FuelManager(self.entity_store)
+        self.kinematics_system = kinematicsManager.KinematicsManager(self.entity_store)
+        self.simulation_system = simulationManager.SimulationManager(self.kinematics_system,
+                                                                     self.entity_store,
+                                                                     start_threads)
         self.weapon_system = None
         self.comm_system = None
         self.sensors_system = None
         self.electric_system = None
         self.physic_system = None
+        self.fleet = None    # Entities simulated locally, see [SIMULATION]
+        self.state_feed = None    # Entity table shared with co-located tools
+        self.metrics_server = None    # Prometheus endpoint, see [METRICS]
 
         self.exercise_time = 0    # Exercise time in ms
         self.simulation_freq = 1000    # ms
         self.execution_thread = None
+        self.scheduler = scheduler.Scheduler(paused=True)    # Runs while exercise is RUNNING
+        # Exercise time must advance by the same amount per tick, missed ticks are run late
+        self.scheduler.add_task("simulation_tick", self.simulation_freq / 1000,
+                                self._simulation_step, scheduler.OverrunPolicy.CATCH_UP)
+        self.pipeline = subsystems.SubsystemPipeline(self.scheduler)
+        self.simulation_system.exercise_state.add_listener(self._on_status_changed)
+        self.scheduler.export_metrics("systems")
+        self.read_config()
+
+    def read_config(self) -> None:
+        """
+        Read and process configuration file.
+        """
+        config = configparser.ConfigParser(inline_comment_prefixes=";")
+        config.read("config.ini")
+
+        self.pipeline.register(subsystems.KinematicsSubsystem(self.kinematics_system),
+                               config.getfloat("SUBSYSTEMS", 'kinematics_rate', fallback=60.0))
+        self.pipeline.register(subsystems.FuelSubsystem(self.fuel_system, self.kinematics_system),
+                               config.getfloat("SUBSYSTEMS", 'fuel_rate', fallback=1.0))
+
+        fleet_path = config.get("SIMULATION", 'fleet_path', fallback="")
+        if fleet_path:
+            with open(fleet_path, 'r') as f:
+                self.create_fleet(json.load(f),
+                                  config.getint("SIMULATION", 'workers', fallback=0),
+                                  config.getfloat("SIMULATION", 'rate', fallback=10.0))
+
+        feed_name = config.get("STATE_FEED", 'name', fallback="")
+        if feed_name:
+            self.state_feed = stateFeed.StateFeedPublisher(
+                feed_name, config.getint("STATE_FEED", 'capacity', fallback=4096))
+            self.scheduler.add_task("state_feed",
+                                    1 / config.getfloat("STATE_FEED", 'rate', fallback=60.0),
+                                    self.publish_state)
+
+        metrics_port = config.getint("METRICS", 'port', fallback=0)
+        if metrics_port:
+            self.metrics_server = metrics.start_http_server(
+                metrics_port, config.get("METRICS", 'host', fallback="127.0.0.1"))
+
+    def create_fleet(self, items: list, workers: int = 0, rate: float = 10.0) -> None:
+        """
+        Simulate the fleet JSON entries locally: stepped by the pipeline across worker processes,
+        sent as ESPDUs by the simulation system and published on the state feed.
+
+        :param workers: Processes stepping the fleet, 0 to step it in the scheduler thread.
+        :param rate: Fleet steps per second.
+        """
+        site_id = self.simulation_system.site_id
+        application_id = self.simulation_system.application_id
+        engine = shardedEngine.ShardedEngine(len(items), workers,
+                                             consumption_rate=self.fuel_system._consumption_rate,
+                                             initial_fuel=self.fuel_system.initial_fuel_quantity)
+        try:
+            entities = fleet.Fleet.from_json(items, engine, site_id, application_id)
+            own_entity_id = self.simulation_system.entity_id
+            if (site_id, application_id, own_entity_id) in entities.entity_ids:
+                raise ValueError(f"Fleet entity {own_entity_id} is the own entity")
+        except Exception:
+            engine.close()
+            raise
+        self.fleet = entities
+        self.pipeline.register(subsystems.FleetSubsystem(self.fleet), rate)
+        self.simulation_system.set_fleet(self.fleet)
 
     def __del__(self) -> None:
         if self.execution_thread:
             self.execution_thread.join()
+        self.close()
+
+    def close(self) -> None:
+        """
+        Remove the state feed shared memory block, so it does not outlive the simulator, and stop
+        the fleet worker processes.
+        """
+        if self.state_feed is not None:
+            self.state_feed.close()
+            self.state_feed = None
+        if self.fleet is not None:
+            self.fleet.close()
     
     def _simulation_tick(self) -> None:
-        while True:
-            if self.simulation_system.exercise_status == simulationManager.ExerciseStatus.RUNNING:
-                self.exercise_time += 1
-                time.sleep(self.simulation_freq / 1000)
-            elif self.simulation_system.exercise_status == simulationManager.ExerciseStatus.TERMINATED:
-                self.entity_system.reset_data()
-                self.fuel_system.reset_fuel()
-                self.exercise_time = 0
+        try:
+            self.scheduler.run()
+        finally:
+            self.close()
+
+    def _simulation_step(self) -> None:
+        with TICK_DURATION.time():
+            self.exercise_time += 1
+
+    def _on_status_changed(self, old, new) -> None:
+        """
+        Start ticking when the exercise runs, stop otherwise. Called by the thread that received
+        the StartResume or StopFreeze PDU.
+        """
+        if new == simulationManager.ExerciseStatus.TERMINATED:
+            # The pause only takes effect after the running frame, so the reset is left to the
+            # scheduler thread instead of racing the subsystems from here
+            self.scheduler.call_soon(self._reset_exercise)
+        if new == simulationManager.ExerciseStatus.RUNNING:
+            self.scheduler.resume()
+        else:
+            self.scheduler.pause()
+
+    def _reset_exercise(self) -> None:
+        """
+        Clear the own and remote entities, fuel and exercise time and bring the fleet back to its
+        initial state after a terminated exercise. Run on the scheduler thread, between frames.
+        """
+        self.entity_system.reset_data()
+        self.kinematics_system.reset()    # Cleared location is ECEF (0, 0, 0), not geodetic
+        self.entity_store.clear()
+        self.fuel_system.reset_fuel()
+        if self.fleet is not None:
+            self.fleet.reset()
+        self.exercise_time = 0
+
+    def _entity_states(self, now: float = None) -> tuple:
+        """
+        Own entity, the fleet and the remote entities dead reckoned to now.
+
+        :return: (entity IDs, locations, orientations), own entity last.
+        """
+        entity_ids, locations, orientations = self.entity_store.snapshot(now)
+        if self.fleet is not None:
+            fleet_ids, fleet_locations, fleet_orientations = self.fleet.snapshot()
+            entity_ids += fleet_ids
+            locations = np.vstack((locations, fleet_locations))
+            orientations = np.vstack((orientations, fleet_orientations))
+        own_location = self.entity_system.get_entity_location()
+        own_orientation = self.entity_system.get_entity_orientation()
+        entity_ids.append((self.simulation_system.site_id, self.simulation_system.application_id,
+                           self.simulation_system.entity_id))
+        locations = np.vstack((locations, (own_location.x, own_location.y, own_location.z)))
+        orientations = np.vstack((orientations, (own_orientation.psi, own_orientation.theta,
+                                                 own_orientation.phi)))
+        return entity_ids, locations, orientations
+
+    def publish_state(self) -> None:
+        """
+        Write the current entity states to the state feed.
+        """
+        now = self.entity_store.clock()
+        self.state_feed.publish(*self._entity_states(now), now)
+
+    async def _simulation_tick_async(self) -> None:
+        await self.scheduler.run_async()
+
+    async def run_async(self) -> None:
+        """
+        Run simulation tick and networking on the current event loop until the simulation stops.
+        """
+        tick = asyncio.ensure_future(self._simulation_tick_async())
+        try:
+            await self.simulation_system.run_async()
+        finally:
+            tick.cancel()
+            try:
+                await tick
+            except asyncio.CancelledError:
+                pass
+            self.close()
 
     def run(self) -> None:
-        self.simulation_system.listen_to_pdu()
+        if self.simulation_system.transport == simulationManager.Transport.ASYNCIO:
+            asyncio.run(self.run_async())
+            return
+        # Receive and send threads are started by SimulationManager
         self.execution_thread = threading.Thread(target=self._simulation_tick)
         self.execution_thread.start()
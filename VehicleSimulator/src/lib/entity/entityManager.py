@@ -11,10 +11,18 @@ from opendis.dis7 import (
     EulerAngles,
 )
 
+from common import metrics
+
 __author__ = "EnriqueMoran"
 
 logger = logging.getLogger("EntityManager")
 
+WRITE_LOCK_WAIT = metrics.REGISTRY.histogram("entity_manager_write_lock_wait_seconds",
+                                             "Time whole own entity writes (set_data, reset_data) "
+                                             "waited for the entity lock, contended acquisitions "
+                                             "only",
+                                             buckets=metrics.LOCK_WAIT_BUCKETS)
+
 class EntityManager:
 
     _instance_lock = threading.Lock()
@@ -41,11 +49,14 @@ class EntityManager:
             self._marking = EntityMarking()
             self._numberOfVariableParameters = 0
             self._variableParameters = []
+            # Only the whole entity writes time their lock waits, the hot per field getters and
+            # setters keep the bare lock
+            self._instance_lock = threading.Lock()
+            self._write_lock = metrics.TimedLock(WRITE_LOCK_WAIT, self._instance_lock)
             self.initialized = True
-        self._instance_lock = threading.Lock()
     
     def reset_data(self) -> None:
-        with self._instance_lock:
+        with self._write_lock:
             self._capabilities = 0
             self._dead_reckoning_params = DeadReckoningParameters()
             self._entityAppearance = 0
@@ -60,7 +71,7 @@ class EntityManager:
             self._variableParameters = []
 
     def set_data(self, pdu: EntityStatePdu) -> None:
-        with self._instance_lock:
+        with self._write_lock:
             self._capabilities = pdu.capabilities
             self._deadReckoningParameters = pdu.deadReckoningParameters
             self._entityAppearance = pdu.entityAppearance
@@ -0,0 +1,402 @@
+"""Hold the state of many entities in struct-of-arrays form, indexed by DIS entity ID."""
+
+import logging
+import threading
+
+import numpy as np
+
+from lib.entity.spatialIndex import SpatialIndex
+from lib.kinematics.kinematicsEngine import KinematicsEngine
+
+from opendis.dis7 import (
+    DeadReckoningParameters,
+    EntityType,
+    EntityMarking,
+    EntityStatePdu,
+    Vector3Float,
+    Vector3Double,
+    EulerAngles,
+)
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("EntityStore")
+
+
+class EntityStore:
+    """
+    Compact table of entity state. Each entity owns one row of a set of NumPy columns; the
+    (site, application, entity) ID maps to its row through a dict, so lookups are O(1). Removing an
+    entity moves the last row into the freed one, keeping the table dense.
+
+    Location, velocity and orientation are the columns of a KinematicsEngine, so the rows of the
+    store are the rows the engine steps: kinematics of every entity advance in one vectorized call.
+
+    A single lock guards the whole table. Bulk readers and writers take it once per call, no matter
+    how many entities they touch.
+
+    With a SpatialIndex, every location written to the store (ESPDUs, kinematics steps, setters)
+    is also written to the index under the table lock, and removed entities leave it.
+    """
+
+    def __init__(self, capacity: int = 64, spatial_index: SpatialIndex = None) -> None:
+        """
+        :param spatial_index: Index kept up to date with the entity locations, None for no index.
+        """
+        self._lock = threading.Lock()
+        self.spatial_index = spatial_index
+        self._rows = {}    # (site, application, entity) -> row
+        self._keys = []    # row -> (site, application, entity)
+        self._fills = {}    # column attribute name -> value of an empty row
+        self._capacity = 0
+        self.kinematics = KinematicsEngine(0)
+        self._allocate(max(capacity, 1))
+
+    @property
+    def _location(self) -> np.ndarray:
+        return self.kinematics.location    # ECEF x, y, z in meters
+
+    @property
+    def _velocity(self) -> np.ndarray:
+        return self.kinematics.velocity    # ECEF x, y, z in m/s
+
+    @property
+    def _orientation(self) -> np.ndarray:
+        return self.kinematics.orientation    # psi, theta, phi in radians
+
+    def _grow(self, name: str, shape: tuple, dtype, fill=0) -> None:
+        """
+        Create column name, or resize it to the current capacity keeping its content.
+        """
+        new = np.full((self._capacity,) + shape, fill, dtype=dtype)
+        old = getattr(self, name, None)
+        if old is not None:
+            new[:len(old)] = old
+        setattr(self, name, new)
+        self._fills[name] = fill
+
+    def _allocate(self, capacity: int) -> None:
+        self._capacity = capacity
+        self.kinematics.resize(capacity)
+        self._grow("_appearance", (), np.uint32)
+        self._grow("_capabilities", (), np.uint32)
+        self._grow("_force_id", (), np.uint8)
+        self._grow("_entity_type", (7,), np.uint16)          # kind, domain, country, category...
+        self._grow("_dr_algorithm", (), np.uint8)
+        self._grow("_marking", (12,), np.uint8)              # character set + 11 characters
+        self._grow("_fuel_quantity", (), np.float64, np.nan)    # NaN while not tracked
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, entity_id: tuple) -> bool:
+        return entity_id in self._rows
+
+    def get_entity_ids(self) -> list:
+        with self._lock:
+            return list(self._keys)
+
+    def add_entity(self, entity_id: tuple) -> None:
+        """
+        Add a locally simulated entity with zeroed state: step_kinematics advances it. Does nothing
+        if the entity already exists.
+
+        :param entity_id: (site, application, entity) tuple.
+        """
+        with self._lock:
+            if entity_id not in self._rows:
+                row = self._add_row(entity_id)
+                self.kinematics.simulated[row] = True
+
+    def _add_row(self, entity_id: tuple) -> int:
+        row = self._rows.get(entity_id)
+        if row is not None:
+            return row
+        row = len(self._keys)
+        if row == self._capacity:
+            self._allocate(self._capacity * 2)
+        self._rows[entity_id] = row
+        self._keys.append(entity_id)
+        return row
+
+    def remove_entity(self, entity_id: tuple) -> None:
+        with self._lock:
+            self._remove_row(entity_id)
+
+    def _remove_row(self, entity_id: tuple) -> None:
+        if self.spatial_index is not None:
+            self.spatial_index.remove(entity_id)
+        row = self._rows.pop(entity_id)
+        last = len(self._keys) - 1
+        last_id = self._keys.pop()
+        for name, fill in self._fills.items():
+            column = getattr(self, name)
+            if row != last:
+                column[row] = column[last]
+            column[last] = fill
+        if row != last:
+            self.kinematics.move_row(last, row)
+            self._rows[last_id] = row
+            self._keys[row] = last_id
+        else:
+            self.kinematics.clear_rows([last])
+
+    def clear(self) -> None:
+        """Remove every entity."""
+        with self._lock:
+            for name, fill in self._fills.items():
+                getattr(self, name)[:len(self._keys)] = fill
+            self.kinematics.clear_rows(slice(0, len(self._keys)))
+            self._rows.clear()
+            if self.spatial_index is not None:
+                self.spatial_index.clear()
+            self._keys.clear()
+
+    def set_data(self, pdu: EntityStatePdu) -> tuple:
+        """
+        Insert or update an entity from a received ESPDU.
+
+        :return: ID of the updated entity.
+        """
+        entity_id = (pdu.entityID.siteID, pdu.entityID.applicationID, pdu.entityID.entityID)
+        with self._lock:
+            row = self._add_row(entity_id)
+            self._set_row_data(row, pdu)
+            self._index_rows([row])
+        return entity_id
+
+    def _set_row_data(self, row: int, pdu: EntityStatePdu) -> None:
+        """
+        Copy ESPDU fields into row. Called with the lock held. The entity is simulated by its
+        sender from now on, step_kinematics no longer advances it.
+        """
+        t = pdu.entityType
+        self.kinematics.simulated[row] = False
+        self._location[row] = (pdu.entityLocation.x, pdu.entityLocation.y,
+                               pdu.entityLocation.z)
+        self._velocity[row] = (pdu.entityLinearVelocity.x, pdu.entityLinearVelocity.y,
+                               pdu.entityLinearVelocity.z)
+        self._orientation[row] = (pdu.entityOrientation.psi, pdu.entityOrientation.theta,
+                                  pdu.entityOrientation.phi)
+        self._appearance[row] = pdu.entityAppearance
+        self._capabilities[row] = pdu.capabilities
+        self._force_id[row] = pdu.forceId
+        self._entity_type[row] = (t.entityKind, t.domain, t.country, t.category,
+                                  t.subcategory, t.specific, t.extra)
+        self._dr_algorithm[row] = pdu.deadReckoningParameters.deadReckoningAlgorithm
+        self._marking[row, 0] = pdu.marking.characterSet
+        self._marking[row, 1:] = [c & 0xFF for c in pdu.marking.characters]
+
+    def _index_rows(self, rows) -> None:
+        """
+        Write the location of rows to the spatial index. Called with the lock held.
+        """
+        if self.spatial_index is not None and len(rows):
+            self.spatial_index.update([self._keys[row] for row in rows], self._location[rows])
+
+    def _rows_of(self, entity_ids: list) -> np.ndarray:
+        if entity_ids is None:
+            return np.arange(len(self._keys))
+        return np.fromiter((self._rows[e] for e in entity_ids), dtype=np.intp,
+                           count=len(entity_ids))
+
+    def get_locations(self, entity_ids: list = None) -> np.ndarray:
+        """
+        :param entity_ids: Entities to read, all of them (in get_entity_ids order) if None.
+        :return: (N, 3) array of ECEF locations.
+        """
+        with self._lock:
+            return self._location[self._rows_of(entity_ids)]
+
+    def set_locations(self, entity_ids: list, locations: np.ndarray) -> None:
+        with self._lock:
+            rows = self._rows_of(entity_ids)
+            self._location[rows] = locations
+            self._index_rows(rows)
+
+    def get_velocities(self, entity_ids: list = None) -> np.ndarray:
+        with self._lock:
+            return self._velocity[self._rows_of(entity_ids)]
+
+    def set_velocities(self, entity_ids: list, velocities: np.ndarray) -> None:
+        with self._lock:
+            self._velocity[self._rows_of(entity_ids)] = velocities
+
+    def get_orientations(self, entity_ids: list = None) -> np.ndarray:
+        """
+        :return: (N, 3) array of psi, theta, phi in radians.
+        """
+        with self._lock:
+            return self._orientation[self._rows_of(entity_ids)]
+
+    def set_orientations(self, entity_ids: list, orientations: np.ndarray) -> None:
+        with self._lock:
+            self._orientation[self._rows_of(entity_ids)] = orientations
+
+    def get_geodetic_positions(self, entity_ids: list = None) -> np.ndarray:
+        """
+        :return: (N, 3) array of lat, lon in radians and alt in meters.
+        """
+        with self._lock:
+            return self.kinematics.get_geodetic(self._rows_of(entity_ids))
+
+    def set_geodetic_positions(self, entity_ids: list, positions: np.ndarray) -> None:
+        """
+        :param positions: (N, 3) array of lat, lon in radians and alt in meters.
+        """
+        lat, lon, alt = np.asarray(positions, dtype=np.float64).T
+        with self._lock:
+            rows = self._rows_of(entity_ids)
+            self.kinematics.set_geodetic(rows, lat, lon, alt)
+            self._index_rows(rows)
+
+    def step_kinematics(self, dt: float, entity_ids: list = None) -> None:
+        """
+        Advance entities along their great-circle tracks in one vectorized call.
+
+        :param dt: Time elapsed since last update in seconds.
+        :param entity_ids: Entities to advance, the locally simulated ones if None.
+        """
+        with self._lock:
+            count = len(self._keys)
+            if entity_ids is None:
+                rows = np.flatnonzero(self.kinematics.simulated[:count])
+            else:
+                rows = self._rows_of(entity_ids)
+            self._index_rows(self.kinematics.step(dt, rows))
+
+    def get_fuel_quantities(self, entity_ids: list = None) -> np.ndarray:
+        with self._lock:
+            return self._fuel_quantity[self._rows_of(entity_ids)]
+
+    def set_fuel_quantities(self, entity_ids: list, quantities: np.ndarray) -> None:
+        with self._lock:
+            self._fuel_quantity[self._rows_of(entity_ids)] = quantities
+
+    def apply_fuel_consumption(self, consumed: np.ndarray, entity_ids: list = None,
+                               initial_quantity: float = 0.0) -> None:
+        """
+        Subtract consumed fuel from entities, never below 0, reading and writing under one lock.
+
+        :param consumed: Liters consumed by each entity.
+        :param entity_ids: Entities to update, all of them (in get_entity_ids order) if None.
+        :param initial_quantity: Fuel of entities not tracked yet.
+        """
+        with self._lock:
+            rows = self._rows_of(entity_ids)
+            consumed = np.asarray(consumed)
+            if consumed.ndim and len(consumed) != len(rows):
+                raise ValueError(f"{len(consumed)} consumptions for {len(rows)} entities")
+            quantities = self._fuel_quantity[rows]
+            quantities[np.isnan(quantities)] = initial_quantity
+            quantities -= consumed
+            self._fuel_quantity[rows] = np.maximum(quantities, 0)
+
+    def get_entity(self, entity_id: tuple) -> "EntityView":
+        """
+        Return a view exposing the EntityManager accessors for one entity of the store.
+        """
+        if entity_id not in self._rows:
+            raise KeyError(f"Unknown entity {entity_id}")
+        return EntityView(self, entity_id)
+
+
+class EntityView:
+    """
+    Accessors of one EntityStore row, named after the EntityManager ones so both can be used
+    interchangeably. Values are copied in and out of the store.
+    """
+
+    __slots__ = ("_store", "_entity_id")
+
+    def __init__(self, store: EntityStore, entity_id: tuple) -> None:
+        self._store = store
+        self._entity_id = entity_id
+
+    def _row(self) -> int:
+        return self._store._rows[self._entity_id]
+
+    def get_entity_id(self) -> int:
+        return self._entity_id[2]
+
+    def get_entity_location(self) -> Vector3Double:
+        location = Vector3Double()
+        with self._store._lock:
+            location.x, location.y, location.z = self._store._location[self._row()].tolist()
+        return location
+
+    def set_entity_location(self, location: Vector3Double) -> None:
+        with self._store._lock:
+            self._store._location[self._row()] = (location.x, location.y, location.z)
+
+    def get_entity_linear_velocity(self) -> Vector3Float:
+        velocity = Vector3Float()
+        with self._store._lock:
+            velocity.x, velocity.y, velocity.z = self._store._velocity[self._row()].tolist()
+        return velocity
+
+    def set_entity_linear_velocity(self, velocity: Vector3Float) -> None:
+        with self._store._lock:
+            self._store._velocity[self._row()] = (velocity.x, velocity.y, velocity.z)
+
+    def get_entity_orientation(self) -> EulerAngles:
+        orientation = EulerAngles()
+        with self._store._lock:
+            psi, theta, phi = self._store._orientation[self._row()].tolist()
+        orientation.psi, orientation.theta, orientation.phi = psi, theta, phi
+        return orientation
+
+    def set_entity_orientation(self, orientation: EulerAngles) -> None:
+        with self._store._lock:
+            self._store._orientation[self._row()] = (orientation.psi, orientation.theta,
+                                                     orientation.phi)
+
+    def get_entity_appearance(self) -> int:
+        with self._store._lock:
+            return int(self._store._appearance[self._row()])
+
+    def set_entity_appearance(self, appearance: int) -> None:
+        with self._store._lock:
+            self._store._appearance[self._row()] = appearance
+
+    def get_capabilities(self) -> int:
+        with self._store._lock:
+            return int(self._store._capabilities[self._row()])
+
+    def get_force_id(self) -> int:
+        with self._store._lock:
+            return int(self._store._force_id[self._row()])
+
+    def set_force_id(self, force_id: int) -> None:
+        with self._store._lock:
+            self._store._force_id[self._row()] = force_id
+
+    def get_entity_type(self) -> EntityType:
+        entity_type = EntityType()
+        with self._store._lock:
+            values = self._store._entity_type[self._row()].tolist()
+        (entity_type.entityKind, entity_type.domain, entity_type.country, entity_type.category,
+         entity_type.subcategory, entity_type.specific, entity_type.extra) = values
+        return entity_type
+
+    def get_marking(self) -> EntityMarking:
+        marking = EntityMarking()
+        with self._store._lock:
+            values = self._store._marking[self._row()].tolist()
+        marking.characterSet = values[0]
+        marking.characters = values[1:]
+        return marking
+
+    def get_dead_reckoning_params(self) -> DeadReckoningParameters:
+        params = DeadReckoningParameters()
+        with self._store._lock:
+            params.deadReckoningAlgorithm = int(self._store._dr_algorithm[self._row()])
+        return params
+
+    def get_fuel_quantity(self) -> float:
+        with self._store._lock:
+            return float(self._store._fuel_quantity[self._row()])
+
+    def set_fuel_quantity(self, quantity: float) -> None:
+        with self._store._lock:
+            self._store._fuel_quantity[self._row()] = quantity
@@ -0,0 +1,189 @@
+"""Entities simulated locally, stepped in parallel by a ShardedEngine."""
+
+import datetime
+import logging
+import threading
+
+import numpy as np
+
+from lib.kinematics.shardedEngine import ShardedEngine
+from lib.simulation.communication import espduEncoder
+
+from opendis.dis7 import EntityStatePdu
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("Fleet")
+
+
+class Fleet:
+    """
+    Entities this simulator owns besides its own entity, identified by (site, application,
+    entity) with the simulator site and application. Their kinematics and fuel live in a
+    ShardedEngine; the process holding the Fleet is the coordinator and does all the network I/O
+    for them.
+
+    The state of every entity right after loading is kept, reset brings the fleet back to it for
+    the next exercise. step and reset run on the scheduler thread, snapshot and encode_espdus may
+    run on others: the lock keeps them from reading rows half stepped.
+    """
+
+    def __init__(self, engine: ShardedEngine, site_id: int, application_id: int) -> None:
+        self.engine = engine
+        self.site_id = site_id
+        self.application_id = application_id
+        self.entity_ids = []    # (site, application, entity) by engine index
+        self._entities = set()    # Entity numbers
+        self._statics = []    # (force ID, entity type, marking) by engine index
+        self._initial_state = engine.save_state()
+        self._next_espdu = 0    # Engine index of the next entity encode_espdus sends
+        self._pdu = EntityStatePdu()    # Reused for every entity
+        self._encoder = espduEncoder.EntityStatePduEncoder()
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def from_json(cls, items: list, engine: ShardedEngine, site_id: int,
+                  application_id: int) -> "Fleet":
+        """
+        Build the fleet from the fleet JSON entries. Only entity_id, lat and lon are required,
+        see add_entity for the other fields.
+        """
+        fleet = cls(engine, site_id, application_id)
+        for item in items:
+            fleet.add_entity(item['entity_id'], item['lat'], item['lon'], item.get('alt', 0.0),
+                             item.get('heading', 0.0), item.get('pitch', 0.0),
+                             item.get('speed', 0.0), item.get('fuel'), item.get('force_id', 0),
+                             tuple(item.get('entity_type', (0,) * 7)), item.get('marking', ""))
+        logger.info("Fleet of %d entities loaded, %d workers", len(fleet), engine.workers)
+        return fleet
+
+    def __len__(self) -> int:
+        return len(self.entity_ids)
+
+    def add_entity(self, entity_id: int, lat: float, lon: float, alt: float = 0.0,
+                   heading: float = 0.0, pitch: float = 0.0, speed: float = 0.0,
+                   fuel: float = None, force_id: int = 0, entity_type: tuple = (0,) * 7,
+                   marking: str = "") -> None:
+        """
+        Add an entity, part of the state reset goes back to.
+
+        :param entity_id: Entity number, unique within the simulator.
+        :param lat: Latitude in decimal degrees.
+        :param lon: Longitude in decimal degrees.
+        :param alt: Altitude in meters.
+        :param heading: Heading in decimal degrees.
+        :param pitch: Pitch in decimal degrees.
+        :param speed: Speed in meters per second.
+        :param fuel: Fuel in liters, the engine initial_fuel if None.
+        :param entity_type: (kind, domain, country, category, subcategory, specific, extra).
+        :param marking: Up to 11 ASCII characters.
+        """
+        if entity_id in self._entities:
+            raise ValueError(f"Fleet entity {entity_id} already exists")
+        with self._lock:
+            index = self.engine.add_entity(lat, lon, alt, pitch=pitch, yaw=heading, speed=speed,
+                                           fuel=fuel)
+            assert index == len(self.entity_ids)    # Fleet entities are never removed
+            self.entity_ids.append((self.site_id, self.application_id, entity_id))
+            self._entities.add(entity_id)
+            self._statics.append((force_id, entity_type, marking))
+
+    def _save_added(self) -> None:
+        """
+        Add the entities added since the last step to the state reset goes back to. Called with
+        the lock held.
+        """
+        saved = len(self._initial_state["active"])
+        if saved < len(self.entity_ids):    # Added rows are always the last ones
+            state = self.engine.save_state()
+            self._initial_state = {name: np.concatenate((self._initial_state[name],
+                                                         column[saved:]))
+                                   for name, column in state.items()}
+
+    def owns(self, entity_id) -> bool:
+        """
+        Return True if entity_id, an opendis EntityID, is a fleet entity.
+        """
+        return entity_id.entityID in self._entities and entity_id.siteID == self.site_id and \
+            entity_id.applicationID == self.application_id
+
+    def step(self, dt: float) -> None:
+        """
+        :param dt: Time elapsed since last step in seconds.
+        """
+        with self._lock:
+            if not self._closed:
+                self._save_added()
+                self.engine.step(dt)
+
+    def reset(self) -> None:
+        """
+        Bring every entity back to its state when added.
+        """
+        with self._lock:
+            if not self._closed:
+                self._save_added()
+                self.engine.restore_state(self._initial_state)
+                self._next_espdu = 0
+
+    def snapshot(self) -> tuple:
+        """
+        :return: (entity IDs, (N, 3) ECEF locations, (N, 3) psi, theta, phi orientations).
+        """
+        with self._lock:
+            if self._closed:
+                return [], np.empty((0, 3)), np.empty((0, 3))
+            locations = np.column_stack(self.engine.get_ecef_positions())
+            orientations = self.engine.get_orientations()
+        return list(self.entity_ids), locations, orientations
+
+    def encode_espdus(self, count: int, exercise_id: int, algorithm: int) -> list:
+        """
+        Encode the ESPDUs of the next count entities, round robin, so calling it often with a
+        small count spreads the fleet updates evenly.
+
+        :param algorithm: Dead reckoning algorithm announced.
+        :return: Encoded PDUs, bytes.
+        """
+        with self._lock:
+            if self._closed or not self.entity_ids:
+                return []
+            count = min(count, len(self.entity_ids))
+            rows = np.arange(self._next_espdu, self._next_espdu + count) % len(self.entity_ids)
+            self._next_espdu = int(rows[-1]) + 1
+            locations = np.column_stack(self.engine.get_ecef_positions(rows))
+            velocities = self.engine.get_ecef_velocities(rows)
+            orientations = self.engine.get_orientations(rows)
+        pdu = self._pdu
+        pdu.exerciseID = exercise_id
+        pdu.entityID.siteID = self.site_id
+        pdu.entityID.applicationID = self.application_id
+        pdu.timestamp = int(datetime.datetime.now().timestamp())
+        pdu.deadReckoningParameters.deadReckoningAlgorithm = algorithm
+        pdus = []
+        for row, location, velocity, orientation in zip(rows.tolist(), locations.tolist(),
+                                                        velocities.tolist(),
+                                                        orientations.tolist()):
+            force_id, entity_type, marking = self._statics[row]
+            pdu.entityID.entityID = self.entity_ids[row][2]
+            pdu.forceId = force_id
+            (pdu.entityType.entityKind, pdu.entityType.domain, pdu.entityType.country,
+             pdu.entityType.category, pdu.entityType.subcategory, pdu.entityType.specific,
+             pdu.entityType.extra) = entity_type
+            pdu.marking.setString(marking)
+            self._encoder.set_static(pdu)
+            (pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z) = location
+            (pdu.entityLinearVelocity.x, pdu.entityLinearVelocity.y,
+             pdu.entityLinearVelocity.z) = velocity
+            (pdu.entityOrientation.psi, pdu.entityOrientation.theta,
+             pdu.entityOrientation.phi) = orientation
+            pdus.append(bytes(self._encoder.encode(pdu)))
+        return pdus
+
+    def close(self) -> None:
+        """Stop the engine workers and release its shared memory."""
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self.engine.close()
@@ -0,0 +1,140 @@
+"""Track entities seen on the wire and dead reckon them between updates."""
+
+import logging
+import time
+
+import numpy as np
+
+from lib.entity.entityStore import EntityStore
+from lib.kinematics import deadReckoning
+
+from opendis.dis7 import EntityStatePdu
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("RemoteEntityTable")
+
+
+class RemoteEntityTable(EntityStore):
+    """
+    EntityStore that also keeps, for every entity updated from an ESPDU, the dead reckoning
+    parameters and the local monotonic time the ESPDU was received at. From them the table
+    extrapolates the current location and orientation of all entities in one vectorized call, and
+    drops the entities that stopped reporting.
+
+    Entities added with add_entity (not from an ESPDU) have no receive time: they are returned
+    as they are by extrapolate and never expire.
+
+    The spatial index, if any, holds the dead reckoned locations of the last extrapolate or
+    snapshot call, or the received ones if newer.
+    """
+
+    def __init__(self, capacity: int = 64, clock=time.monotonic, spatial_index=None) -> None:
+        """
+        :param clock: Function returning the current time in seconds, used to timestamp updates.
+        """
+        self.clock = clock
+        super().__init__(capacity, spatial_index)
+
+    def _allocate(self, capacity: int) -> None:
+        super()._allocate(capacity)
+        self._grow("_acceleration", (3,), np.float32)         # m/s^2, world or body per algorithm
+        self._grow("_angular_velocity", (3,), np.float32)     # Body rad/s
+        self._grow("_update_time", (), np.float64, np.nan)    # Receive time, NaN if never updated
+
+    def _set_row_data(self, row: int, pdu: EntityStatePdu) -> None:
+        super()._set_row_data(row, pdu)
+        params = pdu.deadReckoningParameters
+        self._acceleration[row] = (params.entityLinearAcceleration.x,
+                                   params.entityLinearAcceleration.y,
+                                   params.entityLinearAcceleration.z)
+        self._angular_velocity[row] = (params.entityAngularVelocity.x,
+                                       params.entityAngularVelocity.y,
+                                       params.entityAngularVelocity.z)
+        self._update_time[row] = self.clock()
+
+    def get_update_times(self, entity_ids: list = None) -> np.ndarray:
+        with self._lock:
+            return self._update_time[self._rows_of(entity_ids)]
+
+    def extrapolate(self, now: float = None, entity_ids: list = None) -> tuple:
+        """
+        Dead reckon entities from their last ESPDU to now.
+
+        :param now: Time on the table clock, current time if None.
+        :param entity_ids: Entities to extrapolate, all of them (in get_entity_ids order) if None.
+        :return: (locations, orientations), (N, 3) arrays of ECEF meters and psi, theta, phi.
+        """
+        if now is None:
+            now = self.clock()
+        with self._lock:
+            if entity_ids is None:
+                entity_ids = list(self._keys)
+            state = self._dead_reckoning_state(self._rows_of(entity_ids))
+        locations, orientations = self._extrapolate(now, *state)
+        self._index_locations(entity_ids, locations)
+        return locations, orientations
+
+    def snapshot(self, now: float = None) -> tuple:
+        """
+        Dead reckon every entity to now, together with the IDs read under the same lock.
+
+        :return: (entity IDs, locations, orientations).
+        """
+        if now is None:
+            now = self.clock()
+        with self._lock:
+            entity_ids = list(self._keys)
+            state = self._dead_reckoning_state(self._rows_of(None))
+        locations, orientations = self._extrapolate(now, *state)
+        self._index_locations(entity_ids, locations)
+        return entity_ids, locations, orientations
+
+    def _index_locations(self, entity_ids: list, locations: np.ndarray) -> None:
+        """
+        Write extrapolated locations to the spatial index, skipping the entities removed since
+        they were read.
+        """
+        if self.spatial_index is None:
+            return
+        with self._lock:
+            present = [i for i, entity_id in enumerate(entity_ids) if entity_id in self._rows]
+            if len(present) != len(entity_ids):
+                entity_ids = [entity_ids[i] for i in present]
+                locations = locations[present]
+            self.spatial_index.update(entity_ids, locations)
+
+    def _dead_reckoning_state(self, rows: np.ndarray) -> tuple:
+        """
+        Copy the dead reckoning inputs of rows. Called with the lock held.
+        """
+        return (self._dr_algorithm[rows], self._location[rows], self._velocity[rows],
+                self._acceleration[rows], self._orientation[rows], self._angular_velocity[rows],
+                self._update_time[rows])
+
+    @staticmethod
+    def _extrapolate(now, algorithm, location, velocity, acceleration, orientation,
+                     angular_velocity, update_time) -> tuple:
+        if len(location) == 0:
+            return location, orientation.astype(np.float64)
+        dt = np.nan_to_num(now - update_time, nan=0.0)
+        return deadReckoning.extrapolate(algorithm, location, velocity, acceleration, orientation,
+                                         angular_velocity, dt)
+
+    def expire(self, timeout: float, now: float = None) -> list:
+        """
+        Remove the entities whose last ESPDU is older than timeout seconds.
+
+        :return: IDs of the removed entities.
+        """
+        if now is None:
+            now = self.clock()
+        with self._lock:
+            count = len(self._keys)
+            stale = np.flatnonzero(now - self._update_time[:count] > timeout)    # NaN never expires
+            expired = [self._keys[row] for row in stale]
+            for entity_id in reversed(expired):    # Last rows first, swap-remove moves live rows
+                self._remove_row(entity_id)
+        if expired:
+            logger.info("Expired %d remote entities: %s", len(expired), expired)
+        return expired
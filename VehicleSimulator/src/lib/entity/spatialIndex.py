@@ -0,0 +1,306 @@
+"""Uniform grid over ECEF positions answering radius, nearest neighbour and proximity queries."""
+
+import itertools
+import logging
+import math
+import threading
+
+import numpy as np
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("SpatialIndex")
+
+_CELL_BITS = 21    # Bits per packed cell coordinate, 3 of them fit in an int64
+_CELL_OFFSET = 1 << (_CELL_BITS - 1)
+_MAX_ECEF = 8.0e6    # Meters, beyond the Earth surface plus any aircraft altitude
+
+# Neighbour cells visited by query_pairs: the cell itself plus half of the 26 around it, so every
+# pair of adjacent cells is checked once.
+_HALF_NEIGHBOURHOOD = [offset for offset in itertools.product((-1, 0, 1), repeat=3)
+                       if offset > (0, 0, 0)]
+
+
+def _pack(cells: np.ndarray) -> np.ndarray:
+    cells = cells.astype(np.int64) + _CELL_OFFSET
+    return (cells[..., 0] << (2 * _CELL_BITS)) | (cells[..., 1] << _CELL_BITS) | cells[..., 2]
+
+
+class SpatialIndex:
+    """
+    Entities are bucketed into cubic cells of cell_size meters by ECEF position. The packed cell
+    key of every entity is kept sorted, so the entities of a cell are a contiguous slice found with
+    a binary search, and all cells of a query are searched in one vectorized call.
+
+    Moving an entity within its cell only overwrites its position. The sorted keys are rebuilt
+    lazily, on the next query, and only after some entity changed cell or was added or removed.
+
+    Entities are identified like in EntityStore, by (site, application, entity) tuples. A single
+    lock serializes updates and queries: the store updates the index from the receive, kinematics
+    and expiry threads while tools query it from their own.
+    """
+
+    def __init__(self, cell_size: float = 10000.0, capacity: int = 64) -> None:
+        """
+        :param cell_size: Cell edge in meters. Queries are fastest with radii close to it.
+        """
+        if cell_size * (_CELL_OFFSET - 1) < _MAX_ECEF:
+            raise ValueError(f"Cell size {cell_size} m too small, min is "
+                             f"{_MAX_ECEF / (_CELL_OFFSET - 1):.1f} m")
+        self.cell_size = float(cell_size)
+        self._lock = threading.Lock()
+        self._rows = {}    # (site, application, entity) -> row
+        self._keys = []    # row -> (site, application, entity)
+        self._positions = np.zeros((max(capacity, 1), 3))
+        self._cells = np.zeros(max(capacity, 1), dtype=np.int64)    # Packed cell key of each row
+        self._dirty = False
+        self._order = np.zeros(0, dtype=np.intp)    # Rows sorted by cell key
+        self._sorted_cells = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, entity_id: tuple) -> bool:
+        return entity_id in self._rows
+
+    def get_entity_ids(self) -> list:
+        with self._lock:
+            return list(self._keys)
+
+    def get_positions(self, entity_ids: list = None) -> np.ndarray:
+        """
+        :return: (N, 3) ECEF positions, of all entities (in get_entity_ids order) if None.
+        """
+        with self._lock:
+            if entity_ids is None:
+                return self._positions[:len(self._keys)].copy()
+            return self._positions[[self._rows[e] for e in entity_ids]]
+
+    def _cell_of(self, positions: np.ndarray) -> np.ndarray:
+        return _pack(np.floor(positions / self.cell_size))
+
+    def update(self, entity_ids: list, positions: np.ndarray) -> None:
+        """
+        Insert entities or move them to new positions.
+
+        :param positions: (N, 3) ECEF positions in meters.
+        """
+        with self._lock:
+            self._update(entity_ids, positions)
+
+    def _row_of(self, entity_id: tuple) -> int:
+        row = self._rows.get(entity_id)
+        if row is None:
+            row = len(self._keys)
+            if row == len(self._positions):
+                self._grow(2 * row)
+            self._rows[entity_id] = row
+            self._keys.append(entity_id)
+            self._cells[row] = -1    # Forces a cell change on the first update
+        return row
+
+    def _update(self, entity_ids: list, positions: np.ndarray) -> None:
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        if len(entity_ids) == 1:    # One ESPDU, plain Python is several times faster than NumPy
+            self._update_one(entity_ids[0], *positions[0].tolist())
+            return
+        rows = np.fromiter((self._row_of(e) for e in entity_ids), dtype=np.intp,
+                           count=len(entity_ids))
+        cells = self._cell_of(positions)
+        if not self._dirty and np.any(self._cells[rows] != cells):
+            self._dirty = True
+        self._positions[rows] = positions
+        self._cells[rows] = cells
+
+    def _update_one(self, entity_id: tuple, x: float, y: float, z: float) -> None:
+        size = self.cell_size
+        cell = (((math.floor(x / size) + _CELL_OFFSET) << (2 * _CELL_BITS))
+                | ((math.floor(y / size) + _CELL_OFFSET) << _CELL_BITS)
+                | (math.floor(z / size) + _CELL_OFFSET))
+        row = self._row_of(entity_id)
+        if self._cells[row] != cell:
+            self._cells[row] = cell
+            self._dirty = True
+        self._positions[row] = (x, y, z)
+
+    def _grow(self, capacity: int) -> None:
+        positions = np.zeros((capacity, 3))
+        positions[:len(self._positions)] = self._positions
+        cells = np.zeros(capacity, dtype=np.int64)
+        cells[:len(self._cells)] = self._cells
+        self._positions, self._cells = positions, cells
+
+    def remove(self, entity_id: tuple) -> None:
+        """Remove an entity. Does nothing if it is not indexed."""
+        with self._lock:
+            if entity_id in self._rows:
+                self._remove(entity_id)
+
+    def _remove(self, entity_id: tuple) -> None:
+        row = self._rows.pop(entity_id)
+        last = len(self._keys) - 1
+        last_id = self._keys.pop()
+        if row != last:
+            self._positions[row] = self._positions[last]
+            self._cells[row] = self._cells[last]
+            self._rows[last_id] = row
+            self._keys[row] = last_id
+        self._dirty = True
+
+    def sync(self, entity_ids: list, positions: np.ndarray) -> None:
+        """
+        Make the index hold exactly the given entities: missing ones are removed, the rest are
+        inserted or moved.
+        """
+        with self._lock:
+            if len(entity_ids) != len(self._keys) or entity_ids != self._keys:
+                wanted = set(entity_ids)
+                for entity_id in [e for e in self._keys if e not in wanted]:
+                    self._remove(entity_id)
+            self._update(entity_ids, positions)
+
+    def clear(self) -> None:
+        """Remove every entity."""
+        with self._lock:
+            self._rows.clear()
+            self._keys.clear()
+            self._dirty = True
+
+    def _refresh(self) -> None:
+        if not self._dirty:
+            return
+        count = len(self._keys)
+        self._order = np.argsort(self._cells[:count], kind="stable")
+        self._sorted_cells = self._cells[:count][self._order]
+        self._dirty = False
+
+    def _cube_rows(self, point: np.ndarray, span: int) -> np.ndarray:
+        """
+        Return rows of the entities in the (2 * span + 1)^3 cells centered on the cell of point.
+        """
+        center = np.floor(point / self.cell_size).astype(np.int64)
+        steps = np.arange(-span, span + 1)
+        offsets = np.stack(np.meshgrid(steps, steps, steps, indexing="ij"), axis=-1).reshape(-1, 3)
+        keys = _pack(center + offsets)
+        starts = np.searchsorted(self._sorted_cells, keys, side="left")
+        ends = np.searchsorted(self._sorted_cells, keys, side="right")
+        hit = ends > starts
+        if not hit.any():
+            return np.zeros(0, dtype=np.intp)
+        ranges = [self._order[s:e] for s, e in zip(starts[hit], ends[hit])]
+        return np.concatenate(ranges)
+
+    def _span_for(self, radius: float) -> int:
+        return max(1, math.ceil(radius / self.cell_size))
+
+    def query_radius(self, point, radius: float) -> list:
+        """
+        Return IDs of the entities within radius meters of point, nearest first.
+
+        :param point: ECEF position in meters.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        with self._lock:
+            return self._query_radius(point, radius)
+
+    def _query_radius(self, point: np.ndarray, radius: float) -> list:
+        self._refresh()
+        span = self._span_for(radius)
+        if (2 * span + 1) ** 3 > len(self._keys):    # Fewer entities than cells, scan them all
+            rows = np.arange(len(self._keys))
+        else:
+            rows = self._cube_rows(point, span)
+        distances = np.linalg.norm(self._positions[rows] - point, axis=1)
+        inside = distances <= radius
+        rows, distances = rows[inside], distances[inside]
+        return [self._keys[row] for row in rows[np.argsort(distances)]]
+
+    def query_knn(self, point, k: int) -> tuple:
+        """
+        Return the k entities nearest to point.
+
+        :param point: ECEF position in meters.
+        :return: (IDs, distances in meters), nearest first. Shorter than k if the index is.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        with self._lock:
+            return self._query_knn(point, k)
+
+    def _query_knn(self, point: np.ndarray, k: int) -> tuple:
+        self._refresh()
+        count = len(self._keys)
+        k = min(k, count)
+        if k <= 0:
+            return [], np.zeros(0)
+        span = 1
+        while True:
+            # Every entity within span cells' distance of point lies inside the cube
+            if (2 * span + 1) ** 3 > count:
+                rows = np.arange(count)
+                exhaustive = True
+            else:
+                rows = self._cube_rows(point, span)
+                exhaustive = False
+            distances = np.linalg.norm(self._positions[rows] - point, axis=1)
+            if exhaustive or len(rows) >= k:
+                nearest = np.argpartition(distances, k - 1)[:k]
+                nearest = nearest[np.argsort(distances[nearest])]
+                if exhaustive or distances[nearest[-1]] <= span * self.cell_size:
+                    return [self._keys[row] for row in rows[nearest]], distances[nearest]
+            span *= 2
+
+    def query_pairs(self, radius: float) -> tuple:
+        """
+        Find every pair of entities closer than radius meters, without comparing all pairs.
+
+        :param radius: Max distance in meters, must not exceed cell_size.
+        :return: (first, second, distances) arrays. first and second index get_entity_ids(), with
+                 first < second.
+        """
+        if radius > self.cell_size:
+            raise ValueError(f"Radius {radius} m larger than cell size {self.cell_size} m")
+        with self._lock:
+            return self._query_pairs(radius)
+
+    def _query_pairs(self, radius: float) -> tuple:
+        self._refresh()
+        order, sorted_cells = self._order, self._sorted_cells
+        positions = self._positions
+        unique_cells, cell_starts, cell_counts = np.unique(sorted_cells, return_index=True,
+                                                           return_counts=True)
+        firsts, seconds = [], []
+
+        # Pairs inside each cell
+        for size in np.unique(cell_counts[cell_counts > 1]):
+            starts = cell_starts[cell_counts == size]
+            i, j = np.triu_indices(size, 1)
+            firsts.append(order[(starts[:, None] + i).ravel()])
+            seconds.append(order[(starts[:, None] + j).ravel()])
+
+        # Pairs across a cell and one of its neighbours
+        for offset in _HALF_NEIGHBOURHOOD:
+            shift = _pack(np.array(offset)) - _pack(np.zeros(3))
+            neighbour_starts = np.searchsorted(sorted_cells, unique_cells + shift, side="left")
+            neighbour_ends = np.searchsorted(sorted_cells, unique_cells + shift, side="right")
+            neighbour_counts = neighbour_ends - neighbour_starts
+            hit = neighbour_counts > 0
+            if not hit.any():
+                continue
+            pair_counts = cell_counts[hit] * neighbour_counts[hit]
+            cell = np.repeat(np.arange(len(unique_cells))[hit], pair_counts)
+            rank = np.arange(pair_counts.sum()) - np.repeat(np.cumsum(pair_counts) - pair_counts,
+                                                           pair_counts)
+            width = neighbour_counts[hit].repeat(pair_counts)
+            firsts.append(order[cell_starts[cell] + rank // width])
+            seconds.append(order[neighbour_starts[hit].repeat(pair_counts) + rank % width])
+
+        if not firsts:
+            empty = np.zeros(0, dtype=np.intp)
+            return empty, empty, np.zeros(0)
+        first, second = np.concatenate(firsts), np.concatenate(seconds)
+        distances = np.linalg.norm(positions[first] - positions[second], axis=1)
+        close = distances <= radius
+        first, second, distances = first[close], second[close], distances[close]
+        swap = first > second
+        first[swap], second[swap] = second[swap], first[swap]
+        return first, second, distances
@@ -1,14 +1,20 @@
 """TBD"""
 
 import configparser
+import math
+
+import numpy as np
 
 __author__ = "EnriqueMoran"
 
+from lib.entity.entityStore import EntityStore
+
 from opendis.dis7 import EngineFuel, EngineFuelReload
 
 class FuelManager:
 
-    def __init__(self) -> None:
+    def __init__(self, entity_store: EntityStore = None) -> None:
+        self.entity_store = entity_store
         self.engine_fuel = EngineFuel()
         self.engine_fuel.fuelMeasurementUnits = 1         # Liter
         self.engine_fuel.fuelType = 2                     # Diesel fuel
@@ -34,24 +40,53 @@ class FuelManager:
         self.engine_fuel_reload.standardQuantity = self.engine_fuel_reload.maximumQuantity
         self.engine_fuel_reload.standardQuantityReloadTime = self.engine_fuel_reload.maximumQuantityReloadTime
 
-    def process_fuel_consumption(self, distance_traveled: float) -> None:
+    def get_fuel_quantity(self, entity_id: tuple = None) -> float:
+        """
+        Return remaining fuel of the own entity, or of an EntityStore entity if entity_id is given.
+        Store entities whose fuel has not been tracked yet start with a full tank.
+        """
+        if entity_id is None:
+            return self.engine_fuel.fuelQuantity
+        quantity = self.entity_store.get_entity(entity_id).get_fuel_quantity()
+        return self.initial_fuel_quantity if math.isnan(quantity) else quantity
+
+    def _set_fuel_quantity(self, quantity: float, entity_id: tuple = None) -> None:
+        if entity_id is None:
+            self.engine_fuel.fuelQuantity = quantity
+        else:
+            self.entity_store.get_entity(entity_id).set_fuel_quantity(quantity)
+
+    def process_fuel_consumption(self, distance_traveled: float, entity_id: tuple = None) -> None:
         """
         :params distance_traveled: distance traveled in meters.
+        :params entity_id: (site, application, entity) of an EntityStore entity, own entity if None.
         """
         consumed_fuel = self._consumption_rate * (distance_traveled / 1000)
-        remaining_fuel = self.engine_fuel.fuelQuantity - consumed_fuel
-        self.engine_fuel.fuelQuantity = remaining_fuel if remaining_fuel >= 0 else 0
+        remaining_fuel = self.get_fuel_quantity(entity_id) - consumed_fuel
+        self._set_fuel_quantity(remaining_fuel if remaining_fuel >= 0 else 0, entity_id)
+
+    def process_fleet_fuel_consumption(self, distances_traveled: np.ndarray,
+                                       entity_ids: list = None) -> None:
+        """
+        Apply fuel consumption to many EntityStore entities at once.
+
+        :params distances_traveled: distance traveled in meters by each entity.
+        :params entity_ids: entities to update, every stored entity if None.
+        """
+        consumed = self._consumption_rate * (np.asarray(distances_traveled) / 1000)
+        self.entity_store.apply_fuel_consumption(consumed, entity_ids, self.initial_fuel_quantity)
     
-    def add_fuel(self, fuel_quantity: float) -> float:
+    def add_fuel(self, fuel_quantity: float, entity_id: tuple = None) -> float:
         """
         Return the excess of fuel.
         """
         excess_fuel = 0
-        self.engine_fuel.fuelQuantity += fuel_quantity
-        if self.engine_fuel.fuelQuantity > self.engine_fuel_reload.maximumQuantity:
-            excess_fuel = self.engine_fuel.fuelQuantity - self.engine_fuel_reload.maximumQuantity
-            self.engine_fuel.fuelQuantity = self.engine_fuel_reload.maximumQuantity
+        quantity = self.get_fuel_quantity(entity_id) + fuel_quantity
+        if quantity > self.engine_fuel_reload.maximumQuantity:
+            excess_fuel = quantity - self.engine_fuel_reload.maximumQuantity
+            quantity = self.engine_fuel_reload.maximumQuantity
+        self._set_fuel_quantity(quantity, entity_id)
         return excess_fuel
     
-    def reset_fuel(self) -> None:
-        self.engine_fuel.fuelQuantity = self.initial_fuel_quantity
\ No newline at end of file
+    def reset_fuel(self, entity_id: tuple = None) -> None:
+        self._set_fuel_quantity(self.initial_fuel_quantity, entity_id)
\ No newline at end of file
@@ -0,0 +1,292 @@
+"""IEEE 1278.1-2012 Annex E dead reckoning algorithms and the local emitter model."""
+
+import math
+
+from enum import IntEnum
+
+import numpy as np
+
+__author__ = "EnriqueMoran"
+
+
+class DeadReckoningAlgorithm(IntEnum):
+    """SISO-REF-010 Dead Reckoning Algorithm enumeration."""
+    OTHER = 0
+    STATIC = 1
+    FPW = 2    # DRM(F, P, W): constant velocity, world coordinates
+    RPW = 3    # DRM(R, P, W): constant velocity, rotating, world coordinates
+    RVW = 4    # DRM(R, V, W): constant acceleration, rotating, world coordinates
+    FVW = 5    # DRM(F, V, W): constant acceleration, world coordinates
+    FPB = 6    # DRM(F, P, B): constant velocity, body coordinates
+    RPB = 7    # DRM(R, P, B): constant velocity, rotating, body coordinates
+    RVB = 8    # DRM(R, V, B): constant acceleration, rotating, body coordinates
+    FVB = 9    # DRM(F, V, B): constant acceleration, body coordinates
+
+    def to_string(self) -> str:
+        return self.name
+
+
+_ROTATING = np.array([a in (3, 4, 7, 8) for a in range(16)])
+_ACCELERATED = np.array([a in (4, 5, 8, 9) for a in range(16)])
+_BODY = np.array([a in (6, 7, 8, 9) for a in range(16)])
+_MOVING = np.array([2 <= a <= 9 for a in range(16)])
+
+
+def euler_to_matrix(orientation: np.ndarray) -> np.ndarray:
+    """
+    Build world-to-body rotation matrices from DIS Euler angles (z-y-x rotation order).
+
+    :param orientation: (N, 3) array of psi, theta, phi in radians.
+    :return: (N, 3, 3) array.
+    """
+    psi, theta, phi = orientation[:, 0], orientation[:, 1], orientation[:, 2]
+    cpsi, spsi = np.cos(psi), np.sin(psi)
+    cth, sth = np.cos(theta), np.sin(theta)
+    cphi, sphi = np.cos(phi), np.sin(phi)
+    matrix = np.empty((len(orientation), 3, 3))
+    matrix[:, 0, 0] = cth * cpsi
+    matrix[:, 0, 1] = cth * spsi
+    matrix[:, 0, 2] = -sth
+    matrix[:, 1, 0] = sphi * sth * cpsi - cphi * spsi
+    matrix[:, 1, 1] = sphi * sth * spsi + cphi * cpsi
+    matrix[:, 1, 2] = sphi * cth
+    matrix[:, 2, 0] = cphi * sth * cpsi + sphi * spsi
+    matrix[:, 2, 1] = cphi * sth * spsi - sphi * cpsi
+    matrix[:, 2, 2] = cphi * cth
+    return matrix
+
+
+def matrix_to_euler(matrix: np.ndarray) -> np.ndarray:
+    """
+    Inverse of euler_to_matrix.
+
+    :return: (N, 3) array of psi, theta, phi in radians.
+    """
+    psi = np.arctan2(matrix[:, 0, 1], matrix[:, 0, 0])
+    theta = -np.arcsin(np.clip(matrix[:, 0, 2], -1.0, 1.0))
+    phi = np.arctan2(matrix[:, 1, 2], matrix[:, 2, 2])
+    return np.stack((psi, theta, phi), axis=1)
+
+
+def _skew(w: np.ndarray) -> np.ndarray:
+    skew = np.zeros((len(w), 3, 3))
+    skew[:, 0, 1], skew[:, 0, 2] = -w[:, 2], w[:, 1]
+    skew[:, 1, 0], skew[:, 1, 2] = w[:, 2], -w[:, 0]
+    skew[:, 2, 0], skew[:, 2, 1] = -w[:, 1], w[:, 0]
+    return skew
+
+
+def _rotation_terms(angular_velocity: np.ndarray, dt: np.ndarray) -> tuple:
+    """
+    Return the Annex E matrices for body angular velocity w over dt:
+    DR = exp(-W dt) (world-to-body rotation increment), R1 = integral of exp(W t) and
+    R2 = integral of exp(W t) t, both from 0 to dt. Small rates fall back to Taylor expansions.
+    """
+    n = len(angular_velocity)
+    w = np.linalg.norm(angular_velocity, axis=1)
+    wt = w * dt
+    skew = _skew(angular_velocity)
+    outer = angular_velocity[:, :, None] * angular_velocity[:, None, :]
+    identity = np.broadcast_to(np.eye(3), (n, 3, 3))
+
+    small = w < 1e-9
+    ws = np.where(small, 1.0, w)    # Avoid division by zero, small rates are replaced below
+    s, c = np.sin(wt), np.cos(wt)
+
+    k_dr_outer = (1 - c) / ws**2
+    k_dr_skew = s / ws
+    k_r1_outer = (wt - s) / ws**3
+    k_r1_identity = s / ws
+    k_r1_skew = (1 - c) / ws**2
+    k_r2_outer = (0.5 * wt**2 - c - wt * s + 1) / ws**4
+    k_r2_identity = (c + wt * s - 1) / ws**2
+    k_r2_skew = (s - wt * c) / ws**3
+
+    k_dr_outer = np.where(small, 0.5 * dt**2, k_dr_outer)
+    k_dr_skew = np.where(small, dt, k_dr_skew)
+    k_r1_outer = np.where(small, dt**3 / 6, k_r1_outer)
+    k_r1_identity = np.where(small, dt, k_r1_identity)
+    k_r1_skew = np.where(small, 0.5 * dt**2, k_r1_skew)
+    k_r2_outer = np.where(small, dt**4 / 8, k_r2_outer)
+    k_r2_identity = np.where(small, 0.5 * dt**2, k_r2_identity)
+    k_r2_skew = np.where(small, dt**3 / 3, k_r2_skew)
+
+    def combine(k_outer, k_identity, k_skew):
+        return (k_outer[:, None, None] * outer + k_identity[:, None, None] * identity
+                + k_skew[:, None, None] * skew)
+
+    dr_matrix = combine(k_dr_outer, c, -k_dr_skew)
+    r1 = combine(k_r1_outer, k_r1_identity, k_r1_skew)
+    r2 = combine(k_r2_outer, k_r2_identity, k_r2_skew)
+    return dr_matrix, r1, r2
+
+
+def extrapolate(
+    algorithm,
+    location: np.ndarray,
+    velocity: np.ndarray,
+    acceleration: np.ndarray,
+    orientation: np.ndarray,
+    angular_velocity: np.ndarray,
+    dt,
+) -> tuple:
+    """
+    Dead reckon location and orientation of N entities.
+
+    Velocity is the world (ECEF) ESPDU Entity Linear Velocity for every algorithm. Acceleration is
+    taken as carried by the dead reckoning parameters: world values for the W algorithms, body
+    values for the B ones. Static and Other entities do not move.
+
+    :param algorithm: DeadReckoningAlgorithm of each entity, scalar or (N,) array.
+    :param location: (N, 3) ECEF location in meters.
+    :param velocity: (N, 3) world linear velocity in m/s.
+    :param acceleration: (N, 3) linear acceleration in m/s^2.
+    :param orientation: (N, 3) psi, theta, phi in radians.
+    :param angular_velocity: (N, 3) body angular velocity in rad/s.
+    :param dt: Time since the state was valid in seconds, scalar or (N,) array.
+    :return: (location, orientation) arrays shaped like the inputs.
+    """
+    location = np.atleast_2d(np.asarray(location, dtype=np.float64))
+    velocity = np.atleast_2d(np.asarray(velocity, dtype=np.float64))
+    acceleration = np.atleast_2d(np.asarray(acceleration, dtype=np.float64))
+    orientation = np.atleast_2d(np.asarray(orientation, dtype=np.float64))
+    angular_velocity = np.atleast_2d(np.asarray(angular_velocity, dtype=np.float64))
+    n = len(location)
+    algorithm = np.broadcast_to(np.asarray(algorithm, dtype=np.intp), (n,)) & 0xF
+    dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), (n,))
+
+    moving = _MOVING[algorithm]
+    rotating = _ROTATING[algorithm]
+    accelerated = _ACCELERATED[algorithm]
+    body = _BODY[algorithm]
+
+    acceleration = np.where(accelerated[:, None], acceleration, 0.0)
+    new_location = location.copy()
+    new_orientation = orientation.copy()
+
+    world = moving & ~body
+    if world.any():
+        t = dt[world, None]
+        new_location[world] += velocity[world] * t + 0.5 * acceleration[world] * t**2
+
+    rotating_or_body = moving & (rotating | body)
+    if rotating_or_body.any():
+        index = np.flatnonzero(rotating_or_body)
+        w = np.where(rotating[index, None], angular_velocity[index], 0.0)
+        dr_matrix, r1, r2 = _rotation_terms(w, dt[index])
+        world_to_body = euler_to_matrix(orientation[index])
+
+        is_rotating = rotating[index]
+        if is_rotating.any():
+            new_matrix = np.einsum('nij,njk->nik', dr_matrix, world_to_body)
+            new_orientation[index[is_rotating]] = matrix_to_euler(new_matrix[is_rotating])
+
+        is_body = body[index]
+        if is_body.any():
+            body_velocity = np.einsum('nij,nj->ni', world_to_body, velocity[index])
+            displacement = (np.einsum('nij,nj->ni', r1, body_velocity)
+                            + np.einsum('nij,nj->ni', r2, acceleration[index]))
+            world_displacement = np.einsum('nji,nj->ni', world_to_body, displacement)    # R^T
+            new_location[index[is_body]] += world_displacement[is_body]
+    return new_location, new_orientation
+
+
+def _angle_difference(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return np.abs((a - b + np.pi) % (2 * np.pi) - np.pi)
+
+
+class DeadReckoningModel:
+    """
+    Local copy of the dead reckoned state remote simulators compute from our last ESPDU.
+
+    should_send compares the true state against it and asks for a new ESPDU when the position or
+    orientation error exceeds its threshold, or when the heartbeat interval has expired.
+    """
+
+    def __init__(
+        self,
+        algorithm: DeadReckoningAlgorithm = DeadReckoningAlgorithm.FPW,
+        position_threshold: float = 1.0,
+        orientation_threshold: float = 3.0,
+        heartbeat: float = 5.0,
+    ) -> None:
+        """
+        :param algorithm: DR algorithm announced in our ESPDUs.
+        :param position_threshold: Max position error in meters.
+        :param orientation_threshold: Max error of any Euler angle in decimal degrees.
+        :param heartbeat: Max time between ESPDUs in seconds.
+        """
+        self.algorithm = DeadReckoningAlgorithm(algorithm)
+        self.position_threshold = position_threshold
+        self.orientation_threshold = math.radians(orientation_threshold)
+        self.heartbeat = heartbeat
+        self._sent_time = None
+        self._location = np.zeros(3)
+        self._velocity = np.zeros(3)
+        self._acceleration = np.zeros(3)
+        self._orientation = np.zeros(3)
+        self._angular_velocity = np.zeros(3)
+
+    def reset(self) -> None:
+        """Forget the last sent state, so next should_send call returns True."""
+        self._sent_time = None
+
+    def espdu_acceleration(self, acceleration, orientation) -> np.ndarray:
+        """
+        Express a world (ECEF) acceleration as the ESPDU carries it for the algorithm: unchanged
+        for the W algorithms, in body coordinates for the B ones.
+
+        :param orientation: psi, theta, phi in radians.
+        """
+        acceleration = np.asarray(acceleration, dtype=np.float64)
+        if not _BODY[self.algorithm]:
+            return acceleration
+        return euler_to_matrix(np.atleast_2d(np.asarray(orientation, dtype=np.float64)))[0] @ \
+            acceleration
+
+    def update(
+        self,
+        now: float,
+        location,
+        velocity,
+        orientation,
+        acceleration=(0.0, 0.0, 0.0),
+        angular_velocity=(0.0, 0.0, 0.0),
+    ) -> None:
+        """
+        Record the state just sent in an ESPDU.
+
+        :param now: Monotonic time in seconds.
+        """
+        self._sent_time = now
+        self._location[:] = location
+        self._velocity[:] = velocity
+        self._acceleration[:] = acceleration
+        self._orientation[:] = orientation
+        self._angular_velocity[:] = angular_velocity
+
+    def predict(self, now: float) -> tuple:
+        """
+        Return (location, orientation) remote simulators extrapolate for now.
+        """
+        location, orientation = extrapolate(self.algorithm, self._location, self._velocity,
+                                            self._acceleration, self._orientation,
+                                            self._angular_velocity, now - self._sent_time)
+        return location[0], orientation[0]
+
+    def should_send(self, now: float, location, orientation) -> bool:
+        """
+        Return True if an ESPDU must be sent for the true location and orientation.
+
+        :param now: Monotonic time in seconds.
+        :param location: True ECEF location in meters.
+        :param orientation: True psi, theta, phi in radians.
+        """
+        if self._sent_time is None or now - self._sent_time >= self.heartbeat:
+            return True
+        predicted_location, predicted_orientation = self.predict(now)
+        position_error = np.linalg.norm(np.asarray(location) - predicted_location)
+        if position_error > self.position_threshold:
+            return True
+        orientation_error = _angle_difference(np.asarray(orientation), predicted_orientation)
+        return bool(np.any(orientation_error > self.orientation_threshold))
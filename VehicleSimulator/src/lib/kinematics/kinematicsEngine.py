@@ -0,0 +1,134 @@
+"""Vectorized kinematics for many entities, advanced together in a single step per tick."""
+
+import numpy as np
+
+from lib.kinematics.geodesy import ecef2lla, great_circle_destination, lla2ecef
+
+__author__ = "EnriqueMoran"
+
+
+def great_circle_step(lat, lon, alt, heading, pitch, speed, dt):
+    """
+    Move entities along a great-circle arc for elapsed time. Works on scalars and arrays.
+
+    :param lat: Latitude in radians.
+    :param lon: Longitude in radians.
+    :param alt: Altitude in meters.
+    :param heading: Heading (yaw) in radians.
+    :param pitch: Pitch in radians.
+    :param speed: Speed in meters per second.
+    :param dt: Time elapsed since last update in seconds.
+    :return: (lat_rad, lon_rad, alt_m), longitude normalized to [0, 2*pi).
+    """
+    horiz_dist = speed * np.cos(pitch) * dt    # ground distance
+    vert_dist  = speed * np.sin(pitch) * dt    # altitude change (positive up)
+
+    new_lat, new_lon = great_circle_destination(lat, lon, heading, horiz_dist)
+    new_lon = np.mod(new_lon, 2 * np.pi)
+    return new_lat, new_lon, alt + vert_dist
+
+
+class KinematicsEngine:
+    """
+    Position, orientation and velocity of N entities in NumPy columns, one row per entity.
+
+    Location and velocity are ECEF, as DIS carries them. The geodetic position of every row is
+    cached next to the ECEF location it was solved from; rows written through set_geodetic update
+    both, so steps never solve ECEF -> LLA. A row is solved again only when its location no longer
+    matches, i.e. it was written from outside, for example from a received ESPDU.
+
+    The engine does not map entities to rows: its owner (EntityStore) does, and resizes, moves and
+    clears rows as entities come and go. It takes no lock either, callers hold the owner's one.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self._fills = {}    # column attribute name -> value of an empty row
+        self.capacity = 0
+        self.resize(max(capacity, 1))
+
+    def _grow(self, name: str, shape: tuple, dtype, fill=0) -> None:
+        new = np.full((self.capacity,) + shape, fill, dtype=dtype)
+        old = getattr(self, name, None)
+        if old is not None:
+            new[:len(old)] = old
+        setattr(self, name, new)
+        self._fills[name] = fill
+
+    def resize(self, capacity: int) -> None:
+        """
+        Resize every column to capacity rows, keeping the content of the existing ones.
+        """
+        self.capacity = capacity
+        self._grow("location", (3,), np.float64)       # ECEF x, y, z in meters
+        self._grow("velocity", (3,), np.float32)       # ECEF x, y, z in m/s
+        self._grow("orientation", (3,), np.float32)    # psi, theta, phi in radians
+        self._grow("geodetic", (3,), np.float64)       # lat, lon in radians, alt in meters
+        self._grow("geodetic_source", (3,), np.float64, np.nan)    # ECEF solved, NaN if never
+        self._grow("simulated", (), np.bool_, False)    # Stepped by step(dt) with no rows
+
+    def move_row(self, source: int, target: int) -> None:
+        """Copy row source over row target and empty source."""
+        for name, fill in self._fills.items():
+            column = getattr(self, name)
+            column[target] = column[source]
+            column[source] = fill
+
+    def clear_rows(self, rows) -> None:
+        """Empty rows, an index array or a slice."""
+        for name, fill in self._fills.items():
+            getattr(self, name)[rows] = fill
+
+    def get_geodetic(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Return the geodetic position of rows, solving again the ones whose ECEF location changed
+        since it was cached.
+
+        :return: (N, 3) array of lat, lon in radians and alt in meters.
+        """
+        location = self.location[rows]
+        stale = np.any(self.geodetic_source[rows] != location, axis=1)
+        if np.any(stale):
+            stale_rows = rows[stale]
+            x, y, z = location[stale].T
+            lat, lon, alt = ecef2lla(x, y, z)
+            self.geodetic[stale_rows] = np.column_stack((lat, lon, alt))
+            self.geodetic_source[stale_rows] = location[stale]
+        return self.geodetic[rows]
+
+    def set_geodetic(self, rows: np.ndarray, lat, lon, alt) -> None:
+        """
+        Write the ECEF location of rows from a geodetic position and cache both.
+
+        :param lat: Latitude in radians.
+        :param lon: Longitude in radians, normalized to [-pi, pi] in the cache.
+        :param alt: Altitude in meters.
+        """
+        location = np.column_stack(lla2ecef(lat, lon, alt))
+        self.location[rows] = location
+        self.geodetic[rows] = np.column_stack((lat, np.remainder(lon + np.pi, 2 * np.pi) - np.pi,
+                                               alt))
+        self.geodetic_source[rows] = location
+
+    def step(self, dt: float, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Advance rows along their great-circle tracks in one vectorized call, holding speed,
+        heading (psi) and pitch (theta). Rows that do not move are left untouched.
+
+        :param dt: Time elapsed since last update in seconds.
+        :param rows: Rows to advance, the simulated ones if None.
+        :return: Rows that moved.
+        """
+        if rows is None:
+            rows = np.flatnonzero(self.simulated)
+        velocity = self.velocity[rows].astype(np.float64)
+        speed = np.sqrt(np.einsum("ij,ij->i", velocity, velocity))
+        moving = speed > 0    # Also skips zeroed rows, (0, 0, 0) has no geodetic position
+        if not np.any(moving):
+            return rows[moving]
+        rows, speed = rows[moving], speed[moving]
+        lat, lon, alt = self.get_geodetic(rows).T
+        orientation = self.orientation[rows].astype(np.float64)
+        new_lat, new_lon, new_alt = great_circle_step(lat, lon, alt, orientation[:, 0],
+                                                      orientation[:, 1], speed, dt)
+        self.set_geodetic(rows, new_lat, new_lon, new_alt)
+        return rows
@@ -1,38 +1,130 @@
 import math
+
+import numpy as np
 import opendis.RangeCoordinates
 
 from lib.entity.entityManager import EntityManager
+from lib.entity.entityStore import EntityStore
+from lib.kinematics import deadReckoning, geodesy
+from lib.kinematics.kinematicsEngine import great_circle_step
 
 from opendis.RangeCoordinates import rad2deg, deg2rad
 from opendis.dis7 import Vector3Float, Vector3Double, EulerAngles
 
 __author__ = "EnriqueMoran"
 
+INITIAL_POSITION = (36.988138186019235, -7.9387833418066025, 0.0)    # lat, lon, alt
+INITIAL_ORIENTATION = (0.0, 0.0, 0.0)    # roll, pitch, yaw
+
+
+class GeodeticState:
+    """
+    Geodetic position of the own entity together with the ECEF location it was derived from.
+    """
+
+    __slots__ = ("lat", "lon", "alt", "x", "y", "z")
+
+    def __init__(self, lat: float, lon: float, alt: float, x: float, y: float, z: float) -> None:
+        self.lat = lat    # radians
+        self.lon = lon    # radians, [-pi, pi]
+        self.alt = alt    # meters
+        self.x, self.y, self.z = x, y, z    # ECEF meters
+
+    def matches(self, location: Vector3Double) -> bool:
+        return self.x == location.x and self.y == location.y and self.z == location.z
+
+
 class KinematicsManager:
+    """
+    Geodetic kinematics of the own entity (EntityManager) and of EntityStore entities.
+
+    EntityStore entities are rows of the store KinematicsEngine: the per-entity methods read and
+    write those rows, and process_entities_kinematics steps all of them in one vectorized call.
 
-    def __init__(self) -> None:
+    The geodetic position of every entity is cached next to the ECEF location it corresponds to,
+    by the engine for store rows and here for the own entity. Positions written by this class
+    update both, so ticks never solve ECEF -> LLA; the cache is only refreshed when the stored
+    location no longer matches, i.e. it was set from outside, for example from a received ESPDU.
+    """
+
+    def __init__(self, entity_store: EntityStore = None) -> None:
         self._gps   = opendis.RangeCoordinates.GPS()
         self._wgs84 = opendis.RangeCoordinates.WGS84()
+        self.entity_store = entity_store
+        self._own_state = None    # GeodeticState of the own entity
+        self.reset()
 
-        lat, lon, alt   = 36.988138186019235, -7.9387833418066025, 0.0
-        roll, pitch, yaw  = 0.0, 0.0, 0.0
-        self.set_position(lat, lon, alt)
-        self.set_orientation(roll, pitch, yaw)
-        
-    def get_information(self) -> str:
+    def reset(self) -> None:
+        """
+        Put the own entity back at the initial position and orientation, e.g. after its data was
+        cleared, so the next kinematics step starts from a valid geodetic position.
+        """
+        self._own_state = None
+        self.set_position(*INITIAL_POSITION)
+        self.set_orientation(*INITIAL_ORIENTATION)
+
+    def _entity(self, entity_id: tuple = None):
+        """
+        Return the accessor of an entity: the own entity (EntityManager) when entity_id is None,
+        the matching EntityStore row otherwise.
+
+        :param entity_id: (site, application, entity) tuple.
+        """
+        if entity_id is None:
+            return EntityManager()
+        return self.entity_store.get_entity(entity_id)
+
+    def _geodetic_state(self, entity_id: tuple = None) -> tuple:
+        """
+        Return the cached geodetic position of an entity, solving it again only if the stored
+        ECEF location changed behind our back.
+
+        :return: (lat_rad, lon_rad, alt_m), longitude in [-pi, pi].
+        """
+        if entity_id is not None:
+            lat, lon, alt = self.entity_store.get_geodetic_positions([entity_id])[0].tolist()
+            return lat, lon, alt
+        location = EntityManager().get_entity_location()
+        state = self._own_state
+        if state is None or not state.matches(location):
+            lat, lon, alt = geodesy.ecef2lla_point(location.x, location.y, location.z)
+            state = self._own_state = GeodeticState(lat, lon, alt, location.x, location.y,
+                                                    location.z)
+        return state.lat, state.lon, state.alt
+
+    def _set_geodetic_position(self, lat: float, lon: float, alt: float,
+                               entity_id: tuple = None) -> None:
+        """
+        Write the ECEF location of an entity from a geodetic position and cache both.
+
+        :param lat: Latitude in radians.
+        :param lon: Longitude in radians.
+        :param alt: Altitude in meters.
+        """
+        if entity_id is not None:
+            self.entity_store.set_geodetic_positions([entity_id], [(lat, lon, alt)])
+            return
+        location = Vector3Double()    # Use double precision to preserve altitude accuracy
+        location.x, location.y, location.z = self._gps.lla2ecef([math.degrees(lat),
+                                                                 math.degrees(lon), alt])
+        EntityManager().set_entity_location(location)
+        self._own_state = GeodeticState(lat, math.remainder(lon, 2 * math.pi), alt, location.x,
+                                        location.y, location.z)
+
+    def get_information(self, entity_id: tuple = None) -> str:
         """TBD
         Note that X, Y, Z can't be 0,0,0.
         """
-        gps = opendis.RangeCoordinates.GPS()
-        current_lat, current_lon, current_alt = self.get_lat_lon_alt()
-        heading = self.get_heading()
-        speed   = self.get_speed()
+        current_lat, current_lon, current_alt = self.get_lat_lon_alt(entity_id)
+        heading = self.get_heading(entity_id)
+        speed   = self.get_speed(entity_id)
         return  f"current position: {current_lat}, {current_lon}\n" +\
                 f"current altitude: {current_alt} m\n" +\
                 f"heading: {heading} degrees\n" +\
                 f"speed: {speed} m/s"
 
-    def set_orientation(self, roll: float, pitch: float, yaw: float) -> None:
+    def set_orientation(self, roll: float, pitch: float, yaw: float,
+                        entity_id: tuple = None) -> None:
         """
         Set entity orientation in EulerAngles.
         
@@ -44,9 +136,9 @@ class KinematicsManager:
         orientation.phi   = math.radians(roll)
         orientation.theta = math.radians(pitch)
         orientation.psi   = math.radians(yaw)
-        EntityManager().set_entity_orientation(orientation)
+        self._entity(entity_id).set_entity_orientation(orientation)
     
-    def set_position(self, lat: float, lon: float, alt: float) -> None:
+    def set_position(self, lat: float, lon: float, alt: float, entity_id: tuple = None) -> None:
         """
         Set entity position (geodetic -> ECEF).
         
@@ -54,17 +146,15 @@ class KinematicsManager:
         :param lon: Longitude in decimal degrees (geodetic).
         :param alt: Altitude in meters.
         """
-        location = Vector3Double()    # Use double precision to preserve altitude accuracy
-        location.x, location.y, location.z = self._gps.lla2ecef([lat, lon, alt])
-        EntityManager().set_entity_location(location)
+        self._set_geodetic_position(math.radians(lat), math.radians(lon), alt, entity_id)
 
-    def set_speed(self, speed: float) -> None:
+    def set_speed(self, speed: float, entity_id: tuple = None) -> None:
         """"
         Set local NED speed and convert to ECEF.
 
         :param speed: Speed in meters per second.
         """
-        orientation = EntityManager().get_entity_orientation()
+        orientation = self._entity(entity_id).get_entity_orientation()
         heading_rad = orientation.psi
         pitch_rad   = orientation.theta
 
@@ -73,93 +163,137 @@ class KinematicsManager:
         v_e =  speed * math.cos(pitch_rad) * math.sin(heading_rad)
         v_d = -speed * math.sin(pitch_rad)    # Down positive
 
-        # Convert NED to ECEF
-        location = EntityManager().get_entity_location()
-        vx, vy, vz = self._gps.ned2ecef([v_n, v_e, v_d], [location.x, location.y, location.z])
-        vx = vx - location.x
-        vy = vy - location.y
-        vz = vz - location.z
+        # Rotate NED to ECEF at the cached position (transpose of the ECEF -> NED matrix)
+        lat, lon, _ = self._geodetic_state(entity_id)
+        sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+        sin_lon, cos_lon = math.sin(lon), math.cos(lon)
+        vx = -sin_lat * cos_lon * v_n - sin_lon * v_e - cos_lat * cos_lon * v_d
+        vy = -sin_lat * sin_lon * v_n + cos_lon * v_e - cos_lat * sin_lon * v_d
+        vz =  cos_lat * v_n - sin_lat * v_d
         velocity = Vector3Float()
         velocity.x, velocity.y, velocity.z = vx, vy, vz
-        EntityManager().set_entity_linear_velocity(velocity)
+        self._entity(entity_id).set_entity_linear_velocity(velocity)
     
-    def set_heading(self, heading: float) -> None:
+    def set_heading(self, heading: float, entity_id: tuple = None) -> None:
         """
         Update entity heading (yaw only).
 
         :param heading: Heading in decimal degrees.
         """
-        orientation = EntityManager().get_entity_orientation()
+        orientation = self._entity(entity_id).get_entity_orientation()
         orientation.psi = math.radians(heading)
-        EntityManager().set_entity_orientation(orientation)
+        self._entity(entity_id).set_entity_orientation(orientation)
 
-    def get_lat_lon_alt(self) -> tuple:
+    def get_lat_lon_alt(self, entity_id: tuple = None) -> tuple:
         """Get entity geodetic position from ECEF.
 
         :return: (lat_deg, lon_deg, alt_m).
         """
-        location = EntityManager().get_entity_location()
-        return self._gps.ecef2lla([location.x, location.y, location.z])
+        lat, lon, alt = self._geodetic_state(entity_id)
+        return math.degrees(lat), math.degrees(lon), alt
     
-    def get_heading(self) -> float:
+    def get_heading(self, entity_id: tuple = None) -> float:
         """Get entity heading (yaw).
 
         :return: Heading in decimal degrees [0,360).
         """
-        psi = EntityManager().get_entity_orientation().psi
+        psi = self._entity(entity_id).get_entity_orientation().psi
         deg = math.degrees(psi)
         return deg % 360
 
-    def get_roll_pitch_yaw(self) -> tuple:
+    def get_roll_pitch_yaw(self, entity_id: tuple = None) -> tuple:
         """Get entity roll, pitch, and yaw.
 
         :return: roll, pitch and yaw in decimal degrees.
         """
-        e = EntityManager().get_entity_orientation()
+        e = self._entity(entity_id).get_entity_orientation()
         return (math.degrees(e.phi), math.degrees(e.theta), math.degrees(e.psi))
 
-    def get_speed(self) -> float:
+    def get_speed(self, entity_id: tuple = None) -> float:
         """Get entity speed in m/s.
 
         :return: Speed in meters per second.
         """
-        speed = EntityManager().get_entity_linear_velocity()
+        speed = self._entity(entity_id).get_entity_linear_velocity()
         return math.sqrt(speed.x**2 + speed.y**2 + speed.z**2)
 
-    def process_kinematics(self, dt: float) -> None:
+    def _local_rates(self, entity_id: tuple = None) -> tuple:
+        """
+        Velocity of the entity and angular rate of its local level frame relative to ECEF, both
+        in local NED coordinates. process_kinematics holds speed, heading and pitch relative to
+        the local north and horizon, so that frame turns as the entity moves over the Earth.
+
+        :return: (geodetic position, orientation, velocity in m/s, transport rate in rad/s).
+        """
+        position = self._geodetic_state(entity_id)
+        orientation = self._entity(entity_id).get_entity_orientation()
+        speed = self.get_speed(entity_id)
+        v_n = speed * math.cos(orientation.theta) * math.cos(orientation.psi)
+        v_e = speed * math.cos(orientation.theta) * math.sin(orientation.psi)
+        v_d = -speed * math.sin(orientation.theta)
+        radius = geodesy.A    # Sphere of the great-circle step
+        rate = np.array((v_e / radius, -v_n / radius, -v_e * math.tan(position[0]) / radius))
+        return position, orientation, np.array((v_n, v_e, v_d)), rate
+
+    def get_acceleration(self, entity_id: tuple = None) -> tuple:
+        """
+        Get entity linear acceleration in ECEF: the turn of its constant NED velocity with the
+        local level frame, as process_kinematics moves it.
+
+        :return: (x, y, z) in m/s^2.
+        """
+        (lat, lon, _), _, velocity, rate = self._local_rates(entity_id)
+        a_n, a_e, a_d = np.cross(rate, velocity)
+        # The great-circle step covers a fixed angle per second, climbing speeds up the ground track
+        climb_rate = -velocity[2] / geodesy.A
+        a_n += climb_rate * velocity[0]
+        a_e += climb_rate * velocity[1]
+        # Rotate NED to ECEF, like set_speed does
+        sin_lat, cos_lat = math.sin(lat), math.cos(lat)
+        sin_lon, cos_lon = math.sin(lon), math.cos(lon)
+        return (float(-sin_lat * cos_lon * a_n - sin_lon * a_e - cos_lat * cos_lon * a_d),
+                float(-sin_lat * sin_lon * a_n + cos_lon * a_e - cos_lat * sin_lon * a_d),
+                float(cos_lat * a_n - sin_lat * a_d))
+
+    def get_angular_velocity(self, entity_id: tuple = None) -> tuple:
+        """
+        Get entity angular velocity in body coordinates: the rate of its local level frame, as
+        attitude is held relative to it.
+
+        :return: (x, y, z) in rad/s.
+        """
+        _, orientation, _, rate = self._local_rates(entity_id)
+        ned_to_body = deadReckoning.euler_to_matrix(np.array([[orientation.psi, orientation.theta,
+                                                               orientation.phi]]))[0]
+        return tuple(float(w) for w in ned_to_body @ rate)
+
+    def process_kinematics(self, dt: float, entity_id: tuple = None) -> None:
         """
         Update entity position and altitude along kinematics for elapsed time.
 
         :param dt: Time elapsed since last update in seconds.
         """
-        lat, lon, alt = self.get_lat_lon_alt()
+        if entity_id is not None:
+            self.entity_store.step_kinematics(dt, [entity_id])
+            return
+        lat, lon, alt = self._geodetic_state()
         orientation = EntityManager().get_entity_orientation()
         heading = orientation.psi
         pitch   = orientation.theta
         speed   = self.get_speed()
 
-        # Compute horizontal and vertical distances
-        horiz_dist = speed * math.cos(pitch) * dt  # ground distance
-        vert_dist  = speed * math.sin(pitch) * dt  # altitude change (positive up)
+        # Horizontal movement via great-circle arc, vertical along pitch
+        new_lat, new_lon, new_alt = great_circle_step(lat, lon, alt, heading, pitch, speed, dt)
 
-        # Horizontal movement via great-circle arc
-        arc = horiz_dist / self._wgs84.a
-        lat = math.radians(lat)
-        lon = math.radians(lon)
+        # Update ECEF position and cached geodetic state together
+        self._set_geodetic_position(float(new_lat), float(new_lon), float(new_alt))
 
-        new_lat_rad = math.asin(math.sin(lat)*math.cos(arc) + 
-                                math.cos(lat)*math.sin(arc)*math.cos(heading))
-        
-        new_lon_rad = lon + math.atan2(math.sin(heading)*math.sin(arc)*math.cos(lat),
-                                       math.cos(arc) - math.sin(lat)*math.sin(new_lat_rad))
-
-        # Convert back to geodetic degrees
-        new_lat = math.degrees(new_lat_rad)
-        new_lon = (math.degrees(new_lon_rad) + 360) % 360
-        new_alt = alt + vert_dist
-
-        # Update ECEF position
-        x, y, z = self._gps.lla2ecef([new_lat, new_lon, new_alt])
-        location = Vector3Double()
-        location.x, location.y, location.z = x, y, z
-        EntityManager().set_entity_location(location)
\ No newline at end of file
+    def process_entities_kinematics(self, dt: float) -> None:
+        """
+        Update the position of every locally simulated EntityStore entity, all of them in one
+        vectorized step.
+
+        :param dt: Time elapsed since last update in seconds.
+        """
+        if self.entity_store is not None:
+            self.entity_store.step_kinematics(dt)
@@ -0,0 +1,386 @@
+"""Fleet of entities whose state lives in shared memory, stepped in parallel by worker processes."""
+
+import logging
+import multiprocessing
+import traceback
+import weakref
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from lib.kinematics.geodesy import lla2ecef, ned2ecef_vectors
+from lib.kinematics.kinematicsEngine import great_circle_step
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("ShardedEngine")
+
+# Shared memory layout: one column per field, each capacity items long, in this order
+COLUMNS = (
+    ("lat", np.float64),       # radians
+    ("lon", np.float64),       # radians
+    ("alt", np.float64),       # meters
+    ("roll", np.float64),      # radians
+    ("pitch", np.float64),     # radians
+    ("yaw", np.float64),       # radians
+    ("speed", np.float64),     # m/s
+    ("fuel", np.float64),      # liters
+    ("active", np.bool_),
+)
+
+
+def _columns(buffer, capacity: int) -> dict:
+    """Return a NumPy view of every column of a shared memory block, by name."""
+    columns = {}
+    offset = 0
+    for name, dtype in COLUMNS:
+        columns[name] = np.ndarray(capacity, dtype=dtype, buffer=buffer, offset=offset)
+        offset += capacity * np.dtype(dtype).itemsize
+    return columns
+
+
+def _block_size(capacity: int) -> int:
+    return sum(capacity * np.dtype(dtype).itemsize for _, dtype in COLUMNS)
+
+
+def step_slice(columns: dict, start: int, end: int, dt: float, consumption_rate: float) -> None:
+    """
+    Advance rows [start, end) along their great-circle tracks and burn their fuel.
+
+    :param consumption_rate: Liters per kilometer traveled.
+    """
+    rows = slice(start, end)
+    new_lat, new_lon, new_alt = great_circle_step(columns["lat"][rows], columns["lon"][rows],
+                                                  columns["alt"][rows], columns["yaw"][rows],
+                                                  columns["pitch"][rows], columns["speed"][rows],
+                                                  dt)
+    columns["lat"][rows] = new_lat
+    columns["lon"][rows] = new_lon
+    columns["alt"][rows] = new_alt
+    fuel = columns["fuel"][rows]
+    fuel -= consumption_rate * np.abs(columns["speed"][rows]) * dt / 1000
+    np.maximum(fuel, 0.0, out=fuel)
+
+
+def _worker_main(memory_name: str, capacity: int, consumption_rate: float, connection) -> None:
+    """
+    Worker process loop: step the (start, end, dt) range received, answer None when done or the
+    traceback if the step failed, until None is received.
+    """
+    # Spawned workers share the coordinator resource tracker, which unlinks the block only if
+    # the coordinator dies without closing the engine
+    memory = shared_memory.SharedMemory(name=memory_name)
+    columns = _columns(memory.buf, capacity)
+    try:
+        while True:
+            command = connection.recv()
+            if command is None:
+                break
+            start, end, dt = command
+            try:
+                step_slice(columns, start, end, dt, consumption_rate)
+                connection.send(None)
+            except Exception:
+                connection.send(traceback.format_exc())
+    finally:
+        columns = None    # Release the views before closing the buffer
+        memory.close()
+
+
+def _shutdown(memory: shared_memory.SharedMemory, connections: list, processes: list) -> None:
+    for connection in connections:
+        try:
+            connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+    for process in processes:
+        process.join(timeout=2)
+        if process.is_alive():
+            process.terminate()
+    memory.close()
+    memory.unlink()
+
+
+class ShardedEngine:
+    """
+    Position, orientation, speed and fuel of a large fleet of entities. Entity columns live in one multiprocessing.shared_memory
+    block and step() splits the used rows in contiguous shards, one per worker process, so
+    kinematics and fuel of the whole fleet advance in parallel outside the GIL of the process
+    doing the network I/O.
+
+    The coordinator (the process that created the engine) is the only writer between steps, and
+    step() returns once every worker is done, so no row is read or written concurrently. The
+    capacity is fixed at creation.
+
+    Entities are addressed by the index returned from add_entity. Indexes of removed entities are
+    reused, so a removed slot must not be addressed again.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        workers: int = 0,
+        consumption_rate: float = 0.0,
+        initial_fuel: float = 0.0,
+        min_shard_size: int = 1024,
+    ) -> None:
+        """
+        :param capacity: Max number of entities.
+        :param workers: Worker processes, 0 to step in the calling thread.
+        :param consumption_rate: Fuel consumption in liters per kilometer.
+        :param initial_fuel: Fuel of new entities in liters.
+        :param min_shard_size: Rows below which a worker is not worth the round trip.
+        """
+        self.consumption_rate = consumption_rate
+        self.initial_fuel = initial_fuel
+        self.min_shard_size = max(min_shard_size, 1)
+        self._size = 0
+        self._free = []
+        self._memory = shared_memory.SharedMemory(create=True,
+                                                  size=_block_size(max(capacity, 1)))
+        self._columns = _columns(self._memory.buf, max(capacity, 1))
+        for name, _ in COLUMNS:
+            self._columns[name][:] = 0
+            setattr(self, f"_{name}", self._columns[name])
+        self._connections = []
+        self._processes = []
+        context = multiprocessing.get_context("spawn")    # Safe with the receive/send threads
+        for number in range(workers):
+            parent, child = context.Pipe()
+            process = context.Process(target=_worker_main, name=f"ShardWorker-{number}",
+                                      args=(self._memory.name, self.capacity, consumption_rate,
+                                            child), daemon=True)
+            process.start()
+            child.close()
+            self._connections.append(parent)
+            self._processes.append(process)
+        self._finalizer = weakref.finalize(self, _shutdown, self._memory, self._connections,
+                                           self._processes)
+        logger.info("Sharded engine for %d entities, %d workers, shared memory %s",
+                    self.capacity, workers, self._memory.name)
+
+    @property
+    def memory_name(self) -> str:
+        """Name of the shared memory block, to attach from another process (see COLUMNS)."""
+        return self._memory.name
+
+    @property
+    def workers(self) -> int:
+        return len(self._processes)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._active[:self._size]))
+
+    @property
+    def capacity(self) -> int:
+        return len(self._lat)
+
+    def add_entity(
+        self,
+        lat: float,
+        lon: float,
+        alt: float,
+        roll: float = 0.0,
+        pitch: float = 0.0,
+        yaw: float = 0.0,
+        speed: float = 0.0,
+        fuel: float = None,
+    ) -> int:
+        """
+        Add an entity and return its index.
+
+        :param lat: Latitude in decimal degrees.
+        :param lon: Longitude in decimal degrees.
+        :param alt: Altitude in meters.
+        :param roll: Roll in decimal degrees.
+        :param pitch: Pitch in decimal degrees.
+        :param yaw: Yaw (heading) in decimal degrees.
+        :param speed: Speed in meters per second.
+        :param fuel: Fuel in liters, initial_fuel if None.
+        """
+        if self._free:
+            index = self._free.pop()
+        else:
+            if self._size == self.capacity:
+                raise ValueError(f"Sharded engine is full ({self.capacity} entities)")
+            index = self._size
+            self._size += 1
+        self._active[index] = True
+        self.set_position(index, lat, lon, alt)
+        self.set_orientation(index, roll, pitch, yaw)
+        self.set_speed(index, speed)
+        self._fuel[index] = self.initial_fuel if fuel is None else fuel
+        return index
+
+    def remove_entity(self, index: int) -> None:
+        self._check_index(index)
+        self._active[index] = False
+        self._speed[index] = 0.0
+        self._free.append(index)
+
+    def _check_index(self, index: int) -> None:
+        if not (0 <= index < self._size and self._active[index]):
+            raise IndexError(f"No entity at index {index}")
+
+    def set_position(self, index: int, lat: float, lon: float, alt: float) -> None:
+        """
+        :param lat: Latitude in decimal degrees.
+        :param lon: Longitude in decimal degrees.
+        :param alt: Altitude in meters.
+        """
+        self._check_index(index)
+        self._lat[index] = np.radians(lat)
+        self._lon[index] = np.radians(lon)
+        self._alt[index] = alt
+
+    def set_orientation(self, index: int, roll: float, pitch: float, yaw: float) -> None:
+        """
+        :param roll: Roll in decimal degrees.
+        :param pitch: Pitch in decimal degrees.
+        :param yaw: Yaw (heading) in decimal degrees.
+        """
+        self._check_index(index)
+        self._roll[index]  = np.radians(roll)
+        self._pitch[index] = np.radians(pitch)
+        self._yaw[index]   = np.radians(yaw)
+
+    def set_heading(self, index: int, heading: float) -> None:
+        """
+        :param heading: Heading in decimal degrees.
+        """
+        self._check_index(index)
+        self._yaw[index] = np.radians(heading)
+
+    def set_speed(self, index: int, speed: float) -> None:
+        """
+        :param speed: Speed in meters per second.
+        """
+        self._check_index(index)
+        self._speed[index] = speed
+
+    def get_lat_lon_alt(self, index: int) -> tuple:
+        """
+        :return: (lat_deg, lon_deg, alt_m).
+        """
+        self._check_index(index)
+        return (float(np.degrees(self._lat[index])), float(np.degrees(self._lon[index])),
+                float(self._alt[index]))
+
+    def get_roll_pitch_yaw(self, index: int) -> tuple:
+        """
+        :return: roll, pitch and yaw in decimal degrees.
+        """
+        self._check_index(index)
+        return (float(np.degrees(self._roll[index])), float(np.degrees(self._pitch[index])),
+                float(np.degrees(self._yaw[index])))
+
+    def get_speed(self, index: int) -> float:
+        self._check_index(index)
+        return float(self._speed[index])
+
+    def get_positions(self) -> tuple:
+        """
+        Get geodetic position of every slot, including inactive ones (see get_active_mask).
+
+        :return: (lat_deg, lon_deg, alt_m) arrays.
+        """
+        n = self._size
+        return np.degrees(self._lat[:n]), np.degrees(self._lon[:n]), self._alt[:n].copy()
+
+    def get_ecef_positions(self, rows=None) -> tuple:
+        """
+        :param rows: Slot indexes to convert, every slot if None.
+        :return: (x, y, z) ECEF arrays in meters, one item per slot.
+        """
+        rows = slice(0, self._size) if rows is None else rows
+        return lla2ecef(self._lat[rows], self._lon[rows], self._alt[rows])
+
+    def get_orientations(self, rows=None) -> np.ndarray:
+        """
+        :param rows: Slot indexes to read, every slot if None.
+        :return: (N, 3) psi, theta, phi (yaw, pitch, roll) radians, one row per slot.
+        """
+        rows = slice(0, self._size) if rows is None else rows
+        return np.column_stack((self._yaw[rows], self._pitch[rows], self._roll[rows]))
+
+    def get_ecef_velocities(self, rows=None) -> np.ndarray:
+        """
+        :param rows: Slot indexes to convert, every slot if None.
+        :return: (N, 3) ECEF velocities in m/s along heading and pitch, one row per slot.
+        """
+        rows = slice(0, self._size) if rows is None else rows
+        speed, pitch, yaw = self._speed[rows], self._pitch[rows], self._yaw[rows]
+        horizontal = speed * np.cos(pitch)
+        ned = np.column_stack((horizontal * np.cos(yaw), horizontal * np.sin(yaw),
+                               -speed * np.sin(pitch)))
+        return ned2ecef_vectors(self._lat[rows], self._lon[rows], ned)
+
+    def get_active_mask(self) -> np.ndarray:
+        return self._active[:self._size].copy()
+
+    def get_fuel(self, index: int) -> float:
+        self._check_index(index)
+        return float(self._fuel[index])
+
+    def get_fuel_quantities(self) -> np.ndarray:
+        """:return: Fuel in liters of every slot, including inactive ones."""
+        return self._fuel[:self._size].copy()
+
+    def save_state(self) -> dict:
+        """
+        Copy every column of the used slots, to bring the fleet back with restore_state.
+        """
+        return {name: self._columns[name][:self._size].copy() for name, _ in COLUMNS}
+
+    def restore_state(self, state: dict) -> None:
+        """
+        Overwrite the columns with a save_state copy. Slots used after it was saved are freed.
+        """
+        size = len(state["active"])
+        for name, _ in COLUMNS:
+            self._columns[name][:size] = state[name]
+            self._columns[name][size:self._size] = 0
+        self._size = size
+        self._free = [int(index) for index in np.flatnonzero(~state["active"])]
+
+    def _shards(self) -> list:
+        """Split the used rows into contiguous (start, end) ranges, at most one per worker."""
+        count = min(self.workers, self._size // self.min_shard_size)
+        if count <= 1:
+            return [(0, self._size)]
+        bounds = np.linspace(0, self._size, count + 1).astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def step(self, dt: float) -> None:
+        """
+        Advance every entity along its great-circle track and burn its fuel, in parallel across
+        the workers. Blocks until every shard is done.
+
+        :param dt: Time elapsed since last update in seconds.
+        """
+        if self._size == 0:
+            return
+        shards = self._shards()
+        if len(shards) == 1:
+            step_slice(self._columns, 0, self._size, dt, self.consumption_rate)
+            return
+        for connection, (start, end) in zip(self._connections, shards):
+            connection.send((int(start), int(end), dt))
+        errors = [connection.recv() for connection in self._connections[:len(shards)]]
+        for error in errors:
+            if error is not None:
+                raise RuntimeError(f"Shard worker failed:\n{error}")
+
+    def close(self) -> None:
+        """Stop the workers and release the shared memory. The engine is unusable afterwards."""
+        self._columns = None
+        for name, _ in COLUMNS:
+            setattr(self, f"_{name}", None)
+        self._finalizer()
+
+    def __enter__(self) -> "ShardedEngine":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
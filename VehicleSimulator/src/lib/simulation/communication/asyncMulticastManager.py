@@ -0,0 +1,82 @@
+"""asyncio transport for DIS multicast traffic."""
+
+import asyncio
+import logging
+
+from lib.simulation.communication import multicastManager
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("AsyncMulticastManager")
+
+
+class _PduProtocol(asyncio.DatagramProtocol):
+
+    def __init__(self, manager: "AsyncMulticastManager") -> None:
+        self.manager = manager
+        self.closed = asyncio.get_running_loop().create_future()    # Done on connection_lost
+
+    def datagram_received(self, data: bytes, addr: tuple) -> None:
+        self.manager.on_datagram(data, addr)
+
+    def error_received(self, exc: Exception) -> None:
+        # asyncio reports send and receive errors of datagram transports through this callback
+        multicastManager.SOCKET_ERRORS.labels("transport").inc()
+        logger.error("Socket error: %s", exc)
+
+    def connection_lost(self, exc: Exception) -> None:
+        if not self.closed.done():
+            self.closed.set_result(None)
+
+
+class AsyncMulticastManager(multicastManager.MulticastManager):
+    """
+    MulticastManager driven by an asyncio event loop instead of a receive thread.
+
+    The socket is configured exactly like the threaded one and handed to a DatagramProtocol; the
+    loop dispatches every received datagram to the listeners. Any number of managers can share the
+    same loop.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.transport = None
+        self._protocol = None
+
+    async def create_endpoint(self) -> None:
+        """
+        Create the socket and register it with the running event loop.
+        """
+        self.create_connection()
+        self.sock.setblocking(False)
+        loop = asyncio.get_running_loop()
+        self.transport, self._protocol = await loop.create_datagram_endpoint(lambda: _PduProtocol(self),
+                                                                sock=self.sock)
+
+    def send_bytes(self, data, address: tuple = None) -> None:
+        """Send an already encoded PDU (any bytes-like object)."""
+        if address is None:
+            address = (self.multicast_group, self.multicast_port)
+        # The transport may queue data, so reusable encoder buffers must be copied
+        self.transport.sendto(bytes(data), address)
+
+    def on_datagram(self, data: bytes, sender: tuple = None) -> None:
+        self.received_datagrams += 1
+        self.process_datagram(data, sender)
+
+    def receive_pdu(self) -> None:
+        raise RuntimeError("AsyncMulticastManager receives through its event loop, "
+                           "use create_endpoint instead")
+
+    def close(self) -> None:
+        """Close the transport. The socket is closed on a later loop iteration, see wait_closed."""
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+
+    async def wait_closed(self) -> None:
+        """Close the transport and wait until its socket is closed."""
+        self.close()
+        if self._protocol is not None:
+            await self._protocol.closed
+            self._protocol = None
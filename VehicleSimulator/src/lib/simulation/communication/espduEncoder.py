@@ -0,0 +1,115 @@
+"""Fast EntityStatePdu serialization into a reusable buffer."""
+
+import struct
+
+from opendis.dis7 import EntityStatePdu
+
+__author__ = "EnriqueMoran"
+
+# ESPDU layout (IEEE 1278.1-2012 7.2.2), big endian as written by opendis DataOutputStream
+_HEADER_STATIC = struct.Struct(">BBBB")       # protocolVersion, exerciseID, pduType, protocolFamily
+_HEADER_DYNAMIC = struct.Struct(">IH")        # timestamp, length
+_HEADER_STATUS = struct.Struct(">BB")         # pduStatus, padding
+_ENTITY_ID = struct.Struct(">HHH")            # siteID, applicationID, entityID
+_FORCE_ID = struct.Struct(">B")
+_NUM_VARIABLE_PARAMETERS = struct.Struct(">B")
+_ENTITY_TYPE = struct.Struct(">BBHBBBB")
+_MARKING = struct.Struct(">B11s")
+_CAPABILITIES = struct.Struct(">I")
+_KINEMATICS = struct.Struct(">3f3d3fI")       # velocity, location, orientation, appearance
+_DEAD_RECKONING = struct.Struct(">B15B3f3f")
+_VARIABLE_PARAMETER = struct.Struct(">BdIHB")
+
+_HEADER_STATIC_OFFSET = 0
+_HEADER_DYNAMIC_OFFSET = 4
+_HEADER_STATUS_OFFSET = 10
+_ENTITY_ID_OFFSET = 12
+_FORCE_ID_OFFSET = 18
+_NUM_VARIABLE_PARAMETERS_OFFSET = 19
+_ENTITY_TYPE_OFFSET = 20
+_ALTERNATIVE_ENTITY_TYPE_OFFSET = 28
+_KINEMATICS_OFFSET = 36
+_DEAD_RECKONING_OFFSET = 88
+_MARKING_OFFSET = 128
+_CAPABILITIES_OFFSET = 140
+_VARIABLE_PARAMETERS_OFFSET = 144
+
+ESPDU_FIXED_LENGTH = _VARIABLE_PARAMETERS_OFFSET
+
+
+class EntityStatePduEncoder:
+    """
+    Serialize EntityStatePdu objects into a single preallocated buffer, byte-identical to opendis
+    EntityStatePdu.serialize (except the length field, which is always filled in).
+
+    Fields that rarely change (header identity, entity ID, force ID, entity types, marking and
+    capabilities) are packed once by set_static; encode only patches the dynamic ones. Call
+    set_static again whenever one of those fields changes.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = bytearray(ESPDU_FIXED_LENGTH)
+        self._static_ready = False
+
+    def set_static(self, pdu: EntityStatePdu) -> None:
+        """
+        Pack the static fields of pdu into the buffer.
+        """
+        buffer = self._buffer
+        _HEADER_STATIC.pack_into(buffer, _HEADER_STATIC_OFFSET, pdu.protocolVersion,
+                                 pdu.exerciseID, pdu.pduType, pdu.protocolFamily)
+        _HEADER_STATUS.pack_into(buffer, _HEADER_STATUS_OFFSET, pdu.pduStatus, pdu.padding)
+        _ENTITY_ID.pack_into(buffer, _ENTITY_ID_OFFSET, pdu.entityID.siteID,
+                             pdu.entityID.applicationID, pdu.entityID.entityID)
+        _FORCE_ID.pack_into(buffer, _FORCE_ID_OFFSET, pdu.forceId)
+        for offset, entity_type in ((_ENTITY_TYPE_OFFSET, pdu.entityType),
+                                    (_ALTERNATIVE_ENTITY_TYPE_OFFSET, pdu.alternativeEntityType)):
+            _ENTITY_TYPE.pack_into(buffer, offset, entity_type.entityKind, entity_type.domain,
+                                   entity_type.country, entity_type.category,
+                                   entity_type.subcategory, entity_type.specific,
+                                   entity_type.extra)
+        _MARKING.pack_into(buffer, _MARKING_OFFSET, pdu.marking.characterSet,
+                           bytes(c & 0xFF for c in pdu.marking.characters))
+        _CAPABILITIES.pack_into(buffer, _CAPABILITIES_OFFSET, pdu.capabilities)
+        self._static_ready = True
+
+    def encode(self, pdu: EntityStatePdu) -> memoryview:
+        """
+        Pack the dynamic fields of pdu and return the encoded PDU.
+
+        The returned view points into the internal buffer and is only valid until the next call.
+        """
+        if not self._static_ready:
+            self.set_static(pdu)
+        variable_parameters = pdu.variableParameters
+        length = ESPDU_FIXED_LENGTH + _VARIABLE_PARAMETER.size * len(variable_parameters)
+        if len(self._buffer) < length:    # New buffer, a previous view may still be exported
+            self._buffer = self._buffer + bytes(length - len(self._buffer))
+        buffer = self._buffer
+
+        _HEADER_DYNAMIC.pack_into(buffer, _HEADER_DYNAMIC_OFFSET, pdu.timestamp, length)
+        _NUM_VARIABLE_PARAMETERS.pack_into(buffer, _NUM_VARIABLE_PARAMETERS_OFFSET,
+                                           len(variable_parameters))
+        velocity = pdu.entityLinearVelocity
+        location = pdu.entityLocation
+        orientation = pdu.entityOrientation
+        _KINEMATICS.pack_into(buffer, _KINEMATICS_OFFSET, velocity.x, velocity.y, velocity.z,
+                              location.x, location.y, location.z, orientation.psi,
+                              orientation.theta, orientation.phi, pdu.entityAppearance)
+        dead_reckoning = pdu.deadReckoningParameters
+        acceleration = dead_reckoning.entityLinearAcceleration
+        angular_velocity = dead_reckoning.entityAngularVelocity
+        _DEAD_RECKONING.pack_into(buffer, _DEAD_RECKONING_OFFSET,
+                                  dead_reckoning.deadReckoningAlgorithm,
+                                  *dead_reckoning.parameters, acceleration.x, acceleration.y,
+                                  acceleration.z, angular_velocity.x, angular_velocity.y,
+                                  angular_velocity.z)
+        offset = _VARIABLE_PARAMETERS_OFFSET
+        for parameter in variable_parameters:
+            _VARIABLE_PARAMETER.pack_into(buffer, offset, parameter.recordType,
+                                          parameter.variableParameterFields1,
+                                          parameter.variableParameterFields2,
+                                          parameter.variableParameterFields3,
+                                          parameter.variableParameterFields4)
+            offset += _VARIABLE_PARAMETER.size
+        return memoryview(buffer)[:length]
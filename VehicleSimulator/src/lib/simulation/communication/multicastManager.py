@@ -1,12 +1,51 @@
 """TBD"""
 
+import collections
+import logging
 import socket
+import struct
+import sys
 
 from io import BytesIO
 
-from opendis.PduFactory import createPdu
+from opendis.PduFactory import PduTypeDecoders, createPdu
 from opendis.DataOutputStream import DataOutputStream
 
+from common import metrics
+
+logger = logging.getLogger("MulticastManager")
+
+MAX_DATAGRAM_SIZE = 8192    # DIS PDUs are limited to 8192 bytes (IEEE 1278.1-2012 6.1.3)
+SO_RXQ_OVFL = 40    # Linux only, not exposed by the socket module
+_DROP_COUNTER = struct.Struct("=I")
+PDU_TYPE_OFFSET = 2    # Header: protocol version, exercise ID, PDU type
+
+_PDU_TYPE_NAMES = {pdu_type: decoder.__name__ for pdu_type, decoder in PduTypeDecoders.items()}
+
+PDUS_RECEIVED = metrics.REGISTRY.counter("dis_pdus_received_total",
+                                         "Datagrams received, by PDU type", ("type",))
+PDUS_FILTERED = metrics.REGISTRY.counter("dis_pdus_filtered_total",
+                                         "PDUs discarded by the exercise/site/application filter",
+                                         ("type",))
+PDUS_DECODED = metrics.REGISTRY.counter("dis_pdus_decoded_total", "PDUs decoded, by PDU type",
+                                        ("type",))
+PDUS_UNDECODABLE = metrics.REGISTRY.counter("dis_pdus_undecodable_total",
+                                            "Datagrams of unknown PDU type or too short for their "
+                                            "type, by PDU type", ("type",))
+SOCKET_ERRORS = metrics.REGISTRY.counter("socket_errors_total", "Socket errors, by operation",
+                                         ("operation",))
+
+
+def pdu_type_name(pdu_type: int) -> str:
+    """Decoder class name of a PDU type number, the number itself if unknown."""
+    name = _PDU_TYPE_NAMES.get(pdu_type)
+    return name if name is not None else str(pdu_type)
+
+
+def datagram_type_name(data) -> str:
+    """PDU type name read from the header of a raw datagram, without decoding it."""
+    return pdu_type_name(data[PDU_TYPE_OFFSET]) if len(data) > PDU_TYPE_OFFSET else "malformed"
+
 
 class MulticastManager:
     """TBD"""
@@ -16,13 +55,33 @@ class MulticastManager:
         multicast_port: int = 3000,
         multicast_iface: str = "0.0.0.0",
         ttl: int = 2,
+        receive_buffer_size: int = 0,
+        burst_size: int = 64,
     ) -> None:
         self.multicast_group = multicast_group
         self.multicast_port = multicast_port
         self.multicast_iface = multicast_iface
         self.ttl = ttl
+        self.receive_buffer_size = receive_buffer_size    # SO_RCVBUF in bytes, 0 keeps OS default
+        self.burst_size = max(burst_size, 1)    # Max datagrams drained per wake-up
         self.sock = None
         self.listeners = []
+        self.pre_filter = None    # Optional PduPreFilter run on raw datagrams before decoding
+        self.recorder = None    # Optional PduRecorder receiving every raw datagram
+        self.sender = None    # Address of the datagram being handed to the listeners, if known
+
+        # Receive buffer pool, one max-size buffer per datagram of a burst
+        self._buffers = [bytearray(MAX_DATAGRAM_SIZE) for _ in range(self.burst_size)]
+        self._views = [memoryview(buffer) for buffer in self._buffers]
+        self._sizes = [0] * self.burst_size
+        self._senders = [None] * self.burst_size
+        self._track_drops = False
+
+        self.received_datagrams = 0
+        self.truncated_datagrams = 0
+        self.undecodable_datagrams = 0
+        self.kernel_drops = 0    # Datagrams dropped by the kernel because the queue was full
+        self.burst_sizes = collections.Counter()    # burst size -> times seen
 
     def create_connection(self) -> None:
         """TBD"""
@@ -32,23 +91,137 @@ class MulticastManager:
         # self.sock.setsockopt(socket.SOL_SOCKET, socket.IP_MULTICAST_TTL, self.ttl)
         self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
                               socket.inet_aton(self.multicast_iface))
+        if self.receive_buffer_size:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.receive_buffer_size)
+            actual_size = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            logger.info("Receive buffer size requested: %d, granted: %d",
+                        self.receive_buffer_size, actual_size)
+        if sys.platform.startswith("linux"):
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+                self._track_drops = True
+            except OSError:
+                logger.warning("Kernel drop counter not available, drops won't be reported")
         self.sock.bind((self.multicast_group, self.multicast_port))
 
-    def send_pdu(self, pdu) -> None:
-        """TBD"""
+    def send_pdu(self, pdu, address: tuple = None) -> None:
+        """
+        Send pdu to the multicast group, or to address (host, port) if given.
+        """
         memory_stream = BytesIO()
         output_stream = DataOutputStream(memory_stream)
         pdu.serialize(output_stream)
         data = memory_stream.getvalue()
-        self.sock.sendto(data, (self.multicast_group, self.multicast_port))
+        self.send_bytes(data, address)
+
+    def send_bytes(self, data, address: tuple = None) -> None:
+        """Send an already encoded PDU (any bytes-like object)."""
+        if address is None:
+            address = (self.multicast_group, self.multicast_port)
+        try:
+            self.sock.sendto(data, address)
+        except OSError:
+            SOCKET_ERRORS.labels("send").inc()
+            raise
     
     def add_listener(self, listener) -> None:
         self.listeners.append(listener)
     
+    def _receive_into(self, index: int, flags: int = 0) -> None:
+        """
+        Receive one datagram into the pool buffer at index and record its size.
+        """
+        view = self._views[index]
+        if self._track_drops:
+            nbytes, ancdata, msg_flags, sender = self.sock.recvmsg_into(
+                [view], socket.CMSG_SPACE(_DROP_COUNTER.size), flags)
+            for level, kind, data in ancdata:
+                if level == socket.SOL_SOCKET and kind == SO_RXQ_OVFL:
+                    self.kernel_drops = _DROP_COUNTER.unpack(data[:_DROP_COUNTER.size])[0]
+            truncated = msg_flags & socket.MSG_TRUNC
+        else:
+            nbytes, sender = self.sock.recvfrom_into(view, MAX_DATAGRAM_SIZE, flags)
+            truncated = nbytes == MAX_DATAGRAM_SIZE
+        if truncated:
+            self.truncated_datagrams += 1
+        self._sizes[index] = nbytes
+        self._senders[index] = sender
+
+    def receive_burst(self) -> int:
+        """
+        Block until a datagram arrives, then drain every queued datagram up to burst_size without
+        blocking again.
+
+        :return: Number of datagrams received, readable through get_datagram.
+        """
+        try:
+            self._receive_into(0)
+        except OSError:
+            SOCKET_ERRORS.labels("receive").inc()
+            raise
+        count = 1
+        dontwait = getattr(socket, "MSG_DONTWAIT", 0)
+        while dontwait and count < self.burst_size:
+            try:
+                self._receive_into(count, dontwait)
+            except (BlockingIOError, InterruptedError):
+                break
+            count += 1
+        self.received_datagrams += count
+        self.burst_sizes[count] += 1
+        return count
+
+    def get_datagram(self, index: int) -> memoryview:
+        """
+        Return datagram index of the last burst. The view is only valid until the next burst.
+        """
+        return self._views[index][:self._sizes[index]]
+
+    def get_sender(self, index: int) -> tuple:
+        """Return the (host, port) datagram index of the last burst was sent from."""
+        return self._senders[index]
+
+    def get_receive_stats(self) -> dict:
+        bursts = sum(self.burst_sizes.values())
+        return {
+            "received": self.received_datagrams,
+            "truncated": self.truncated_datagrams,
+            "undecodable": self.undecodable_datagrams,
+            "kernel_drops": self.kernel_drops,
+            "bursts": bursts,
+            "mean_burst_size": self.received_datagrams / bursts if bursts else 0.0,
+            "max_burst_size": max(self.burst_sizes) if self.burst_sizes else 0,
+        }
+
+    def process_datagram(self, data, sender: tuple = None) -> None:
+        """
+        Record, pre-filter and decode one datagram, then hand the PDU to the listeners. sender is
+        readable as self.sender while the listeners run.
+        """
+        if self.recorder is not None:
+            self.recorder.record(data)
+        type_name = datagram_type_name(data)
+        PDUS_RECEIVED.labels(type_name).inc()
+        if self.pre_filter is not None and not self.pre_filter.accept(data):
+            PDUS_FILTERED.labels(type_name).inc()
+            return
+        try:
+            pdu = createPdu(data)    # None if the PDU type has no decoder
+        except struct.error:    # Body shorter than its type requires
+            pdu = None
+        if pdu is None:
+            self.undecodable_datagrams += 1
+            PDUS_UNDECODABLE.labels(type_name).inc()
+            logger.debug("Undecodable %s datagram of %d bytes", type_name, len(data))
+            return
+        PDUS_DECODED.labels(type_name).inc()
+        self.sender = sender
+        for listener in self.listeners:
+            listener.on_pdu_received(pdu)
+
     def receive_pdu(self) -> None:
         """TBD"""
         while True:
-            data = self.sock.recv(1024)
-            pdu = createPdu(data)
-            for listener in self.listeners:
-                listener.on_pdu_received(pdu)
\ No newline at end of file
+            count = self.receive_burst()
+            for index in range(count):
+                self.process_datagram(self.get_datagram(index), self.get_sender(index))
@@ -0,0 +1,267 @@
+"""Record raw DIS datagrams to an append-only capture file and replay them with original timing.
+
+Capture file: a 24 byte header (magic, version, wall clock start time) followed by records, each a
+12 byte header (nanoseconds since capture start, datagram length) and the datagram bytes. A sidecar
+"<capture>.idx" file holds (time, file offset) pairs of one record every index_interval, so a
+replay can seek by time without reading the capture up to that point. Both files are only ever
+appended to; a capture cut short by a crash is read up to its last complete record.
+
+Replay from the command line (run from src):
+    python -m lib.simulation.communication.pduCapture exercise.discap --speed 2 --start 30
+"""
+
+import argparse
+import mmap
+import os
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+__author__ = "EnriqueMoran"
+
+MAGIC = b"DISCAP\x00\x00"
+VERSION = 1
+FILE_HEADER = struct.Struct("<8sH6xd")    # magic, version, wall clock start time (s)
+RECORD_HEADER = struct.Struct("<qI")    # ns since capture start, datagram length
+INDEX_ENTRY = np.dtype([("time", "<i8"), ("offset", "<u8")])
+
+
+def index_path(path: str) -> str:
+    return path + ".idx"
+
+
+class PduRecorder:
+    """
+    Appends every datagram handed to record() to a capture file. Writes go through a large buffer,
+    so recording costs a memory copy on the receive thread in the common case.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        index_interval: float = 0.1,
+        clock=time.monotonic_ns,
+        buffer_size: int = 1 << 20,
+    ) -> None:
+        """
+        :param path: Capture file to create. The .idx sidecar is created next to it.
+        :param index_interval: Seconds between index entries.
+        :param clock: Function returning monotonic time in nanoseconds.
+        """
+        self.path = path
+        self.clock = clock
+        self.index_interval = int(index_interval * 1e9)
+        self._lock = threading.Lock()
+        self._file = open(path, "wb", buffering=buffer_size)
+        self._index = open(index_path(path), "wb")
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, time.time()))
+        self._offset = FILE_HEADER.size
+        self._start = clock()
+        self._next_index = 0
+        self.records = 0
+        self.bytes_written = FILE_HEADER.size
+
+    def record(self, data) -> None:
+        """
+        Append one datagram (any bytes-like object), timestamped now.
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            elapsed = self.clock() - self._start
+            if elapsed >= self._next_index:
+                self._index.write(np.array([(elapsed, self._offset)], INDEX_ENTRY).tobytes())
+                self._next_index = elapsed + self.index_interval
+            size = len(data)
+            self._file.write(RECORD_HEADER.pack(elapsed, size))
+            self._file.write(data)
+            self._offset += RECORD_HEADER.size + size
+            self.records += 1
+            self.bytes_written = self._offset
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._index.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._index.close()
+                self._file = self._index = None
+
+    def __enter__(self) -> "PduRecorder":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class PduCapture:
+    """
+    Read-only view of a capture file through mmap: only the pages actually read are loaded, so
+    captures larger than RAM can be replayed and sought.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < FILE_HEADER.size:
+            raise ValueError(f"{path} is not a PDU capture: file too short")
+        magic, version, self.start_wall_time = FILE_HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} PDU capture")
+        self._index = self._load_index()
+
+    def _load_index(self) -> np.ndarray:
+        path = index_path(self.path)
+        if os.path.exists(path):
+            size = os.path.getsize(path) // INDEX_ENTRY.itemsize    # Ignore a partial last entry
+            index = np.fromfile(path, dtype=INDEX_ENTRY, count=size)
+            index = index[index["offset"] < len(self._mmap)]
+            if len(index):
+                return index
+        # No usable index, only the first record can be sought to
+        return np.array([(0, FILE_HEADER.size)], dtype=INDEX_ENTRY)
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "PduCapture":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def seek(self, start: float) -> int:
+        """
+        Return the offset of the first record at or after start seconds from capture start.
+        """
+        start_ns = int(start * 1e9)
+        position = np.searchsorted(self._index["time"], start_ns, side="right") - 1
+        offset = int(self._index["offset"][max(position, 0)])
+        for record_offset, elapsed, _ in self._scan(offset):
+            if elapsed >= start_ns:
+                return record_offset
+        return len(self._mmap)
+
+    def _scan(self, offset: int):
+        """
+        Yield (offset, ns since capture start, datagram bytes) of the records from offset on.
+        """
+        data = self._mmap
+        end = len(data)
+        while offset + RECORD_HEADER.size <= end:
+            elapsed, size = RECORD_HEADER.unpack_from(data, offset)
+            payload_start = offset + RECORD_HEADER.size
+            if payload_start + size > end:    # Truncated last record
+                return
+            yield offset, elapsed, data[payload_start:payload_start + size]
+            offset = payload_start + size
+
+    def records(self, start: float = 0.0, end: float = None):
+        """
+        Yield (seconds since capture start, datagram bytes) of the records in [start, end).
+        """
+        end_ns = None if end is None else int(end * 1e9)
+        for _, elapsed, datagram in self._scan(self.seek(start)):
+            if end_ns is not None and elapsed >= end_ns:
+                return
+            yield elapsed / 1e9, datagram
+
+    def duration(self) -> float:
+        """
+        Return the time of the last complete record in seconds, reading from the last index entry.
+        """
+        last = 0
+        for _, elapsed, _ in self._scan(int(self._index["offset"][-1])):
+            last = elapsed
+        return last / 1e9
+
+
+class PduReplayer:
+    """
+    Re-emit the records of a capture through send (for example MulticastManager.send_bytes),
+    keeping their original spacing scaled by speed. Deadlines are taken from the capture
+    timestamps, not accumulated, so the replay does not drift.
+    """
+
+    def __init__(self, capture: PduCapture, send, speed: float = 1.0, clock=time.monotonic,
+                 sleep=time.sleep) -> None:
+        """
+        :param speed: Replay rate: 1 real time, N N times faster, 0 as fast as possible.
+        """
+        self.capture = capture
+        self.send = send
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+        self.sent = 0
+        self.max_lateness = 0.0    # Seconds, worst delay of a send behind its deadline
+        self._stop_event = threading.Event()
+
+    def play(self, start: float = 0.0, end: float = None) -> int:
+        """
+        Replay records in [start, end) seconds of capture time, blocking until done or stopped.
+
+        :return: Number of datagrams sent.
+        """
+        self._stop_event.clear()
+        sent = 0
+        origin = None
+        for elapsed, datagram in self.capture.records(start, end):
+            if self._stop_event.is_set():
+                break
+            if self.speed > 0:
+                now = self.clock()
+                if origin is None:
+                    origin = now - (elapsed - start) / self.speed
+                deadline = origin + (elapsed - start) / self.speed
+                if deadline > now:
+                    self.sleep(deadline - now)
+                else:
+                    self.max_lateness = max(self.max_lateness, now - deadline)
+            self.send(datagram)
+            sent += 1
+        self.sent += sent
+        return sent
+
+    def stop(self) -> None:
+        """Make play return before the next datagram. Safe to call from any thread."""
+        self._stop_event.set()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a DIS PDU capture over UDP")
+    parser.add_argument("capture", help="capture file written by PduRecorder")
+    parser.add_argument("--group", default="127.0.0.1", help="destination multicast group")
+    parser.add_argument("--port", type=int, default=3000, help="destination port")
+    parser.add_argument("--iface", default="127.0.0.1", help="outgoing multicast interface")
+    parser.add_argument("--ttl", type=int, default=2)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 for real time, N for N times faster, 0 as fast as possible")
+    parser.add_argument("--start", type=float, default=0.0, help="seconds into the capture")
+    parser.add_argument("--end", type=float, default=None, help="seconds into the capture")
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, args.ttl)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(args.iface))
+    destination = (args.group, args.port)
+    with PduCapture(args.capture) as capture:
+        replayer = PduReplayer(capture, lambda data: sock.sendto(data, destination), args.speed)
+        started = time.monotonic()
+        sent = replayer.play(args.start, args.end)
+    print(f"Sent {sent} datagrams in {time.monotonic() - started:.3f} s, "
+          f"max lateness {replayer.max_lateness * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
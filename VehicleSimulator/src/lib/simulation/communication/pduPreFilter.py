@@ -0,0 +1,79 @@
+"""Reject datagrams from their raw header bytes, before any PDU object is built."""
+
+import struct
+
+__author__ = "EnriqueMoran"
+
+# exerciseID (byte 1), pduType (byte 2), then siteID and applicationID of the EntityID record that
+# follows the 12 byte header (entityID for ESPDUs, originatingEntityID for simulation management).
+_PREFIX = struct.Struct(">xBB9xHH")
+_HEADER = struct.Struct(">xBB")    # exerciseID and pduType alone, for PDUs shorter than _PREFIX
+HEADER_SIZE = 12
+
+ENTITY_STATE_PDU = 1
+START_RESUME_PDU = 13
+STOP_FREEZE_PDU = 14
+
+ID_BEARING_PDU_TYPES = frozenset((ENTITY_STATE_PDU, START_RESUME_PDU, STOP_FREEZE_PDU))
+
+
+class PduPreFilter:
+    """
+    Header-only filter for raw datagrams. Counters are updated by the receiving thread only.
+
+    Reads exercise, PDU type, site and application with a single struct unpack and asks
+    matches(exercise, application, site) whether the PDU is wanted. PDU types that carry no known
+    entity ID are checked with application and site set to -1, like
+    SimulationManager.can_process_pdu does, and so are datagrams that end before the entity ID.
+    Only datagrams shorter than the 12 byte PDU header count as malformed.
+    """
+
+    def __init__(self, matches) -> None:
+        self.matches = matches
+        self.received = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.malformed = 0
+        self.rejected_bytes = 0    # Bytes never handed to the decoder
+
+    def accept(self, data) -> bool:
+        """
+        Return True if the datagram must be decoded, False otherwise.
+
+        :param data: Raw datagram (any bytes-like object).
+        """
+        self.received += 1
+        if len(data) >= _PREFIX.size:
+            exercise, pdu_type, site, app = _PREFIX.unpack_from(data)
+            if pdu_type not in ID_BEARING_PDU_TYPES:
+                app = site = -1
+        elif len(data) >= HEADER_SIZE:
+            exercise, pdu_type = _HEADER.unpack_from(data)
+            app = site = -1
+        else:
+            self.malformed += 1
+            self.rejected_bytes += len(data)
+            return False
+        if self.matches(exercise, app, site):
+            self.accepted += 1
+            return True
+        self.rejected += 1
+        self.rejected_bytes += len(data)
+        return False
+
+    def get_stats(self) -> dict:
+        """Return counters, including the share of datagrams that skipped decoding."""
+        received = self.received
+        avoided = self.rejected + self.malformed
+        return {
+            "received": received,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "malformed": self.malformed,
+            "rejected_bytes": self.rejected_bytes,
+            "decode_avoided_ratio": avoided / received if received else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.received = self.accepted = self.rejected = self.malformed = 0
+        self.rejected_bytes = 0
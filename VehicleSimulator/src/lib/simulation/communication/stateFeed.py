@@ -0,0 +1,207 @@
+"""Publish the entity table to co-located processes through shared memory.
+
+A visualizer or recorder on the same host attaches to the block by name and copies the whole
+table in one read, without joining the multicast group nor decoding ESPDUs. Consistency is kept
+with a seqlock: the publisher makes the sequence odd, writes, then makes it even again; a reader
+copies the table between two reads of the sequence and retries if they differ or are odd. Readers
+never block the publisher. Store order is only guaranteed on x86 (TSO); other architectures would
+need fences that Python does not expose.
+
+Layout, little-endian, the block being HEADER_SIZE + capacity * RECORD.itemsize bytes:
+
+    offset  type     field
+    0       4s       magic, b"VSSF"
+    4       u32      version, VERSION
+    8       u32      capacity, max records
+    12      u32      record_size, RECORD.itemsize (56)
+    16      u64      sequence, odd while a frame is being written
+    24      u32      count, records in the frame
+    28      u32      reserved
+    32      f64      time, CLOCK_MONOTONIC seconds the frame was extrapolated to
+    40..63           reserved
+    64      RECORD[capacity]
+
+    record  type     field
+    0       u16      site
+    2       u16      application
+    4       u16      entity
+    6       u16      reserved
+    8       f64[3]   location, ECEF meters
+    32      f64[3]   orientation, psi, theta, phi radians
+
+Reader example:
+    reader = StateFeedReader("vehiclesimulator")
+    frame = reader.read()
+    frame.records["location"]    # (count, 3) array
+"""
+
+import logging
+import os
+import time
+
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+__author__ = "EnriqueMoran"
+
+logger = logging.getLogger("StateFeed")
+
+MAGIC = b"VSSF"
+VERSION = 1
+HEADER_SIZE = 64
+HEADER = np.dtype([
+    ("magic", "S4"),
+    ("version", "<u4"),
+    ("capacity", "<u4"),
+    ("record_size", "<u4"),
+    ("sequence", "<u8"),
+    ("count", "<u4"),
+    ("reserved", "<u4"),
+    ("time", "<f8"),
+])
+RECORD = np.dtype([
+    ("site", "<u2"),
+    ("application", "<u2"),
+    ("entity", "<u2"),
+    ("reserved", "<u2"),
+    ("location", "<f8", (3,)),
+    ("orientation", "<f8", (3,)),
+])
+
+StateFrame = namedtuple("StateFrame", ["sequence", "time", "records"])
+
+_published = set()    # Names of the blocks created by this process
+
+
+def _views(buffer, capacity: int) -> tuple:
+    header = np.ndarray(1, dtype=HEADER, buffer=buffer)
+    records = np.ndarray(capacity, dtype=RECORD, buffer=buffer, offset=HEADER_SIZE)
+    return header, records
+
+
+class StateFeedPublisher:
+    """
+    Owner of the shared memory block, written by a single thread.
+    """
+
+    def __init__(self, name: str, capacity: int = 4096) -> None:
+        """
+        :param name: Shared memory name the readers attach to.
+        :param capacity: Max entities per frame, extra entities are left out.
+        """
+        self.name = name
+        self.capacity = capacity
+        self.truncated = False
+        size = HEADER_SIZE + capacity * RECORD.itemsize
+        try:
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:    # Left behind by a publisher that did not shut down
+            logger.warning("Replacing stale state feed %s", name)
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self._memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _published.add(self._memory._name)
+        self._header, self._records = _views(self._memory.buf, capacity)
+        self._records[:] = np.zeros(1, dtype=RECORD)
+        self._header[0] = (MAGIC, VERSION, capacity, RECORD.itemsize, 0, 0, 0, np.nan)
+        logger.info("State feed %s published, %d entities max", name, capacity)
+
+    @property
+    def sequence(self) -> int:
+        return int(self._header["sequence"][0])
+
+    def publish(self, entity_ids: list, locations: np.ndarray, orientations: np.ndarray,
+                now: float = None) -> None:
+        """
+        Replace the frame with the given entities.
+
+        :param entity_ids: (site, application, entity) of each entity.
+        :param locations: (N, 3) ECEF meters.
+        :param orientations: (N, 3) psi, theta, phi radians.
+        :param now: CLOCK_MONOTONIC time the state is valid at, current time if None.
+        """
+        if now is None:
+            now = time.monotonic()
+        count = len(entity_ids)
+        if count > self.capacity:
+            if not self.truncated:
+                logger.warning("State feed %s full, publishing %d of %d entities", self.name,
+                               self.capacity, count)
+                self.truncated = True
+            count = self.capacity
+        records = self._records[:count]
+        sequence = self._header["sequence"][0]
+        self._header["sequence"] = sequence + 1
+        if count:
+            ids = np.array(entity_ids[:count], dtype=np.uint16).reshape(count, 3)
+            records["site"] = ids[:, 0]
+            records["application"] = ids[:, 1]
+            records["entity"] = ids[:, 2]
+            records["location"] = locations[:count]
+            records["orientation"] = orientations[:count]
+        self._header["count"] = count
+        self._header["time"] = now
+        self._header["sequence"] = sequence + 2
+
+    def close(self) -> None:
+        """Remove the block, attached readers keep their mapping until they close."""
+        self._header = self._records = None
+        _published.discard(self._memory._name)
+        self._memory.close()
+        self._memory.unlink()
+
+
+class StateFeedReader:
+    """
+    Read only view of a block written by a StateFeedPublisher, possibly in another process.
+    """
+
+    def __init__(self, name: str) -> None:
+        """
+        :raises FileNotFoundError: No feed is published under name.
+        :raises ValueError: The block is not a state feed of this version.
+        """
+        self._memory = shared_memory.SharedMemory(name=name)
+        if os.name == "posix" and self._memory._name not in _published:
+            # Attaching registers the block too, the tracker would unlink it when we exit
+            resource_tracker.unregister(self._memory._name, "shared_memory")
+        magic, version, capacity, record_size = (
+            np.ndarray(1, dtype=HEADER, buffer=self._memory.buf)[0].item()[:4])
+        if magic != MAGIC or version != VERSION or record_size != RECORD.itemsize:
+            self._memory.close()
+            raise ValueError(f"{name} is not a version {VERSION} state feed")
+        self.capacity = capacity
+        self._header, self._records = _views(self._memory.buf, self.capacity)
+
+    @property
+    def sequence(self) -> int:
+        """Sequence of the last frame, changes when a new frame is published."""
+        return int(self._header["sequence"][0])
+
+    def read(self, max_retries: int = 100) -> StateFrame:
+        """
+        Copy the current frame.
+
+        :param max_retries: Attempts while the publisher is writing before giving up.
+        :return: StateFrame with a RECORD array of count entities, None if no consistent frame
+                 was read.
+        """
+        header = self._header
+        for _ in range(max_retries):
+            sequence = int(header["sequence"][0])
+            if sequence & 1:
+                time.sleep(0)    # Let the publisher finish
+                continue
+            count = min(int(header["count"][0]), self.capacity)
+            records = self._records[:count].copy()
+            frame_time = float(header["time"][0])
+            if int(header["sequence"][0]) == sequence:
+                return StateFrame(sequence, frame_time, records)
+        return None
+
+    def close(self) -> None:
+        self._header = self._records = None
+        self._memory.close()
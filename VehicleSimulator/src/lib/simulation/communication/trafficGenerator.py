@@ -0,0 +1,159 @@
+"""Synthetic DIS traffic: pre-encoded ESPDU, StartResume and StopFreeze datagrams sent at a rate."""
+
+import math
+import random
+import socket
+import time
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu, StartResumePdu, StopFreezePdu
+
+from lib.utils.pduFilter import WILDCARD, PduFilterSet
+
+__author__ = "EnriqueMoran"
+
+ENTITY_STATE = "espdu"
+START_RESUME = "start_resume"
+STOP_FREEZE = "stop_freeze"
+DEFAULT_MIX = {ENTITY_STATE: 0.98, START_RESUME: 0.01, STOP_FREEZE: 0.01}
+
+
+def parse_mix(text: str) -> dict:
+    """
+    Parse "espdu=0.9,start_resume=0.05,stop_freeze=0.05" into a weight dict.
+    """
+    mix = {}
+    for item in text.split(","):
+        name, weight = item.split("=")
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Unknown PDU kind {name}, expected one of {list(DEFAULT_MIX)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def _serialize(pdu) -> bytes:
+    memory_stream = BytesIO()
+    pdu.serialize(DataOutputStream(memory_stream))
+    return memory_stream.getvalue()
+
+
+class TrafficGenerator:
+    """
+    Builds a pool of encoded datagrams once, then sends them round-robin at a target rate, so the
+    sender spends its time in sendto and can outrun the receiver under test.
+
+    Datagrams either match one of the allowed (exercise, application, site) filter entries or
+    carry IDs that none of them allow, in match_ratio proportion. StopFreeze PDUs use reason 1
+    (recess) and frozen behavior 0, so they neither terminate nor pause the receiver.
+    """
+
+    def __init__(
+        self,
+        filters: list,
+        entity_count: int = 1000,
+        match_ratio: float = 0.5,
+        mix: dict = None,
+        exclude_entity: int = None,
+        pool_size: int = 10000,
+        seed: int = 0,
+    ) -> None:
+        """
+        :param filters: pdu_filter.json entries (dicts with exercise_id, application_id, site_id).
+        :param entity_count: Distinct entities ESPDUs are spread over.
+        :param match_ratio: Share of datagrams the filters accept.
+        :param mix: Weight of each PDU kind, DEFAULT_MIX if None.
+        :param exclude_entity: Entity number never used, e.g. the receiver own entity.
+        """
+        self.random = random.Random(seed)
+        self.filters = filters
+        self.entity_count = entity_count
+        self.match_ratio = match_ratio
+        self.mix = mix or DEFAULT_MIX
+        self.exclude_entity = exclude_entity
+        self._filter_set = PduFilterSet.from_json(filters)
+        self.matching = 0    # Datagrams of the pool the filters accept
+        self.datagrams = [self._build() for _ in range(pool_size)]
+        self.sent = 0
+
+    def _ids(self, matching: bool) -> tuple:
+        if matching:
+            item = self.random.choice(self.filters)
+            return tuple(self.random.randint(1, 60000) if item.get(key, WILDCARD) == WILDCARD
+                         else item[key] for key in ("exercise_id", "application_id", "site_id"))
+        while True:
+            ids = (self.random.randint(1, 255), self.random.randint(1, 60000),
+                   self.random.randint(1, 60000))
+            if not self._filter_set.matches(*ids):
+                return ids
+
+    def _build(self) -> bytes:
+        matching = self.random.random() < self.match_ratio
+        self.matching += matching
+        exercise, application, site = self._ids(matching)
+        kind = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if kind == ENTITY_STATE:
+            pdu = EntityStatePdu()
+            entity = self.random.randint(1, self.entity_count)
+            if entity == self.exclude_entity:
+                entity = self.entity_count + 1
+            pdu.entityID.siteID, pdu.entityID.applicationID = site, application
+            pdu.entityID.entityID = entity
+            pdu.entityLocation.x = self.random.uniform(-6.4e6, 6.4e6)
+            pdu.entityLocation.y = self.random.uniform(-6.4e6, 6.4e6)
+            pdu.entityLocation.z = self.random.uniform(-6.4e6, 6.4e6)
+            pdu.entityLinearVelocity.x = self.random.uniform(-300, 300)
+            pdu.deadReckoningParameters.deadReckoningAlgorithm = 2
+            pdu.marking.setString(f"LOAD{entity}")
+        else:
+            pdu = StartResumePdu() if kind == START_RESUME else StopFreezePdu()
+            pdu.originatingEntityID.siteID = site
+            pdu.originatingEntityID.applicationID = application
+            if kind == STOP_FREEZE:
+                pdu.reason, pdu.frozenBehavior = 1, 0
+        pdu.exerciseID = exercise
+        return _serialize(pdu)
+
+    def run(self, send, rate: float, duration: float, clock=time.monotonic,
+            sleep=time.sleep) -> int:
+        """
+        Send datagrams through send(data) at rate per second for duration seconds. Datagrams are
+        sent in batches every millisecond against monotonic deadlines.
+
+        :return: Number of datagrams sent.
+        """
+        interval = 0.001
+        batches = math.ceil(duration / interval)
+        pool = self.datagrams
+        position = 0
+        sent = 0
+        start = clock()
+        for batch in range(batches):
+            deadline = start + batch * interval
+            now = clock()
+            if deadline > now:
+                sleep(deadline - now)
+            due = int((batch + 1) * interval * rate)    # Total owed by the end of this batch
+            while sent < due:
+                send(pool[position])
+                position = (position + 1) % len(pool)
+                sent += 1
+        self.sent += sent
+        return sent
+
+
+def udp_sender(address: tuple, ttl: int = 2, iface: str = "127.0.0.1"):
+    """
+    Return a send(data) callable writing datagrams to address over a new UDP socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(iface))
+
+    def send(data) -> None:
+        try:
+            sock.sendto(data, address)
+        except BlockingIOError:    # Local queue full, same as a drop on the wire
+            pass
+    return send
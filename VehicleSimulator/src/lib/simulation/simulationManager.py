@@ -1,24 +1,53 @@
+import asyncio
+import collections
 import configparser
 import datetime
 import json
 import logging
+import math
 import threading
 import time
 
 from enum import Enum
 
+from common import metrics
+
+from lib.core import scheduler
 from lib.entity import entityManager
+from lib.kinematics import deadReckoning
 
-from lib.simulation.communication import multicastManager
-from lib.utils.pduFilter import PduFilter
+from lib.simulation.communication import asyncMulticastManager, espduEncoder, multicastManager
+from lib.simulation.communication import pduCapture, pduPreFilter
+from lib.utils import logUtils
+from lib.utils.pduFilter import PduFilterSet
 
-from opendis.dis7 import EntityStatePdu
+from opendis.dis7 import AcknowledgePdu, EntityStatePdu
 from opendis.PduFactory import PduTypeDecoders
 
 __author__ = "EnriqueMoran"
 
 logger = logging.getLogger("SimulationManager")
 
+PDUS_DISPATCHED = metrics.REGISTRY.counter("dis_pdus_dispatched_total",
+                                           "PDUs processed by the simulation, by PDU type",
+                                           ("type",))
+ESPDUS_SENT = metrics.REGISTRY.counter("dis_espdus_sent_total", "Own entity ESPDUs sent")
+FLEET_ESPDUS_SENT = metrics.REGISTRY.counter("dis_fleet_espdus_sent_total",
+                                             "Locally simulated fleet ESPDUs sent")
+ACKNOWLEDGEMENTS_SENT = metrics.REGISTRY.counter("dis_acknowledgements_sent_total",
+                                                 "Acknowledge PDUs sent for control PDUs, by "
+                                                 "acknowledged PDU type", ("type",))
+
+ACKNOWLEDGE_START_RESUME = 3    # AcknowledgePdu.acknowledgeFlag values
+ACKNOWLEDGE_STOP_FREEZE = 4
+ABLE_TO_COMPLY = 1    # AcknowledgePdu.responseFlag
+RECENT_REQUESTS = 8    # Control requestIDs remembered per originator to spot retransmissions
+RECENT_ORIGINATORS = 16    # Originators remembered, the oldest is forgotten first
+
+class Transport(Enum):
+    THREADED = "threaded"    # Blocking sockets, one thread per loop
+    ASYNCIO = "asyncio"      # Single asyncio event loop, see SimulationManager.run_async
+
 class ExerciseStatus(Enum):
     UNINITIALIZED = 0
     RUNNING = 1
@@ -28,25 +57,105 @@ class ExerciseStatus(Enum):
     def to_string(self) -> str:
         return self.name
 
+class ExerciseState:
+    """
+    Exercise status shared by the receiving and worker threads. A transition notifies the threads
+    blocked in wait_for and calls the registered listeners with (old, new) status, in the thread
+    that made the change. Setting the current status again does nothing.
+    """
+
+    def __init__(self) -> None:
+        self._status = ExerciseStatus.UNINITIALIZED
+        self._condition = threading.Condition()
+        self._listeners = []
+
+    @property
+    def status(self) -> ExerciseStatus:
+        return self._status
+
+    def set(self, status: ExerciseStatus) -> bool:
+        """
+        :return: True if the status changed.
+        """
+        with self._condition:
+            old = self._status
+            if old == status:
+                return False
+            self._status = status
+            self._condition.notify_all()
+        logger.debug("Exercise status %s -> %s", old.to_string(), status.to_string())
+        for listener in self._listeners:
+            listener(old, status)
+        return True
+
+    def add_listener(self, listener) -> None:
+        self._listeners.append(listener)
+
+    def wait_for(self, *statuses: ExerciseStatus, timeout: float = None) -> bool:
+        """
+        Block until the status is one of statuses.
+
+        :return: False if timeout expired first.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._status in statuses, timeout)
+
 class SimulationManager:
 
-    def __init__(self, kinematics_system=None) -> None:
+    def __init__(self, kinematics_system=None, entity_store=None, start_threads: bool = True) -> None:
+        """
+        :param start_threads: Start the THREADED transport receive and send threads. Tools driving
+                              the receive path themselves pass False.
+        """
         self.exercise_time = 0
-        self.exercise_status = ExerciseStatus.UNINITIALIZED
+        self.exercise_state = ExerciseState()
         self.multicast_manager = None
         self.recv_pdu_thread = None
         self.send_pdu_thread = None
-        self.message_frequency = 0
+        self.message_frequency = 0    # Min ESPDU rate in Hz, the dead reckoning heartbeat
+        self.dead_reckoning_rate = 60.0    # Threshold checks per second, the kinematics rate
         self.exercise_id = 0
         self.application_id = 0
         self.site_id = 0
         self.entity_id = 0
-        self.pdu_filter_list = []
+        self.pdu_filter_set = PduFilterSet()
         self.kinematics_system = kinematics_system
+        self.entity_store = entity_store    # Remote entities on the wire, by (site, app, entity)
+        self.fleet = None    # Locally simulated entities, see set_fleet
+        self.entity_timeout = 12.0    # Seconds without ESPDU before a remote entity is dropped
         self._data_initialized = False    # Set to True when received ESPDU for the first time
+        self._entity_state_pdu = EntityStatePdu()    # Reused on every send
+        self._espdu_encoder = espduEncoder.EntityStatePduEncoder()
+        self._espdu_static_generation = 0    # Bumped after every own entity ESPDU received
+        self._espdu_static_packed = None    # Generation the encoder static fields come from
+        self._recent_requests = {}    # requestIDs of the last control PDUs applied, by originator
+        self.dead_reckoning = deadReckoning.DeadReckoningModel()
+        self.transport = Transport.THREADED
+        self._loop = None
+        self._stop_event = None
+        self.scheduler = scheduler.Scheduler(paused=True)    # Runs while exercise is RUNNING
         self.read_config()
-        self.listen_to_pdu()
-        self.emit_entity_pdus()
+        self.scheduler.add_task("espdu", 1 / self.dead_reckoning_rate, self.send_pending_pdu)
+        self.scheduler.add_task("entity_expiry", 1.0, self.expire_remote_entities)
+        self.scheduler.export_metrics("simulation")
+        self.exercise_state.add_listener(self._on_status_changed)
+        if self.transport == Transport.THREADED and start_threads:
+            self.listen_to_pdu()
+            self.emit_entity_pdus()
+
+    @property
+    def exercise_status(self) -> ExerciseStatus:
+        return self.exercise_state.status
+
+    @exercise_status.setter
+    def exercise_status(self, status: ExerciseStatus) -> None:
+        self.exercise_state.set(status)
+
+    def _on_status_changed(self, old: ExerciseStatus, new: ExerciseStatus) -> None:
+        if new == ExerciseStatus.RUNNING:
+            self.scheduler.resume()
+        else:
+            self.scheduler.pause()
 
     def __del__(self) -> None:
         if self.recv_pdu_thread:
@@ -63,28 +172,55 @@ class SimulationManager:
         pdu_filter_path = config.get('FILES', 'pdu_filter_path')
         with open(pdu_filter_path, 'r') as f:
             allowed_pdu = json.load(f)
-            for item in allowed_pdu:
-                exercise_id = item['exercise_id']
-                application_id = item['application_id']
-                site_id = item['site_id']
-                filter = PduFilter(exercise_id, application_id, site_id)
-                self.pdu_filter_list.append(filter)
+            self.pdu_filter_set = PduFilterSet.from_json(allowed_pdu)
 
         multicast_group = str(config.get("CONNECTION", 'multicast_group'))
         multicast_port = int(config.get("CONNECTION", 'multicast_port'))
         multicast_iface = str(config.get("CONNECTION", 'multicast_iface'))
         ttl = int(config.get("CONNECTION", 'ttl'))
+        receive_buffer_size = config.getint("CONNECTION", 'receive_buffer_size', fallback=0)
+        receive_burst_size = config.getint("CONNECTION", 'receive_burst_size', fallback=64)
         self.message_frequency = float(config.get("CONNECTION", 'message_frequency'))
+        self.dead_reckoning_rate = config.getfloat("SUBSYSTEMS", 'kinematics_rate', fallback=60.0)
+        self.transport = Transport(config.get("CONNECTION", 'transport',
+                                              fallback=Transport.THREADED.value))
+
+        self.dead_reckoning = deadReckoning.DeadReckoningModel(
+            config.getint("DEAD_RECKONING", 'algorithm',
+                          fallback=deadReckoning.DeadReckoningAlgorithm.FPW),
+            config.getfloat("DEAD_RECKONING", 'position_threshold', fallback=1.0),
+            config.getfloat("DEAD_RECKONING", 'orientation_threshold', fallback=3.0),
+            1 / self.message_frequency)
+        self.entity_timeout = config.getfloat("DEAD_RECKONING", 'entity_timeout', fallback=12.0)
 
         self.exercise_id = int(config.get("IDENTITY", 'exercise_id'))
         self.application_id = int(config.get("IDENTITY", 'application_id'))
         self.site_id = int(config.get("IDENTITY", 'site_id'))
         self.entity_id = int(config.get("IDENTITY", 'entity_id'))
 
-        self.multicast_manager = multicastManager.MulticastManager(multicast_group, multicast_port,
-                                                                   multicast_iface, ttl)
-        self.multicast_manager.create_connection()
+        if self.transport == Transport.ASYNCIO:    # Connection is created in run_async
+            manager_class = asyncMulticastManager.AsyncMulticastManager
+        else:
+            manager_class = multicastManager.MulticastManager
+        self.multicast_manager = manager_class(multicast_group, multicast_port, multicast_iface,
+                                               ttl, receive_buffer_size, receive_burst_size)
+        if self.transport == Transport.THREADED:
+            self.multicast_manager.create_connection()
+        self.multicast_manager.pre_filter = pduPreFilter.PduPreFilter(self.matches_filters)
+        capture_path = config.get("CAPTURE", 'path', fallback="")
+        if capture_path:
+            capture_path = datetime.datetime.now().strftime(capture_path)
+            self.multicast_manager.recorder = pduCapture.PduRecorder(capture_path)
+            logger.info("Recording received datagrams to %s", capture_path)
         self.multicast_manager.add_listener(self)
+        metrics.REGISTRY.callback("dis_kernel_drops_total",
+                                  "Datagrams dropped by the kernel, receive queue full",
+                                  kind="counter").add_source(
+            "simulation", lambda: {(): self.multicast_manager.kernel_drops})
+        metrics.REGISTRY.callback("dis_truncated_datagrams_total",
+                                  "Datagrams longer than the receive buffer",
+                                  kind="counter").add_source(
+            "simulation", lambda: {(): self.multicast_manager.truncated_datagrams})
 
     def listen_to_pdu(self) -> None:
         self.recv_pdu_thread = threading.Thread(target=self.multicast_manager.receive_pdu)
@@ -99,33 +235,194 @@ class SimulationManager:
     
     def send_entity_pdus(self) -> None:
         """
-        Send ESPDU periodically.
+        Run the ESPDU and remote entity expiry tasks until the scheduler is stopped. The thread
+        sleeps while the exercise is not running.
+        """
+        self.scheduler.run()
+
+    def set_fleet(self, fleet) -> None:
+        """
+        Send the ESPDUs of fleet, the entities simulated locally, and ignore them when they loop
+        back. Fleet entities keep their heading, pitch and speed, which dead reckoning
+        extrapolates, so each is only sent once per heartbeat, spread over the threshold checks.
+        """
+        self.fleet = fleet
+        self.scheduler.add_task("fleet_espdu", 1 / self.dead_reckoning_rate, self.send_fleet_pdus)
+
+    def send_fleet_pdus(self) -> None:
+        """
+        Send the ESPDUs of the fleet entities whose heartbeat share falls on this check.
+        """
+        if self.exercise_status != ExerciseStatus.RUNNING or not len(self.fleet):
+            return
+        count = math.ceil(len(self.fleet) * self.message_frequency / self.dead_reckoning_rate)
+        for data in self.fleet.encode_espdus(count, self.exercise_id,
+                                             self.dead_reckoning.algorithm):
+            self.multicast_manager.send_bytes(data)
+            FLEET_ESPDUS_SENT.inc()
+
+    def send_pending_pdu(self) -> None:
+        """
+        Send ESPDU if dead reckoning thresholds or heartbeat require it. Run at the kinematics
+        rate, so drift is caught on the step that crosses a threshold; without drift ESPDUs go
+        out at message_frequency.
         """
-        while True:
-            if self.exercise_status == ExerciseStatus.RUNNING:
-                if self._data_initialized:
-                    self.send_entity_state_pdu()
-            time.sleep(1 / self.message_frequency)
+        if self.exercise_status == ExerciseStatus.RUNNING:
+            if self._data_initialized and self.entity_state_changed():
+                self.send_entity_state_pdu()
+
+    async def run_async(self) -> None:
+        """
+        Serve PDU reception and periodic ESPDU emission on the running event loop until stop() is
+        called. Several simulations can be awaited together on the same loop.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        await self.multicast_manager.create_endpoint()
+        sender = asyncio.ensure_future(self.send_entity_pdus_async())
+        try:
+            await self._stop_event.wait()
+        finally:
+            sender.cancel()
+            try:
+                await sender
+            except asyncio.CancelledError:
+                pass
+            await self.multicast_manager.wait_closed()
+            logger.info("Simulation transport closed")
+
+    async def send_entity_pdus_async(self) -> None:
+        """
+        Send ESPDU periodically, coroutine counterpart of send_entity_pdus.
+        """
+        await self.scheduler.run_async()
+
+    def entity_state_changed(self) -> bool:
+        """
+        Return True if the own entity drifted from its dead reckoned state past the configured
+        thresholds, or if the heartbeat interval expired.
+        """
+        entity_system = entityManager.EntityManager()    # Singleton
+        location = entity_system.get_entity_location()
+        orientation = entity_system.get_entity_orientation()
+        return self.dead_reckoning.should_send(time.monotonic(),
+                                               (location.x, location.y, location.z),
+                                               (orientation.psi, orientation.theta,
+                                                orientation.phi))
+
+    def _own_entity_rates(self) -> tuple:
+        """
+        Return (ECEF acceleration, body angular velocity) of the own entity, zero if there is no
+        kinematics system.
+        """
+        if self.kinematics_system is None:
+            return (0.0, 0.0, 0.0), (0.0, 0.0, 0.0)
+        return (self.kinematics_system.get_acceleration(),
+                self.kinematics_system.get_angular_velocity())
+
+    def expire_remote_entities(self) -> None:
+        """
+        Drop remote entities that sent no ESPDU within entity_timeout.
+        """
+        if hasattr(self.entity_store, "expire"):    # Plain EntityStore keeps every entity
+            self.entity_store.expire(self.entity_timeout)
+
+    def stop(self) -> None:
+        """
+        Make run_async return. Safe to call from any thread.
+        """
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
 
     def on_pdu_received(self, pdu: EntityStatePdu) -> None:
+        type_name = multicastManager.pdu_type_name(pdu.pduType)
         if self.can_process_pdu(pdu):
+            PDUS_DISPATCHED.labels(type_name).inc()
             logger.debug("Processing %s", pdu.__class__.__name__)
+            if PduTypeDecoders[pdu.pduType] in (PduTypeDecoders[13], PduTypeDecoders[14]) and \
+                    self._is_retransmission(pdu):    # Our acknowledge was lost, send it again
+                logger.debug("Control request %d already applied", pdu.requestID)
+                self.acknowledge(pdu)
+                return
             if PduTypeDecoders[pdu.pduType] == PduTypeDecoders[13]:      # PduTypeDecoders.StartResumePdu
                 self.exercise_status = ExerciseStatus.RUNNING
+                self.dead_reckoning.reset()    # Announce current state right away
                 logger.info("Simulation Running")
+                self.acknowledge(pdu)
             elif PduTypeDecoders[pdu.pduType] == PduTypeDecoders[14]:    # PduTypeDecoders.StopFreezePdu
                 logger.debug("frozenBehavior: %d, reason: %d", pdu.frozenBehavior, pdu.reason)
                 if pdu.reason == 2:    # Exercise termination
                     self.exercise_status = ExerciseStatus.TERMINATED
                     self._data_initialized = False
                     logger.info("Simulation Terminated")
+                    logger.info("PDU pre-filter stats: %s",
+                                self.multicast_manager.pre_filter.get_stats())
+                    logger.info("PDU receive stats: %s",
+                                self.multicast_manager.get_receive_stats())
+                    if self.multicast_manager.recorder is not None:
+                        self.multicast_manager.recorder.flush()
                 elif pdu.frozenBehavior == 1:    # Stop transmitting PDUs
                     self.exercise_status = ExerciseStatus.PAUSED
                     logger.info("Simulation Paused")
+                self.acknowledge(pdu)
             elif PduTypeDecoders[pdu.pduType] == PduTypeDecoders[1]:     # PduTypeDecoders.EntityStatePdu
                 if pdu.entityID.entityID == self.entity_id:    # Own entity
                     entityManager.EntityManager().set_data(pdu)
+                    self._espdu_static_generation += 1    # Only this thread writes it
+                    self.dead_reckoning.reset()
                     self._data_initialized = True
+                elif self.fleet is not None and self.fleet.owns(pdu.entityID):
+                    pass    # Sent by send_fleet_pdus, looped back
+                elif self.entity_store is not None:
+                    self.entity_store.set_data(pdu)
+        else:
+            multicastManager.PDUS_FILTERED.labels(type_name).inc()
+
+    def acknowledge(self, pdu) -> None:
+        """
+        Answer a StartResume or StopFreeze PDU with an Acknowledge PDU, sent to the address the
+        PDU came from, or to the multicast group if it is unknown.
+        """
+        ack = AcknowledgePdu()
+        ack.exerciseID = pdu.exerciseID
+        ack.originatingEntityID.siteID = self.site_id
+        ack.originatingEntityID.applicationID = self.application_id
+        ack.originatingEntityID.entityID = self.entity_id
+        ack.receivingEntityID.siteID = pdu.originatingEntityID.siteID
+        ack.receivingEntityID.applicationID = pdu.originatingEntityID.applicationID
+        ack.receivingEntityID.entityID = pdu.originatingEntityID.entityID
+        if PduTypeDecoders[pdu.pduType] == PduTypeDecoders[13]:
+            ack.acknowledgeFlag = ACKNOWLEDGE_START_RESUME
+        else:
+            ack.acknowledgeFlag = ACKNOWLEDGE_STOP_FREEZE
+        ack.responseFlag = ABLE_TO_COMPLY
+        ack.requestID = pdu.requestID
+        try:
+            self.multicast_manager.send_pdu(ack, self.multicast_manager.sender)
+        except OSError as exc:
+            logger.warning("Acknowledge PDU for request %d not sent: %s", pdu.requestID, exc)
+            return
+        ACKNOWLEDGEMENTS_SENT.labels(pdu.__class__.__name__).inc()
+
+    def _is_retransmission(self, pdu) -> bool:
+        """
+        Return True if pdu is a retransmission of one of the last RECENT_REQUESTS control PDUs
+        applied from its originator. Senders that do not number their requests (requestID 0) are
+        never retransmissions.
+        """
+        if not pdu.requestID:
+            return False
+        originator = (pdu.originatingEntityID.siteID, pdu.originatingEntityID.applicationID,
+                      pdu.originatingEntityID.entityID)
+        recent = self._recent_requests.get(originator)
+        if recent is None:
+            if len(self._recent_requests) >= RECENT_ORIGINATORS:
+                del self._recent_requests[next(iter(self._recent_requests))]
+            recent = self._recent_requests[originator] = collections.deque(maxlen=RECENT_REQUESTS)
+        elif pdu.requestID in recent:
+            return True
+        recent.append(pdu.requestID)
+        return False
 
     def can_process_pdu(self, pdu: EntityStatePdu) -> bool:
         """
@@ -142,25 +439,31 @@ class SimulationManager:
         elif PduTypeDecoders[pdu.pduType] in has_entityID:
             pdu_app = pdu.entityID.applicationID
             pdu_site = pdu.entityID.siteID
-        pdu_filter = PduFilter(pdu_exercise, pdu_app, pdu_site)
-        can_be_processed = pdu_filter in self.pdu_filter_list
-        logger.debug("Received PDU (%s) - exercise_id: %d, application_id: %d, site_id: %d",\
-                        pdu.__class__.__name__, pdu_exercise, pdu_app,pdu_site)
-        if can_be_processed:
-            logger.debug("PDU matches filters, will be processed.")
-        else:
-            logger.debug("PDU does not match filters, won't be processed.")
+        can_be_processed = self.matches_filters(pdu_exercise, pdu_app, pdu_site)
+        logger.debug("Received PDU (%s) - exercise_id: %d, application_id: %d, site_id: %d, "
+                     "matches filters: %s", pdu.__class__.__name__, pdu_exercise, pdu_app, pdu_site,
+                     can_be_processed)
         return can_be_processed
 
+    def matches_filters(self, exercise: int, app: int, site: int) -> bool:
+        """
+        Return True if exercise, application and site are allowed by the PDU filter.
+        """
+        return self.pdu_filter_set.matches(exercise, app, site)
+
     def send_entity_state_pdu(self) -> None:
         entity_system = entityManager.EntityManager()    # Singleton
-        pdu = EntityStatePdu()
+        pdu = self._entity_state_pdu
+        # Read before the fields: data set after this read bumps it again and is packed next time
+        generation = self._espdu_static_generation
         pdu.exerciseID = self.exercise_id
         pdu.entityID.siteID = self.site_id
         pdu.entityID.applicationID = self.application_id
         pdu.timestamp = int(datetime.datetime.now().timestamp())
         pdu.capabilities = entity_system.get_capabilities()
-        pdu.deadReckoningParameters = entity_system.get_dead_reckoning_params()
+        dr_params = pdu.deadReckoningParameters    # Owned by the PDU, EntityManager's is shared
+        dr_params.parameters[:] = entity_system.get_dead_reckoning_params().parameters
+        dr_params.deadReckoningAlgorithm = self.dead_reckoning.algorithm
         pdu.entityAppearance = entity_system.get_entity_appearance()
         pdu.entityID.entityID = entity_system.get_entity_id()
         pdu.entityLinearVelocity = entity_system.get_entity_linear_velocity()
@@ -171,48 +474,24 @@ class SimulationManager:
         pdu.marking = entity_system.get_marking()
         pdu.numberOfVariableParameters = entity_system.get_number_of_variable_parameters()
         pdu.variableParameters = entity_system.get_variable_parameters()
+        orientation = (pdu.entityOrientation.psi, pdu.entityOrientation.theta,
+                       pdu.entityOrientation.phi)
+        world_acceleration, angular_velocity = self._own_entity_rates()
+        acceleration = self.dead_reckoning.espdu_acceleration(world_acceleration, orientation)
+        (dr_params.entityLinearAcceleration.x, dr_params.entityLinearAcceleration.y,
+         dr_params.entityLinearAcceleration.z) = acceleration
+        (dr_params.entityAngularVelocity.x, dr_params.entityAngularVelocity.y,
+         dr_params.entityAngularVelocity.z) = angular_velocity
 
-        log_message = "\t"*1 + f"exerciseID: {pdu.exerciseID} \n"+"\t"*1 + \
-                      f"siteID: {pdu.entityID.siteID} \n"+"\t"*1 + \
-                      f"applicationID: {pdu.entityID.applicationID} \n"+"\t"*1 + \
-                      f"entityID: {pdu.entityID.entityID} \n"+"\t"*1 + \
-                      f"timestamp: {pdu.timestamp} \n"+"\t"*1 + \
-                      f"capabilities: {pdu.capabilities} \n"+"\t"*1 + \
-                      f"deadReckoningParameters: \n"+"\t"*2 + \
-                      f"deadReckoningAlgorithm: {pdu.deadReckoningParameters.deadReckoningAlgorithm} \n"+"\t"*2 + \
-                      f"parameters: {pdu.deadReckoningParameters.parameters} \n"+"\t"*1 + \
-                      f"entityLinearAcceleration: \n"+"\t"*2 + \
-                      f"x: {pdu.deadReckoningParameters.entityLinearAcceleration.x} \n"+"\t"*2 + \
-                      f"y: {pdu.deadReckoningParameters.entityLinearAcceleration.y} \n"+"\t"*2 + \
-                      f"z: {pdu.deadReckoningParameters.entityLinearAcceleration.z} \n"+"\t"*1 + \
-                      f"entityAngularVelocity: \n"+"\t"*2 + \
-                      f"x: {pdu.deadReckoningParameters.entityAngularVelocity.x} \n"+"\t"*2 + \
-                      f"y: {pdu.deadReckoningParameters.entityAngularVelocity.y} \n"+"\t"*2 + \
-                      f"z: {pdu.deadReckoningParameters.entityAngularVelocity.z} \n"+"\t"*1 + \
-                      f"entityAppearance: {pdu.entityAppearance} \n"+"\t"*1 + \
-                      f"entityLinearVelocity: \n"+"\t"*2 + \
-                      f"x: {pdu.entityLinearVelocity.x} \n"+"\t"*2 + \
-                      f"y: {pdu.entityLinearVelocity.y} \n"+"\t"*2 + \
-                      f"z: {pdu.entityLinearVelocity.z} \n"+"\t"*1 + \
-                      f"entityLocation: \n"+"\t"*2 + \
-                      f"x: {pdu.entityLocation.x} \n"+"\t"*2 + \
-                      f"y: {pdu.entityLocation.y} \n"+"\t"*2 + \
-                      f"z: {pdu.entityLocation.z} \n"+"\t"*1 + \
-                      f"entityOrientation: \n"+"\t"*2 + \
-                      f"psi: {pdu.entityOrientation.psi} \n"+"\t"*2 + \
-                      f"theta: {pdu.entityOrientation.theta} \n"+"\t"*2 + \
-                      f"phi: {pdu.entityOrientation.phi} \n"+"\t"*1 + \
-                      f"entityType: \n"+"\t"*1 + \
-                      f"entityKind : {pdu.entityType.entityKind} \n"+"\t"*2 + \
-                      f"domain : {pdu.entityType.domain} \n"+"\t"*2 + \
-                      f"country : {pdu.entityType.country} \n"+"\t"*2 + \
-                      f"category : {pdu.entityType.category} \n"+"\t"*2 + \
-                      f"subcategory : {pdu.entityType.subcategory} \n"+"\t"*2 + \
-                      f"specific : {pdu.entityType.specific} \n"+"\t"*2 + \
-                      f"extra : {pdu.entityType.extra} \n"+"\t"*1 + \
-                      f"forceId: {pdu.forceId} \n"+"\t"*1 + \
-                      f"marking: {pdu.marking.characters} \n"+"\t"*2 + \
-                      f"numberOfVariableParameters: {pdu.numberOfVariableParameters} \n"+"\t"*2 + \
-                      f"variableParameters: {pdu.variableParameters}"
-        self.multicast_manager.send_pdu(pdu)
-        logger.debug("EntityStatePDU sent: \n%s", log_message)
+        if self._espdu_static_packed != generation:
+            self._espdu_encoder.set_static(pdu)
+            self._espdu_static_packed = generation
+        self.multicast_manager.send_bytes(self._espdu_encoder.encode(pdu))
+        ESPDUS_SENT.inc()
+        self.dead_reckoning.update(time.monotonic(),
+                                   (pdu.entityLocation.x, pdu.entityLocation.y,
+                                    pdu.entityLocation.z),
+                                   (pdu.entityLinearVelocity.x, pdu.entityLinearVelocity.y,
+                                    pdu.entityLinearVelocity.z),
+                                   orientation, acceleration, angular_velocity)
+        logger.debug("EntityStatePDU sent: \n%s", logUtils.PduDump(pdu))
@@ -0,0 +1,34 @@
+"""Lazy PDU dumps for log records, see common.logUtils for the logging setup."""
+
+__author__ = "EnriqueMoran"
+
+
+def format_pdu(pdu, indent: int = 1) -> str:
+    """
+    Render every field of an opendis PDU or record, one "name: value" line each, nesting records.
+    """
+    lines = []
+    for name, value in vars(pdu).items():
+        if hasattr(value, "__dict__"):
+            lines.append("\t" * indent + f"{name}:")
+            lines.append(format_pdu(value, indent + 1))
+        else:
+            lines.append("\t" * indent + f"{name}: {value}")
+    return "\n".join(lines)
+
+
+class PduDump:
+    """
+    Log argument rendering a PDU with format_pdu only if the record is emitted:
+    logger.debug("PDU: \\n%s", PduDump(pdu)) costs nothing when DEBUG is off. When it is on,
+    QueueHandler formats the message in the calling thread before enqueuing the record, so the PDU
+    may be reused right after the call, but the rendering cost is paid by the caller.
+    """
+
+    __slots__ = ("pdu",)
+
+    def __init__(self, pdu) -> None:
+        self.pdu = pdu
+
+    def __str__(self) -> str:
+        return format_pdu(self.pdu)
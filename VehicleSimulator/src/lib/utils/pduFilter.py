@@ -1,9 +1,73 @@
+WILDCARD = "*"    # Matches any value of a field
+
+
 class PduFilter:
 
     def __init__(self, exercise: int, app: int, site: int) -> None:
         self.exercise = exercise
         self.app = app
         self.site = site
-    
+
+    def key(self) -> tuple:
+        return (self.exercise, self.app, self.site)
+
     def __eq__(self, other: object) -> bool:
-        return isinstance(other, PduFilter) and other.exercise == self.exercise and other.app == self.app and other.site == self.site
\ No newline at end of file
+        return isinstance(other, PduFilter) and other.exercise == self.exercise and other.app == self.app and other.site == self.site
+
+    def __hash__(self) -> int:
+        return hash(self.key())
+
+
+class PduFilterSet:
+    """
+    Compiled allow-list of PduFilter entries with O(1) membership.
+
+    Any field of an entry may be WILDCARD. Entries are stored in a set keyed by
+    (exercise, app, site) with wildcard fields replaced by WILDCARD, and every distinct wildcard
+    layout in use is remembered. A lookup probes the set once per layout, so its cost depends on
+    how many layouts are used (at most 8), not on how many entries there are.
+    """
+
+    def __init__(self, filters: list = ()) -> None:
+        self._keys = set()
+        self._layouts = []    # Tuples of 3 booleans, True where the field is a wildcard
+        for pdu_filter in filters:
+            self.add(pdu_filter)
+
+    @classmethod
+    def from_json(cls, items: list) -> "PduFilterSet":
+        """
+        Build the set from the pdu_filter.json entries. A missing field or a "*" value is a
+        wildcard.
+        """
+        filters = [PduFilter(item.get('exercise_id', WILDCARD),
+                             item.get('application_id', WILDCARD),
+                             item.get('site_id', WILDCARD)) for item in items]
+        return cls(filters)
+
+    def add(self, pdu_filter: PduFilter) -> None:
+        key = pdu_filter.key()
+        layout = tuple(value == WILDCARD for value in key)
+        self._keys.add(key)
+        if layout not in self._layouts:
+            self._layouts.append(layout)
+            self._layouts.sort(key=sum)    # Exact layouts first, they are the most common
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, pdu_filter: PduFilter) -> bool:
+        return self.matches(pdu_filter.exercise, pdu_filter.app, pdu_filter.site)
+
+    def matches(self, exercise: int, app: int, site: int) -> bool:
+        """
+        Return True if any entry allows the given exercise, application and site.
+        """
+        keys = self._keys
+        for any_exercise, any_app, any_site in self._layouts:
+            key = (WILDCARD if any_exercise else exercise,
+                   WILDCARD if any_app else app,
+                   WILDCARD if any_site else site)
+            if key in keys:
+                return True
+        return False
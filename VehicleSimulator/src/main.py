@@ -1,24 +1,13 @@
 """TBD"""
 import logging
 import os
-import sys
-import tests
+
+from common import logUtils
 
 from lib.core import systemsManager
 
 __author__ = "EnriqueMoran"
 
-log_dir = os.environ.get("LOG_DIR", os.path.join(os.path.dirname(__file__), "logs"))
-os.makedirs(log_dir, exist_ok=True)
-logging.basicConfig(
-    format='%(asctime)s - %(levelname)s - %(name)s::%(funcName)s - %(message)s',
-    level=os.environ.get("LOGLEVEL", "DEBUG"),
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(os.path.join(log_dir, "vehiclesimulator.log"), mode="a")
-    ],
-)
-
 logger = logging.getLogger("Main")
 
 class MainApp:
@@ -31,8 +20,15 @@ class MainApp:
         self.systems_manager.run()
 
 if __name__ == "__main__":
+    # Fleet worker processes are spawned and re-import this module, they must not log to the file
+    log_dir = os.environ.get("LOG_DIR", os.path.join(os.path.dirname(__file__), "logs"))
+    os.makedirs(log_dir, exist_ok=True)
+    debug_rate = float(os.environ.get("LOG_DEBUG_RATE", 20))    # Per call site
+    logUtils.setup_logging(os.path.join(log_dir, "vehiclesimulator.log"),
+                           level=os.environ.get("LOGLEVEL", "DEBUG"), debug_rate=debug_rate)
     run_test = False    # Set to True to run unit tests
     if run_test:
+        import tests    # Test modules are not shipped with the app, only load them when asked
         tests.run_kinematics_tests()
     else:
         app = MainApp()
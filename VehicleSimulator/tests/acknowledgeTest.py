@@ -0,0 +1,87 @@
+import socket
+import unittest
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import StartResumePdu, StopFreezePdu
+from opendis.PduFactory import createPdu
+
+from lib.simulation import simulationManager
+from lib.simulation.simulationManager import ExerciseStatus
+
+
+def _encoded(pdu) -> bytes:
+    memory_stream = BytesIO()
+    pdu.serialize(DataOutputStream(memory_stream))
+    return memory_stream.getvalue()
+
+
+def _control_pdu(pdu_class, request_id, originator=1):
+    pdu = pdu_class()
+    pdu.exerciseID = pdu.originatingEntityID.applicationID = 1    # Allowed by pdu_filter.json
+    pdu.originatingEntityID.siteID = 1
+    pdu.originatingEntityID.entityID = originator
+    pdu.requestID = request_id
+    if pdu_class is StopFreezePdu:
+        pdu.reason = 1
+        pdu.frozenBehavior = 1    # Pause
+    return pdu
+
+
+class TestAcknowledge(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def _receive_acks(self, controller, count) -> list:
+        return [createPdu(controller.recv(8192)) for _ in range(count)]
+
+    def test_acknowledge(self):
+        controller = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        controller.bind(("127.0.0.1", 0))
+        controller.settimeout(2.0)
+        sim = simulationManager.SimulationManager(start_threads=False)
+        try:
+            start = _encoded(_control_pdu(StartResumePdu, 7))
+            sim.multicast_manager.process_datagram(start, controller.getsockname())
+            ack, = self._receive_acks(controller, 1)
+            self.assertEqual(sim.exercise_status, ExerciseStatus.RUNNING)
+            self.assertEqual(ack.requestID, 7)
+            self.assertEqual(ack.acknowledgeFlag, simulationManager.ACKNOWLEDGE_START_RESUME)
+            self.assertEqual(ack.responseFlag, simulationManager.ABLE_TO_COMPLY)
+            self.assertEqual((ack.originatingEntityID.siteID, ack.originatingEntityID.applicationID,
+                              ack.originatingEntityID.entityID),
+                             (sim.site_id, sim.application_id, sim.entity_id))
+            self.assertEqual((ack.receivingEntityID.siteID, ack.receivingEntityID.applicationID),
+                             (1, 1))
+
+            # A retransmission is acknowledged again but not applied again
+            sim.dead_reckoning.update(0.0, (0, 0, 0), (0, 0, 0), (0, 0, 0))
+            sim.multicast_manager.process_datagram(start, controller.getsockname())
+            ack, = self._receive_acks(controller, 1)
+            self.assertEqual(ack.requestID, 7)
+            self.assertIsNotNone(sim.dead_reckoning._sent_time)    # Not reset
+
+            pause = _encoded(_control_pdu(StopFreezePdu, 8))
+            sim.multicast_manager.process_datagram(pause, controller.getsockname())
+            ack, = self._receive_acks(controller, 1)
+            self.assertEqual(sim.exercise_status, ExerciseStatus.PAUSED)
+            self.assertEqual(ack.acknowledgeFlag, simulationManager.ACKNOWLEDGE_STOP_FREEZE)
+
+            # A late retransmission of an older request is not applied again either
+            sim.multicast_manager.process_datagram(start, controller.getsockname())
+            ack, = self._receive_acks(controller, 1)
+            self.assertEqual(ack.requestID, 7)
+            self.assertEqual(sim.exercise_status, ExerciseStatus.PAUSED)
+
+            # Request IDs are remembered per originator
+            other = _encoded(_control_pdu(StartResumePdu, 8, originator=2))
+            sim.multicast_manager.process_datagram(other, controller.getsockname())
+            self._receive_acks(controller, 1)
+            self.assertEqual(sim.exercise_status, ExerciseStatus.RUNNING)
+            sim.multicast_manager.process_datagram(pause, controller.getsockname())
+            self._receive_acks(controller, 1)
+            self.assertEqual(sim.exercise_status, ExerciseStatus.RUNNING)
+        finally:
+            sim.multicast_manager.sock.close()
+            controller.close()
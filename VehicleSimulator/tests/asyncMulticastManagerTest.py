@@ -0,0 +1,67 @@
+import asyncio
+import socket
+import unittest
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu
+
+from lib.simulation.communication import multicastManager
+from lib.simulation.communication.asyncMulticastManager import AsyncMulticastManager
+
+
+class Listener:
+    def __init__(self):
+        self.pdus = []
+        self.received = asyncio.Event()
+
+    def on_pdu_received(self, pdu) -> None:
+        self.pdus.append(pdu)
+        self.received.set()
+
+
+class TestAsyncMulticastManager(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_loopback_round_trip(self):
+        asyncio.run(self._round_trip())
+
+    async def _round_trip(self):
+        manager = AsyncMulticastManager("127.0.0.1", 0)
+        peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        peer.bind(("127.0.0.1", 0))
+        peer.settimeout(2.0)
+        try:
+            await manager.create_endpoint()
+            listener = Listener()
+            manager.add_listener(listener)
+            pdu = EntityStatePdu()
+            pdu.entityID.entityID = 42
+            memory_stream = BytesIO()
+            pdu.serialize(DataOutputStream(memory_stream))
+
+            peer.sendto(memory_stream.getvalue(), manager.sock.getsockname())
+            await asyncio.wait_for(listener.received.wait(), 2.0)
+            self.assertEqual(listener.pdus[0].entityID.entityID, 42)
+            self.assertEqual(manager.received_datagrams, 1)
+            self.assertEqual(manager.sender, peer.getsockname())
+
+            data = bytearray(memory_stream.getvalue())
+            manager.send_bytes(data, peer.getsockname())
+            data[:] = bytes(len(data))    # Reused encoder buffer, must not alter the queued copy
+            self.assertEqual(peer.recv(8192), memory_stream.getvalue())
+
+            errors = multicastManager.SOCKET_ERRORS.get("transport")
+            with self.assertLogs("AsyncMulticastManager", "ERROR"):
+                manager._protocol.error_received(OSError("ICMP port unreachable"))
+            self.assertEqual(multicastManager.SOCKET_ERRORS.get("transport"), errors + 1)
+
+            sock = manager.sock
+            await manager.wait_closed()
+            self.assertEqual(sock.fileno(), -1)    # Closed when wait_closed returns
+            self.assertIsNone(manager.transport)
+        finally:
+            manager.close()
+            peer.close()
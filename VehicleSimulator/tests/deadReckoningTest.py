@@ -0,0 +1,118 @@
+import random
+import unittest
+
+import numpy as np
+
+from lib.kinematics.deadReckoning import (
+    DeadReckoningAlgorithm,
+    DeadReckoningModel,
+    euler_to_matrix,
+    extrapolate,
+    matrix_to_euler,
+)
+from lib.simulation import simulationManager
+
+
+def _skew(w):
+    return np.array([[0, -w[2], w[1]], [w[2], 0, -w[0]], [-w[1], w[0], 0]])
+
+
+class TestDeadReckoning(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_euler_matrix_round_trip(self):
+        tol_angle = 1e-9
+        orientation = np.column_stack((np.random.uniform(-np.pi, np.pi, 1000),
+                                       np.random.uniform(-1.5, 1.5, 1000),
+                                       np.random.uniform(-np.pi, np.pi, 1000)))
+        result = matrix_to_euler(euler_to_matrix(orientation))
+        self.assertLess(np.abs(result - orientation).max(), tol_angle)
+
+    def test_world_algorithms(self):
+        location = np.array([6378137.0, 0.0, 0.0])
+        velocity = np.array([0.0, 10.0, -2.0])
+        acceleration = np.array([1.0, 0.0, 0.0])
+        orientation = np.zeros(3)
+        dt = 4.0
+
+        static, _ = extrapolate(DeadReckoningAlgorithm.STATIC, location, velocity, acceleration,
+                                orientation, np.zeros(3), dt)
+        fpw, _ = extrapolate(DeadReckoningAlgorithm.FPW, location, velocity, acceleration,
+                             orientation, np.zeros(3), dt)
+        fvw, _ = extrapolate(DeadReckoningAlgorithm.FVW, location, velocity, acceleration,
+                             orientation, np.zeros(3), dt)
+
+        self.assertTrue(np.allclose(static[0], location))
+        self.assertTrue(np.allclose(fpw[0], location + velocity * dt))
+        self.assertTrue(np.allclose(fvw[0], location + velocity * dt + 0.5 * acceleration * dt**2))
+
+    def test_rotating_body_algorithms(self):
+        tol_position = 1e-3    # 1 mm
+        for _ in range(20):
+            location = np.random.uniform(-7e6, 7e6, 3)
+            velocity = np.random.uniform(-50, 50, 3)
+            acceleration = np.random.uniform(-5, 5, 3)
+            orientation = np.random.uniform(-1.5, 1.5, 3)
+            angular_velocity = np.random.uniform(-0.5, 0.5, 3)
+            dt = random.uniform(0.1, 5.0)
+
+            # Reference: small step integration of the rotating body frame
+            world_to_body = euler_to_matrix(orientation[None])[0]
+            body_velocity = world_to_body @ velocity
+            steps = 2000
+            h = dt / steps
+            expected = location.copy()
+            for step in range(steps):
+                tau = (step + 0.5) * h
+                angle = angular_velocity * tau
+                theta = np.linalg.norm(angle)
+                k = _skew(angle / theta)
+                rotation = np.eye(3) + np.sin(theta) * k + (1 - np.cos(theta)) * k @ k
+                expected += world_to_body.T @ rotation @ (body_velocity + acceleration * tau) * h
+
+            result, _ = extrapolate(DeadReckoningAlgorithm.RVB, location, velocity, acceleration,
+                                    orientation, angular_velocity, dt)
+            self.assertLess(np.abs(result[0] - expected).max(), tol_position)
+
+    def test_batch_matches_single(self):
+        n = len(DeadReckoningAlgorithm)
+        location = np.random.uniform(-7e6, 7e6, (n, 3))
+        velocity = np.random.uniform(-50, 50, (n, 3))
+        acceleration = np.random.uniform(-5, 5, (n, 3))
+        orientation = np.random.uniform(-1.5, 1.5, (n, 3))
+        angular_velocity = np.random.uniform(-0.5, 0.5, (n, 3))
+        algorithms = np.arange(n)
+
+        batch_location, batch_orientation = extrapolate(algorithms, location, velocity,
+                                                        acceleration, orientation,
+                                                        angular_velocity, 2.0)
+        for i in range(n):
+            single_location, single_orientation = extrapolate(i, location[i], velocity[i],
+                                                              acceleration[i], orientation[i],
+                                                              angular_velocity[i], 2.0)
+            self.assertTrue(np.allclose(batch_location[i], single_location[0]))
+            self.assertTrue(np.allclose(batch_orientation[i], single_orientation[0]))
+
+    def test_thresholds(self):
+        model = DeadReckoningModel(DeadReckoningAlgorithm.FPW, position_threshold=1.0,
+                                   orientation_threshold=3.0, heartbeat=5.0)
+        location = np.array([6378137.0, 0.0, 0.0])
+        velocity = np.array([0.0, 10.0, 0.0])
+
+        self.assertTrue(model.should_send(0.0, location, np.zeros(3)))
+        model.update(0.0, location, velocity, np.zeros(3))
+        self.assertFalse(model.should_send(1.0, location + velocity + 0.5, np.zeros(3)))
+        self.assertTrue(model.should_send(1.0, location + velocity + 1.5, np.zeros(3)))
+        self.assertTrue(model.should_send(1.0, location + velocity, np.radians([0, 0, 4.0])))
+        self.assertTrue(model.should_send(5.0, location + velocity * 5, np.zeros(3)))
+
+    def test_check_rates(self):
+        sim = simulationManager.SimulationManager(start_threads=False)
+        try:
+            period = sim.scheduler.get_stats()["espdu"]["period"]
+            self.assertAlmostEqual(period, 1 / sim.dead_reckoning_rate)    # Every kinematics step
+            self.assertAlmostEqual(sim.dead_reckoning.heartbeat, 1 / sim.message_frequency)
+            self.assertLess(period, sim.dead_reckoning.heartbeat)
+        finally:
+            sim.multicast_manager.sock.close()
@@ -0,0 +1,87 @@
+import random
+import unittest
+
+import numpy as np
+
+from opendis.dis7 import EntityStatePdu
+
+from lib.entity.entityStore import EntityStore
+from lib.kinematics.kinematicsManager import KinematicsManager
+
+
+class TestEntityStore(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.store = EntityStore(capacity=1)
+        self.k_manager = KinematicsManager(self.store)
+
+    def test_add_remove_entity(self):
+        ids = [(1, 1, i) for i in range(1000)]
+        for entity_id in ids:
+            self.store.add_entity(entity_id)
+        locations = np.random.uniform(-1e6, 1e6, (len(ids), 3))
+        self.store.set_locations(ids, locations)
+
+        self.assertEqual(len(self.store), 1000)
+        self.store.remove_entity((1, 1, 0))
+        self.assertEqual(len(self.store), 999)
+        self.assertNotIn((1, 1, 0), self.store)
+        self.assertTrue(np.array_equal(self.store.get_locations(ids[1:]), locations[1:]))
+
+        for entity_id in ids[1:]:
+            self.store.remove_entity(entity_id)
+        self.assertEqual(len(self.store), 0)
+
+    def test_fuel_consumption(self):
+        ids = [(1, 1, i) for i in range(3)]
+        for entity_id in ids:
+            self.store.add_entity(entity_id)
+        self.store.set_fuel_quantities(ids[1:], np.array([10.0, 1.0]))
+
+        self.store.apply_fuel_consumption(np.array([2.0, 2.0, 2.0]), initial_quantity=50.0)
+        self.assertTrue(np.array_equal(self.store.get_fuel_quantities(ids), [48.0, 8.0, 0.0]))
+        self.store.apply_fuel_consumption(np.array([8.0]), ids[1:2])
+        self.assertEqual(self.store.get_entity(ids[1]).get_fuel_quantity(), 0.0)
+        self.assertRaises(ValueError, self.store.apply_fuel_consumption, np.array([1.0, 1.0]))
+
+        self.store.clear()
+        self.assertEqual(len(self.store), 0)
+        self.store.add_entity(ids[0])
+        self.assertTrue(np.isnan(self.store.get_fuel_quantities()[0]))    # Row fill restored
+        self.store.clear()
+
+    def test_set_data(self):
+        pdu = EntityStatePdu()
+        pdu.entityID.siteID, pdu.entityID.applicationID, pdu.entityID.entityID = 2, 8, 5
+        pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z = 1.0, 2.0, 3.0
+        pdu.entityType.country = 225
+        pdu.forceId = 1
+        pdu.marking.setString("TANK01")
+
+        entity_id = self.store.set_data(pdu)
+        entity = self.store.get_entity(entity_id)
+
+        self.assertEqual(entity_id, (2, 8, 5))
+        self.assertEqual(entity.get_entity_location().z, 3.0)
+        self.assertEqual(entity.get_entity_type().country, 225)
+        self.assertEqual(entity.get_force_id(), 1)
+        self.assertEqual(entity.get_marking().charactersString(), "TANK01")
+        self.store.remove_entity(entity_id)
+
+    def test_kinematics_by_entity_id(self):
+        tol_lat_lon = 1e-5   # ~1.1 m
+        tol_alt     = 1.5    # 1.5 m
+
+        for i in range(100):
+            entity_id = (1, 1, i)
+            self.store.add_entity(entity_id)
+            lat = random.uniform(-60.0, 60.0)
+            lon = random.uniform(-90.0, 90.0)
+            alt = random.uniform(0, 1000)
+
+            self.k_manager.set_position(lat, lon, alt, entity_id)
+            new_lat, new_lon, new_alt = self.k_manager.get_lat_lon_alt(entity_id)
+
+            self.assertAlmostEqual(new_lat, lat, delta=tol_lat_lon)
+            self.assertAlmostEqual(new_lon, lon, delta=tol_lat_lon)
+            self.assertAlmostEqual(new_alt, alt, delta=tol_alt)
@@ -0,0 +1,168 @@
+import random
+import unittest
+
+from io import BytesIO
+
+import numpy as np
+
+from opendis.dis7 import EntityStatePdu, VariableParameter
+from opendis.DataOutputStream import DataOutputStream
+from opendis.PduFactory import createPdu
+
+from lib.entity import entityManager
+from lib.kinematics import deadReckoning
+from lib.kinematics.kinematicsManager import KinematicsManager
+from lib.simulation import simulationManager
+from lib.simulation.communication.espduEncoder import EntityStatePduEncoder
+
+
+def random_espdu(num_variable_parameters: int = 0) -> EntityStatePdu:
+    pdu = EntityStatePdu()
+    pdu.exerciseID = random.randint(0, 255)
+    pdu.timestamp = random.randint(0, 2**32 - 1)
+    pdu.entityID.siteID = random.randint(0, 65535)
+    pdu.entityID.applicationID = random.randint(0, 65535)
+    pdu.entityID.entityID = random.randint(0, 65535)
+    pdu.forceId = random.randint(0, 255)
+    pdu.entityType.entityKind = random.randint(0, 255)
+    pdu.entityType.country = random.randint(0, 65535)
+    pdu.entityType.extra = random.randint(0, 255)
+    pdu.alternativeEntityType.category = random.randint(0, 255)
+    pdu.entityLinearVelocity.x = random.uniform(-300, 300)
+    pdu.entityLinearVelocity.z = random.uniform(-300, 300)
+    pdu.entityLocation.x = random.uniform(-7e6, 7e6)
+    pdu.entityLocation.y = random.uniform(-7e6, 7e6)
+    pdu.entityLocation.z = random.uniform(-7e6, 7e6)
+    pdu.entityOrientation.psi = random.uniform(-3.14, 3.14)
+    pdu.entityOrientation.theta = random.uniform(-1.57, 1.57)
+    pdu.entityAppearance = random.randint(0, 2**32 - 1)
+    pdu.deadReckoningParameters.deadReckoningAlgorithm = random.randint(0, 9)
+    pdu.deadReckoningParameters.parameters[3] = random.randint(0, 255)
+    pdu.deadReckoningParameters.entityLinearAcceleration.y = random.uniform(-10, 10)
+    pdu.deadReckoningParameters.entityAngularVelocity.x = random.uniform(-1, 1)
+    pdu.marking.characterSet = 1
+    pdu.marking.setString("ESPDU%d" % random.randint(0, 999))
+    pdu.capabilities = random.randint(0, 31)
+    for _ in range(num_variable_parameters):
+        parameter = VariableParameter()
+        parameter.recordType = random.randint(0, 1)
+        parameter.variableParameterFields1 = random.uniform(-1e3, 1e3)
+        parameter.variableParameterFields2 = random.randint(0, 2**32 - 1)
+        parameter.variableParameterFields3 = random.randint(0, 65535)
+        parameter.variableParameterFields4 = random.randint(0, 255)
+        pdu.variableParameters.append(parameter)
+    pdu.numberOfVariableParameters = num_variable_parameters
+    pdu.length = 144 + 16 * num_variable_parameters
+    return pdu
+
+
+def opendis_serialize(pdu: EntityStatePdu) -> bytes:
+    memory_stream = BytesIO()
+    pdu.serialize(DataOutputStream(memory_stream))
+    return memory_stream.getvalue()
+
+
+class TestEntityStatePduEncoder(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.encoder = EntityStatePduEncoder()
+
+    def test_byte_identical(self):
+        for _ in range(1000):
+            pdu = random_espdu(random.randint(0, 4))
+            self.encoder.set_static(pdu)
+            self.assertEqual(bytes(self.encoder.encode(pdu)), opendis_serialize(pdu))
+
+    def test_dynamic_fields_only(self):
+        pdu = random_espdu()
+        self.encoder.set_static(pdu)
+        for _ in range(1000):
+            pdu.timestamp = random.randint(0, 2**32 - 1)
+            pdu.entityLocation.x = random.uniform(-7e6, 7e6)
+            pdu.entityOrientation.phi = random.uniform(-3.14, 3.14)
+            self.assertEqual(bytes(self.encoder.encode(pdu)), opendis_serialize(pdu))
+
+    def test_round_trip(self):
+        for _ in range(1000):
+            pdu = random_espdu(random.randint(0, 2))
+            self.encoder.set_static(pdu)
+            decoded = createPdu(bytes(self.encoder.encode(pdu)))
+
+            self.assertEqual(decoded.entityID.entityID, pdu.entityID.entityID)
+            self.assertEqual(decoded.entityType.country, pdu.entityType.country)
+            self.assertEqual(decoded.marking.charactersString(), pdu.marking.charactersString())
+            self.assertEqual(decoded.entityLocation.x, pdu.entityLocation.x)
+            self.assertEqual(len(decoded.variableParameters), len(pdu.variableParameters))
+
+    def test_static_update_during_send(self):
+        """An own entity ESPDU received while an ESPDU is being packed is sent on the next one."""
+        sim = simulationManager.SimulationManager(start_threads=False)
+        entity_system = entityManager.EntityManager()
+        sent = []
+        sim.multicast_manager.send_bytes = lambda data: sent.append(bytes(data))
+
+        def received(marking: str) -> EntityStatePdu:
+            pdu = random_espdu()
+            pdu.exerciseID = pdu.entityID.siteID = pdu.entityID.applicationID = 1
+            pdu.entityID.entityID = sim.entity_id
+            pdu.marking.setString(marking)
+            return pdu
+
+        def get_marking_racing():    # Receive thread runs between the reads of the send thread
+            marking = entityManager.EntityManager.get_marking(entity_system)
+            del entity_system.get_marking
+            sim.on_pdu_received(received("NEW"))
+            return marking
+
+        try:
+            sim.on_pdu_received(received("OLD"))
+            entity_system.get_marking = get_marking_racing
+            sim.send_entity_state_pdu()
+            sim.send_entity_state_pdu()
+            self.assertEqual([createPdu(data).marking.charactersString() for data in sent],
+                             ["OLD", "NEW"])
+        finally:
+            sim.multicast_manager.sock.close()
+            entity_system.reset_data()
+
+    def test_dead_reckoning_parameters(self):
+        """The ESPDU carries the kinematics rates in the frame of its DR algorithm."""
+        kinematics = KinematicsManager()
+        sim = simulationManager.SimulationManager(kinematics, start_threads=False)
+        entity_system = entityManager.EntityManager()
+        sent = []
+        sim.multicast_manager.send_bytes = lambda data: sent.append(bytes(data))
+        try:
+            kinematics.set_position(40.0, -3.0, 500.0)
+            kinematics.set_orientation(5.0, 10.0, 60.0)
+            kinematics.set_speed(250.0)
+            for algorithm in (deadReckoning.DeadReckoningAlgorithm.RVW,
+                              deadReckoning.DeadReckoningAlgorithm.RVB):
+                sim.dead_reckoning.algorithm = algorithm
+                sim.send_entity_state_pdu()
+                params = createPdu(sent[-1]).deadReckoningParameters
+                orientation = np.radians(kinematics.get_roll_pitch_yaw())[::-1]    # psi, theta, phi
+                acceleration = sim.dead_reckoning.espdu_acceleration(
+                    kinematics.get_acceleration(), orientation)
+                sent_acceleration = (params.entityLinearAcceleration.x,
+                                     params.entityLinearAcceleration.y,
+                                     params.entityLinearAcceleration.z)
+                sent_angular_velocity = (params.entityAngularVelocity.x,
+                                         params.entityAngularVelocity.y,
+                                         params.entityAngularVelocity.z)
+
+                self.assertEqual(params.deadReckoningAlgorithm, algorithm)
+                self.assertGreater(np.linalg.norm(acceleration), 0.0)
+                self.assertTrue(np.allclose(sent_acceleration, acceleration, rtol=1e-6))
+                self.assertTrue(np.allclose(sent_angular_velocity,
+                                            kinematics.get_angular_velocity(), rtol=1e-6))
+                self.assertTrue(np.allclose(sim.dead_reckoning._acceleration, acceleration))
+            world = sim.dead_reckoning.espdu_acceleration(kinematics.get_acceleration(), (0, 0, 0))
+            self.assertFalse(np.allclose(world, acceleration))    # Body frame for RVB
+
+            own_params = entity_system.get_dead_reckoning_params()
+            self.assertIsNot(own_params, sim._entity_state_pdu.deadReckoningParameters)
+            self.assertEqual(own_params.deadReckoningAlgorithm, 0)    # Not written through
+        finally:
+            sim.multicast_manager.sock.close()
+            entity_system.reset_data()
@@ -0,0 +1,20 @@
+"""Manual clock for the tests of time dependent code."""
+
+
+class FakeClock:
+    """
+    Clock that only moves when a test sets or advances now. Passed where code takes a clock
+    function (time.monotonic), a ns function (time.monotonic_ns) or a sleep function.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now    # Seconds
+
+    def __call__(self):
+        return self.now
+
+    def ns(self):
+        return int(round(self.now * 1e9))
+
+    def sleep(self, seconds):
+        self.now += seconds
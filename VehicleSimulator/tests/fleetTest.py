@@ -0,0 +1,114 @@
+import math
+import unittest
+
+import numpy as np
+
+from opendis.PduFactory import createPdu
+
+from lib.entity.fleet import Fleet
+from lib.kinematics.shardedEngine import ShardedEngine
+from lib.simulation import simulationManager
+from lib.simulation.simulationManager import ExerciseStatus
+
+ITEMS = [
+    {"entity_id": 101, "lat": 40.0, "lon": -3.0, "alt": 1000.0, "heading": 90.0, "speed": 200.0,
+     "force_id": 1, "entity_type": [1, 2, 225, 1, 0, 0, 0], "marking": "FLEET101"},
+    {"entity_id": 102, "lat": 41.0, "lon": -4.0},
+    {"entity_id": 103, "lat": 42.0, "lon": -5.0, "heading": 180.0, "pitch": 10.0, "speed": 100.0},
+]
+
+
+class TestFleet(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_step_reset(self):
+        fleet = Fleet.from_json(ITEMS, ShardedEngine(3, consumption_rate=5.0, initial_fuel=10.0),
+                                2, 8)
+        try:
+            self.assertEqual(fleet.entity_ids, [(2, 8, 101), (2, 8, 102), (2, 8, 103)])
+            self.assertRaises(ValueError, fleet.add_entity, 101, 0.0, 0.0)
+            _, locations, orientations = fleet.snapshot()
+            self.assertAlmostEqual(orientations[0][0], math.radians(90.0))
+
+            fleet.step(1.0)
+            _, stepped, _ = fleet.snapshot()
+            self.assertAlmostEqual(np.linalg.norm(stepped[0] - locations[0]), 200.0, delta=1.0)
+            self.assertTrue(np.allclose(stepped[1], locations[1], atol=1e-6))    # Not moving
+            self.assertAlmostEqual(fleet.engine.get_fuel(0), 9.0)
+
+            fleet.reset()
+            self.assertTrue(np.array_equal(fleet.snapshot()[1], locations))
+            self.assertEqual(fleet.engine.get_fuel(0), 10.0)
+        finally:
+            fleet.close()
+        self.assertEqual(len(fleet.snapshot()[0]), 0)
+        fleet.step(1.0)    # Harmless once closed
+
+    def test_espdus(self):
+        fleet = Fleet.from_json(ITEMS, ShardedEngine(3), 2, 8)
+        try:
+            _, locations, _ = fleet.snapshot()
+            first = [createPdu(data) for data in fleet.encode_espdus(2, 6, 2)]
+            second = [createPdu(data) for data in fleet.encode_espdus(2, 6, 2)]
+            self.assertEqual([pdu.entityID.entityID for pdu in first + second],
+                             [101, 102, 103, 101])    # Round robin
+
+            pdu = first[0]
+            self.assertEqual((pdu.exerciseID, pdu.entityID.siteID, pdu.entityID.applicationID),
+                             (6, 2, 8))
+            self.assertEqual(pdu.forceId, 1)
+            self.assertEqual(pdu.entityType.country, 225)
+            self.assertEqual(pdu.marking.charactersString(), "FLEET101")
+            self.assertEqual(pdu.deadReckoningParameters.deadReckoningAlgorithm, 2)
+            location = (pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z)
+            self.assertTrue(np.allclose(location, locations[0]))
+            velocity = np.array((pdu.entityLinearVelocity.x, pdu.entityLinearVelocity.y,
+                                 pdu.entityLinearVelocity.z))
+            self.assertAlmostEqual(np.linalg.norm(velocity), 200.0, places=3)
+            self.assertLess(abs(np.dot(velocity, locations[0])) / np.linalg.norm(locations[0]),
+                            1.0)    # Level flight, nearly horizontal
+            self.assertAlmostEqual(pdu.entityOrientation.psi, math.radians(90.0), places=6)
+            self.assertEqual(first[1].marking.charactersString(), "")
+
+            self.assertTrue(fleet.owns(pdu.entityID))
+            pdu.entityID.siteID = 3
+            self.assertFalse(fleet.owns(pdu.entityID))
+        finally:
+            fleet.close()
+        self.assertEqual(fleet.encode_espdus(2, 6, 2), [])
+
+    def test_loopback_ignored(self):
+        store = _Store()
+        sim = simulationManager.SimulationManager(entity_store=store, start_threads=False)
+        fleet = Fleet.from_json(ITEMS, ShardedEngine(4), 1, 1)    # Allowed by pdu_filter.json
+        try:
+            sim.set_fleet(fleet)
+            sim.exercise_status = ExerciseStatus.RUNNING
+            sent = simulationManager.FLEET_ESPDUS_SENT.get()
+            sim.send_fleet_pdus()    # One heartbeat share, at least one entity
+            self.assertEqual(simulationManager.FLEET_ESPDUS_SENT.get(), sent + 1)
+
+            for data in fleet.encode_espdus(3, 1, 2):
+                sim.multicast_manager.process_datagram(data)
+            self.assertEqual(store.entity_ids, [])
+
+            fleet.add_entity(104, 0.0, 0.0)
+            fleet._entities.discard(104)    # Same site and application, not a fleet entity
+            for data in fleet.encode_espdus(4, 1, 2):
+                sim.multicast_manager.process_datagram(data)
+            self.assertEqual(store.entity_ids, [104])
+        finally:
+            sim.exercise_status = ExerciseStatus.TERMINATED
+            sim.multicast_manager.sock.close()
+            fleet.close()
+
+
+class _Store:
+    """Entity store stand-in recording the ESPDUs it is given."""
+
+    def __init__(self):
+        self.entity_ids = []
+
+    def set_data(self, pdu):
+        self.entity_ids.append(pdu.entityID.entityID)
@@ -0,0 +1,116 @@
+import math
+import unittest
+
+import numpy as np
+
+from opendis.RangeCoordinates import GPS
+
+from lib.kinematics import geodesy
+from lib.kinematics.shardedEngine import ShardedEngine
+
+
+class TestGeodesy(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.gps = GPS()
+        rng = np.random.default_rng(1)
+        count = 2000
+        self.lat = rng.uniform(-89.0, 89.0, count)
+        self.lon = rng.uniform(-180.0, 180.0, count)
+        self.alt = rng.uniform(-100.0, 20000.0, count)
+
+    def test_lla_ecef(self):
+        tol_position = 1e-6    # 1 um
+        tol_lat_lon  = 1e-9    # degrees, ~0.1 mm
+        tol_alt      = 1e-4    # 0.1 mm, opendis only converges to ~1e-5 m
+
+        x, y, z = geodesy.lla2ecef(np.radians(self.lat), np.radians(self.lon), self.alt)
+        lat, lon, alt = geodesy.ecef2lla(x, y, z)
+        for i in range(len(self.lat)):
+            expected = self.gps.lla2ecef((self.lat[i], self.lon[i], self.alt[i]))
+            self.assertLess(np.abs(np.array([x[i], y[i], z[i]]) - expected).max(), tol_position)
+            exp_lat, exp_lon, exp_alt = self.gps.ecef2lla(expected)
+            self.assertAlmostEqual(math.degrees(lat[i]), exp_lat, delta=tol_lat_lon)
+            self.assertAlmostEqual(math.degrees(lon[i]), exp_lon, delta=tol_lat_lon)
+            self.assertAlmostEqual(alt[i], exp_alt, delta=tol_alt)
+            self.assertAlmostEqual(alt[i], self.alt[i], delta=tol_alt)    # Round trip
+
+        lat, _, alt = geodesy.ecef2lla(0.0, 0.0, geodesy.B + 100.0)    # Pole, p = 0
+        self.assertAlmostEqual(float(lat), math.pi / 2)
+        self.assertAlmostEqual(float(alt), 100.0, delta=tol_alt)
+
+    def test_closed_form_accuracy(self):
+        tol_position = 1e-8    # 10 nm, documented bound of geodesy.ecef2lla
+        rng = np.random.default_rng(5)
+        count = 100000
+        lat = rng.uniform(-np.pi / 2, np.pi / 2, count)
+        lat[:3] = (np.pi / 2, -np.pi / 2, 0.0)    # Poles and equator
+        lon = rng.uniform(-np.pi, np.pi, count)
+        alt = rng.uniform(-12000.0, 1e6, count)    # Subsurface to low orbit
+        alt[3:1000] = rng.uniform(-12000.0, 20000.0, 997)
+        x, y, z = geodesy.lla2ecef(lat, lon, alt)
+
+        closed_lat, closed_lon, closed_alt = geodesy.ecef2lla(x, y, z)
+        iter_lat, _, iter_alt = geodesy.ecef2lla_iterative(x, y, z, tolerance=1e-15)
+
+        self.assertLess(np.abs(closed_lat - lat).max() * geodesy.A, tol_position)
+        self.assertLess(np.abs(np.remainder(closed_lon - lon + np.pi, 2 * np.pi) - np.pi).max()
+                        * geodesy.A, tol_position)
+        self.assertLess(np.abs(closed_alt - alt).max(), tol_position)
+        self.assertLess(np.abs(closed_lat - iter_lat).max() * geodesy.A, tol_position)
+        self.assertLess(np.abs(closed_alt - iter_alt).max(), tol_position)
+        for i in range(1000):
+            point = geodesy.ecef2lla_point(float(x[i]), float(y[i]), float(z[i]))
+            self.assertAlmostEqual(point[0], closed_lat[i], delta=1e-15)
+            self.assertAlmostEqual(point[1], closed_lon[i], delta=1e-15)
+            self.assertAlmostEqual(point[2], closed_alt[i], delta=tol_position)
+
+    def test_local_frames(self):
+        tol_position = 1e-6    # 1 um
+        count = 200
+        ned = np.random.default_rng(2).uniform(-5e4, 5e4, (count, 3))
+        for i in range(count):
+            origin = self.gps.lla2ecef((self.lat[i], self.lon[i], self.alt[i]))
+            frame = geodesy.LocalFrame.from_ecef(*origin)
+
+            expected = self.gps.ned2ecef(ned[i], origin)
+            self.assertLess(np.abs(frame.ned2ecef(ned[i]) - expected).max(), tol_position)
+            self.assertLess(np.abs(frame.ecef2ned(expected) - ned[i]).max(), tol_position)
+            self.assertLess(np.abs(frame.ecef2ned(expected) -
+                                   self.gps.ecef2ned(expected, origin)).max(), tol_position)
+            enu = frame.ecef2enu(expected)
+            self.assertLess(np.abs(enu - [ned[i, 1], ned[i, 0], -ned[i, 2]]).max(), tol_position)
+            self.assertLess(np.abs(frame.enu2ecef(enu) - expected).max(), tol_position)
+
+            expected_vector = np.array(expected) - origin
+            self.assertLess(np.abs(frame.ned2ecef_vector(ned[i]) - expected_vector).max(),
+                            tol_position)
+
+        batch = geodesy.ned2ecef_vectors(np.radians(self.lat[:count]),
+                                         np.radians(self.lon[:count]), ned)
+        for i in range(count):
+            frame = geodesy.LocalFrame(math.radians(self.lat[i]), math.radians(self.lon[i]))
+            self.assertLess(np.abs(batch[i] - frame.ned2ecef_vector(ned[i])).max(), tol_position)
+        self.assertLess(np.abs(geodesy.ecef2ned_vectors(np.radians(self.lat[:count]),
+                                                        np.radians(self.lon[:count]),
+                                                        batch) - ned).max(), tol_position)
+
+    def test_great_circle_destination(self):
+        tol_distance = 1e-3    # 1 mm
+        lat, lon = np.radians(self.lat), np.radians(self.lon)
+        bearing = np.random.default_rng(3).uniform(0, 2 * np.pi, len(lat))
+        distance = np.random.default_rng(4).uniform(0, 2e6, len(lat))
+
+        new_lat, new_lon = geodesy.great_circle_destination(lat, lon, bearing, distance)
+
+        # Haversine distance back to the start on the same sphere
+        arc = 2 * np.arcsin(np.sqrt(np.sin((new_lat - lat) / 2)**2 +
+                                    np.cos(lat) * np.cos(new_lat) *
+                                    np.sin((new_lon - lon) / 2)**2))
+        self.assertLess(np.abs(arc * geodesy.A - distance).max(), tol_distance)
+
+        with ShardedEngine(1) as engine:
+            engine.add_entity(10.0, 20.0, 0.0)
+            x, y, z = engine.get_ecef_positions()
+        expected = self.gps.lla2ecef((10.0, 20.0, 0.0))
+        self.assertLess(np.abs(np.array([x[0], y[0], z[0]]) - expected).max(), 1e-6)
@@ -0,0 +1,106 @@
+import random
+import unittest
+
+import numpy as np
+
+from opendis.dis7 import EntityStatePdu
+
+from lib.entity.entityStore import EntityStore
+from lib.kinematics import kinematicsEngine
+from lib.kinematics.kinematicsEngine import great_circle_step
+from lib.kinematics.kinematicsManager import KinematicsManager
+
+
+class TestKinematicsEngine(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.k_manager = KinematicsManager()
+
+    def test_step_matches_scalar_path(self):
+        tol_lat_lon = 1e-5   # ~1.1 m
+        tol_alt     = 1.5    # 1.5 m
+
+        entities = []
+        expected = []
+        for _ in range(10000):
+            lat     = random.uniform(-60.0, 60.0)    # opendis ecef2lla altitude error grows poleward
+            lon     = random.uniform(-90.0, 90.0)
+            alt     = random.uniform(0, 1000)
+            speed   = random.uniform(0, 30.0)
+            pitch   = random.uniform(-90.0, 90.0)
+            heading = random.uniform(0.0, 360.0)
+            dt      = 1.0
+
+            entities.append((lat, lon, alt, heading, pitch, speed))
+
+            self.k_manager.set_position(lat, lon, alt)
+            self.k_manager.set_orientation(0.0, pitch, heading)
+            self.k_manager.set_speed(speed)
+            self.k_manager.process_kinematics(dt)
+            expected.append(self.k_manager.get_lat_lon_alt())
+
+        lat, lon, alt, heading, pitch, speed = np.array(entities).T
+        new_lat, new_lon, new_alt = great_circle_step(np.radians(lat), np.radians(lon), alt,
+                                                      np.radians(heading), np.radians(pitch),
+                                                      speed, dt)
+
+        for lat, lon, alt, (exp_lat, exp_lon, exp_alt) in zip(np.degrees(new_lat),
+                                                              np.degrees(new_lon), new_alt,
+                                                              expected):
+            delta_lon = (lon - exp_lon + 180) % 360 - 180
+            self.assertAlmostEqual(lat, exp_lat, delta=tol_lat_lon)
+            self.assertAlmostEqual(delta_lon, 0.0, delta=tol_lat_lon)
+            self.assertAlmostEqual(alt, exp_alt, delta=tol_alt)
+
+    def test_engine_steps_store_rows(self):
+        tol_lat_lon = 1e-5   # ~1.1 m
+        tol_alt     = 1.5    # 1.5 m
+
+        store = EntityStore(capacity=1)
+        fleet = KinematicsManager(store)
+        self.assertIs(store._location, store.kinematics.location)    # Rows are engine rows
+
+        ids = [(1, 1, i) for i in range(500)]
+        expected = {}
+        for entity_id in ids:
+            store.add_entity(entity_id)
+            lat     = random.uniform(-60.0, 60.0)
+            lon     = random.uniform(-90.0, 90.0)
+            alt     = random.uniform(0, 1000)
+            speed   = random.uniform(0, 30.0)
+            pitch   = random.uniform(-90.0, 90.0)
+            heading = random.uniform(0.0, 360.0)
+            for manager, entity in ((fleet, entity_id), (self.k_manager, None)):
+                manager.set_position(lat, lon, alt, entity)
+                manager.set_orientation(0.0, pitch, heading, entity)
+                manager.set_speed(speed, entity)
+            for _ in range(10):
+                self.k_manager.process_kinematics(1.0)
+            expected[entity_id] = self.k_manager.get_lat_lon_alt()
+
+        pdu = EntityStatePdu()    # Simulated by its sender, not stepped here
+        pdu.entityID.siteID, pdu.entityID.applicationID, pdu.entityID.entityID = 2, 2, 2
+        pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z = 5.0e6, -6.9e5, 3.8e6
+        pdu.entityLinearVelocity.x = 100.0
+        remote_id = store.set_data(pdu)
+        for entity_id in ids[::7]:    # Swap-remove moves rows together with their cached state
+            store.remove_entity(entity_id)
+            del expected[entity_id]
+
+        solves = []
+        ecef2lla = kinematicsEngine.ecef2lla
+        kinematicsEngine.ecef2lla = lambda *ecef: solves.append(ecef) or ecef2lla(*ecef)
+        try:
+            for _ in range(10):
+                fleet.process_entities_kinematics(1.0)
+        finally:
+            kinematicsEngine.ecef2lla = ecef2lla
+        self.assertEqual(solves, [])    # Steps never solve ECEF -> LLA
+
+        self.assertEqual(store.get_locations([remote_id]).tolist(), [[5.0e6, -6.9e5, 3.8e6]])
+        for entity_id, (exp_lat, exp_lon, exp_alt) in expected.items():
+            lat, lon, alt = fleet.get_lat_lon_alt(entity_id)
+            delta_lon = (lon - exp_lon + 180) % 360 - 180
+            self.assertAlmostEqual(lat, exp_lat, delta=tol_lat_lon)
+            self.assertAlmostEqual(delta_lon, 0.0, delta=tol_lat_lon)
+            self.assertAlmostEqual(alt, exp_alt, delta=tol_alt)
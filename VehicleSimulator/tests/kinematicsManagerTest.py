@@ -2,14 +2,19 @@ import math
 import random
 import unittest
 
+import numpy as np
+
 from opendis.RangeCoordinates import GPS, WGS84
+from opendis.dis7 import Vector3Double
 
+from lib.kinematics import deadReckoning, geodesy
 from lib.utils import positionException
 from lib.kinematics.kinematicsManager import KinematicsManager
 
 
 class TestKinematicsManager(unittest.TestCase):
     def __init__(self):
+        super().__init__()
         self.k_manager = KinematicsManager()
     
     def test_set_orientation(self):
@@ -132,4 +137,77 @@ class TestKinematicsManager(unittest.TestCase):
 
             self.assertAlmostEqual(new_roll,  old_roll,  delta=tol_angle)
             self.assertAlmostEqual(new_pitch, old_pitch, delta=tol_angle)
-            self.assertAlmostEqual(new_yaw % 360, old_yaw % 360, delta=tol_angle)
\ No newline at end of file
+            self.assertAlmostEqual(new_yaw % 360, old_yaw % 360, delta=tol_angle)
+    def test_geodetic_cache(self):
+        tol_lat_lon = 1e-9
+        gps = GPS()
+        solves = []
+        ecef2lla_point = geodesy.ecef2lla_point
+        geodesy.ecef2lla_point = lambda *ecef: solves.append(ecef) or ecef2lla_point(*ecef)
+        try:
+            self.k_manager.set_position(40.0, -3.0, 500.0)
+            self.k_manager.set_orientation(0.0, 5.0, 80.0)
+            self.k_manager.set_speed(250.0)
+            for _ in range(1000):
+                self.k_manager.process_kinematics(0.1)
+                self.k_manager.get_lat_lon_alt()
+            self.assertEqual(solves, [])    # Ticks never solve ECEF -> LLA
+
+            location = self.k_manager._entity().get_entity_location()
+            lat, lon, alt = self.k_manager.get_lat_lon_alt()
+            exp_lat, exp_lon, exp_alt = gps.ecef2lla([location.x, location.y, location.z])
+            self.assertAlmostEqual(lat, exp_lat, delta=tol_lat_lon)
+            self.assertAlmostEqual(lon, exp_lon, delta=tol_lat_lon)
+            self.assertAlmostEqual(alt, exp_alt, delta=1e-3)
+
+            location = Vector3Double()    # Set from outside, as an ESPDU does
+            location.x, location.y, location.z = gps.lla2ecef((-20.0, 150.0, 30.0))
+            self.k_manager._entity().set_entity_location(location)
+            lat, lon, alt = self.k_manager.get_lat_lon_alt()
+            self.assertEqual(len(solves), 1)
+            self.assertAlmostEqual(lat, -20.0, delta=tol_lat_lon)
+            self.assertAlmostEqual(lon, 150.0, delta=tol_lat_lon)
+            self.assertAlmostEqual(alt, 30.0, delta=1e-3)
+        finally:
+            geodesy.ecef2lla_point = ecef2lla_point
+
+    def test_dead_reckoning_rates(self):
+        """Acceleration and angular velocity match finite differences of the simulated track."""
+        dt = 10.0
+
+        def location() -> np.ndarray:
+            l = self.k_manager._entity().get_entity_location()
+            return np.array((l.x, l.y, l.z))
+
+        def body_to_ecef() -> np.ndarray:
+            lat, lon, _ = np.radians(self.k_manager.get_lat_lon_alt())
+            ned_to_ecef = np.array((
+                (-np.sin(lat) * np.cos(lon), -np.sin(lon), -np.cos(lat) * np.cos(lon)),
+                (-np.sin(lat) * np.sin(lon),  np.cos(lon), -np.cos(lat) * np.sin(lon)),
+                ( np.cos(lat),                0.0,         -np.sin(lat))))
+            roll, pitch, yaw = np.radians(self.k_manager.get_roll_pitch_yaw())
+            ned_to_body = deadReckoning.euler_to_matrix(np.array([[yaw, pitch, roll]]))[0]
+            return ned_to_ecef @ ned_to_body.T
+
+        for lat, lon, roll, pitch, heading, speed in ((40.0, -3.0, 0.0, 0.0, 60.0, 250.0),
+                                                      (-55.0, 120.0, 10.0, 5.0, 200.0, 80.0),
+                                                      (0.0, 0.0, 0.0, 0.0, 90.0, 30.0)):
+            self.k_manager.set_position(lat, lon, 500.0)
+            self.k_manager.set_orientation(roll, pitch, heading)
+            self.k_manager.set_speed(speed)
+            before = location()
+            self.k_manager.process_kinematics(dt)
+            now, rotation = location(), body_to_ecef()
+            acceleration = np.array(self.k_manager.get_acceleration())
+            angular_velocity = np.array(self.k_manager.get_angular_velocity())
+            self.k_manager.process_kinematics(dt)
+            after, next_rotation = location(), body_to_ecef()
+
+            expected = (after - 2 * now + before) / dt**2
+            self.assertLess(np.linalg.norm(acceleration - expected),
+                            0.02 * np.linalg.norm(expected))
+            turn = rotation.T @ next_rotation    # Body rotation over dt, I + skew(w * dt)
+            expected = np.array((turn[2, 1] - turn[1, 2], turn[0, 2] - turn[2, 0],
+                                 turn[1, 0] - turn[0, 1])) / (2 * dt)
+            self.assertLess(np.linalg.norm(angular_velocity - expected),
+                            0.02 * np.linalg.norm(expected))
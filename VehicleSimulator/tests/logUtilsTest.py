@@ -0,0 +1,62 @@
+import logging
+import unittest
+
+from opendis.dis7 import EntityStatePdu
+
+from common.logUtils import RateLimitFilter
+
+from lib.utils.logUtils import PduDump, format_pdu
+
+from fakeClock import FakeClock
+
+
+class CountingDump(PduDump):
+    __slots__ = ("renders",)
+
+    def __init__(self, pdu):
+        super().__init__(pdu)
+        self.renders = 0
+
+    def __str__(self):
+        self.renders += 1
+        return super().__str__()
+
+
+class TestLogUtils(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_lazy_dump(self):
+        pdu = EntityStatePdu()
+        pdu.entityLocation.x = 1234.5
+        pdu.deadReckoningParameters.entityAngularVelocity.z = 0.25
+        text = format_pdu(pdu)
+        self.assertIn("\tentityLocation:\n\t\tx: 1234.5", text)
+        self.assertIn("\t\tentityAngularVelocity:\n\t\t\tx: 0", text)
+        self.assertIn("\t\t\tz: 0.25", text)
+
+        logger = logging.getLogger("LogUtilsTest")
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        dump = CountingDump(pdu)
+        logger.debug("PDU: %s", dump)
+        self.assertEqual(dump.renders, 0)
+
+    def test_rate_limit(self):
+        clock = FakeClock(10.0)
+        rate_filter = RateLimitFilter(rate=10.0, burst=5, clock=clock)
+
+        def record(level=logging.DEBUG, lineno=1):
+            return logging.LogRecord("test", level, "file.py", lineno, "PDU %d", (1,), None)
+
+        passed = sum(rate_filter.filter(record()) for _ in range(100))
+        self.assertEqual(passed, 5)    # Burst only
+        self.assertTrue(rate_filter.filter(record(lineno=2)))    # Other call site, own bucket
+        self.assertTrue(rate_filter.filter(record(logging.INFO)))    # Above max_level
+
+        clock.now += 1.0    # 10 more tokens, capped to the burst
+        records = [record() for _ in range(10)]
+        passed = [r for r in records if rate_filter.filter(r)]
+        self.assertEqual(len(passed), 5)
+        self.assertIn("95 similar records suppressed", passed[0].getMessage())
+        self.assertEqual(passed[1].getMessage(), "PDU 1")
@@ -0,0 +1,111 @@
+import threading
+import time
+import unittest
+import urllib.request
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu, StartResumePdu
+
+from common import metrics
+
+from lib.simulation import simulationManager
+from lib.simulation.communication import multicastManager
+
+
+def _encoded(pdu) -> bytes:
+    memory_stream = BytesIO()
+    pdu.serialize(DataOutputStream(memory_stream))
+    return memory_stream.getvalue()
+
+
+class TestMetrics(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_exposition(self):
+        registry = metrics.Registry()
+        counter = registry.counter("requests_total", "Requests", ("path",))
+        counter.labels("/a").inc()
+        counter.labels('quote"d\n').inc(2)
+        self.assertIs(registry.counter("requests_total", "Requests", ("path",)), counter)
+        self.assertRaises(ValueError, registry.histogram, "requests_total", "Requests")
+        self.assertRaises(ValueError, counter.labels, "/a", "extra")
+        self.assertRaises(TypeError, metrics._Metric, "base", "Abstract")    # No samples to expose
+
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+        registry.callback("queue_size", "Queued items", ("queue",)).add_source(
+            "a", lambda: {("in",): 3})
+
+        lines = registry.expose().splitlines()
+        self.assertIn("# TYPE latency_seconds histogram", lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 2', lines)    # le is inclusive
+        self.assertIn('latency_seconds_bucket{le="1.0"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 4', lines)
+        self.assertIn("latency_seconds_sum 3.65", lines)
+        self.assertIn("latency_seconds_count 4", lines)
+        self.assertIn('queue_size{queue="in"} 3', lines)
+        self.assertIn('requests_total{path="/a"} 1.0', lines)
+        self.assertIn('requests_total{path="quote\\"d\\n"} 2.0', lines)
+
+    def test_http_endpoint(self):
+        registry = metrics.Registry()
+        registry.counter("hits_total", "Hits").inc()
+        server = metrics.start_http_server(0, registry=registry)
+        url = "http://%s:%d" % server.server_address[:2]
+        try:
+            with urllib.request.urlopen(url + "/metrics") as response:
+                self.assertEqual(response.headers["Content-Type"], metrics.CONTENT_TYPE)
+                self.assertIn("hits_total 1.0", response.read().decode())
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url + "/other")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_timed_lock(self):
+        histogram = metrics.Registry().histogram("wait_seconds", "Wait",
+                                                 buckets=metrics.LOCK_WAIT_BUCKETS)
+        lock = metrics.TimedLock(histogram)
+        with lock:
+            pass
+        self.assertEqual(histogram.get_count(), 0)    # Uncontended, not timed
+
+        lock.acquire()
+        waiter = threading.Thread(target=lambda: lock.acquire() and lock.release())
+        waiter.start()
+        time.sleep(0.05)
+        lock.release()
+        waiter.join()
+        self.assertEqual(histogram.get_count(), 1)
+        self.assertGreater(histogram.labels().sum, 0.04)
+
+    def test_receive_path_counters(self):
+        sim = simulationManager.SimulationManager(start_threads=False)
+        sim.multicast_manager.sock.close()
+        received = multicastManager.PDUS_RECEIVED.get("EntityStatePdu")
+        filtered = multicastManager.PDUS_FILTERED.get("EntityStatePdu")
+        decoded = multicastManager.PDUS_DECODED.get("StartResumePdu")
+        dispatched = simulationManager.PDUS_DISPATCHED.get("StartResumePdu")
+
+        espdu = EntityStatePdu()
+        espdu.exerciseID = 99    # Not in pdu_filter.json
+        sim.multicast_manager.process_datagram(_encoded(espdu))
+        start = StartResumePdu()
+        start.exerciseID = start.originatingEntityID.applicationID = 1
+        start.originatingEntityID.siteID = 1
+        sim.multicast_manager.process_datagram(_encoded(start))
+
+        self.assertEqual(multicastManager.PDUS_RECEIVED.get("EntityStatePdu"), received + 1)
+        self.assertEqual(multicastManager.PDUS_FILTERED.get("EntityStatePdu"), filtered + 1)
+        self.assertEqual(multicastManager.PDUS_DECODED.get("StartResumePdu"), decoded + 1)
+        self.assertEqual(simulationManager.PDUS_DISPATCHED.get("StartResumePdu"), dispatched + 1)
+        self.assertEqual(sim.exercise_status, simulationManager.ExerciseStatus.RUNNING)
+
+        exposition = metrics.REGISTRY.expose()
+        self.assertIn('scheduler_task_overruns_total{scheduler="simulation",task="espdu"}',
+                      exposition)
+        self.assertIn("dis_kernel_drops_total", exposition)
@@ -0,0 +1,115 @@
+import socket
+import unittest
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import EntityStatePdu
+
+from lib.simulation.communication import multicastManager
+from lib.simulation.communication.multicastManager import MAX_DATAGRAM_SIZE, MulticastManager
+
+
+class Listener:
+    def __init__(self):
+        self.pdus = []
+
+    def on_pdu_received(self, pdu) -> None:
+        self.pdus.append(pdu)
+
+
+class TestMulticastManager(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def _loopback(self, **kwargs) -> tuple:
+        """
+        Manager bound to a loopback port and a socket sending to it. Loopback datagrams are queued
+        before send returns, so the blocking receives of the tests never wait. No socket timeout:
+        it would make the MSG_DONTWAIT drain wait too.
+        """
+        manager = MulticastManager("127.0.0.1", 0, **kwargs)
+        manager.create_connection()
+        sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sender.connect(manager.sock.getsockname())
+        return manager, sender
+
+    def test_receive_burst(self):
+        manager, sender = self._loopback(burst_size=4)
+        try:
+            for number in range(6):
+                sender.send(bytes([number]) * (number + 1))
+
+            self.assertEqual(manager.receive_burst(), 4)
+            self.assertEqual(bytes(manager.get_datagram(3)), b"\x03" * 4)
+            self.assertEqual(manager.get_sender(0), sender.getsockname())
+            self.assertEqual(manager.receive_burst(), 2)    # Rest of the queue, no blocking
+            self.assertEqual(bytes(manager.get_datagram(1)), b"\x05" * 6)
+
+            stats = manager.get_receive_stats()
+            self.assertEqual(stats["received"], 6)
+            self.assertEqual(stats["bursts"], 2)
+            self.assertEqual(stats["max_burst_size"], 4)
+            self.assertEqual(stats["mean_burst_size"], 3.0)
+            self.assertEqual(stats["truncated"], 0)
+        finally:
+            manager.sock.close()
+            sender.close()
+
+    def test_truncated_datagrams(self):
+        manager, sender = self._loopback()
+        try:
+            sender.send(bytes(MAX_DATAGRAM_SIZE + 100))
+            sender.send(bytes(MAX_DATAGRAM_SIZE))
+            manager.receive_burst()
+            # recvmsg_into reports the oversized one only, recvfrom_into cannot tell them apart
+            self.assertEqual(manager.truncated_datagrams, 1 if manager._track_drops else 2)
+            self.assertEqual(len(manager.get_datagram(0)), MAX_DATAGRAM_SIZE)
+
+            manager._track_drops = False    # Fallback path of non Linux platforms
+            sender.send(bytes(MAX_DATAGRAM_SIZE))
+            sender.send(bytes(100))
+            manager.truncated_datagrams = 0
+            manager.receive_burst()
+            self.assertEqual(manager.truncated_datagrams, 1)
+        finally:
+            manager.sock.close()
+            sender.close()
+
+    def test_kernel_drops(self):
+        manager, sender = self._loopback(receive_buffer_size=4096)
+        try:
+            if not manager._track_drops:
+                return    # SO_RXQ_OVFL is Linux only
+            for _ in range(200):    # Far more than the receive buffer holds
+                sender.send(bytes(1000))
+            while manager.receive_burst() == manager.burst_size:
+                pass
+            self.assertEqual(manager.kernel_drops, 0)    # Counter read when queued
+            sender.send(bytes(1000))
+            manager.receive_burst()
+            self.assertGreater(manager.kernel_drops, 0)
+            self.assertEqual(manager.get_receive_stats()["kernel_drops"], manager.kernel_drops)
+        finally:
+            manager.sock.close()
+            sender.close()
+
+    def test_undecodable_datagrams(self):
+        manager = MulticastManager()
+        listener = Listener()
+        manager.add_listener(listener)
+        memory_stream = BytesIO()
+        EntityStatePdu().serialize(DataOutputStream(memory_stream))
+        espdu = memory_stream.getvalue()
+        unknown = bytearray(espdu)
+        unknown[multicastManager.PDU_TYPE_OFFSET] = 200    # No decoder for this type
+        before = multicastManager.PDUS_UNDECODABLE.get("200")
+
+        manager.process_datagram(bytes(unknown))
+        manager.process_datagram(espdu[:40])    # Shorter than an ESPDU
+        manager.process_datagram(espdu)
+
+        self.assertEqual(len(listener.pdus), 1)
+        self.assertIsInstance(listener.pdus[0], EntityStatePdu)
+        self.assertEqual(manager.get_receive_stats()["undecodable"], 2)
+        self.assertEqual(multicastManager.PDUS_UNDECODABLE.get("200"), before + 1)
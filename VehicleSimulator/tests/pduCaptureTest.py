@@ -0,0 +1,65 @@
+import os
+import random
+import tempfile
+import unittest
+
+from lib.simulation.communication.pduCapture import PduCapture, PduRecorder, PduReplayer
+
+from fakeClock import FakeClock
+
+
+class TestPduCapture(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.discap")
+        self.clock = FakeClock()
+        self.datagrams = []
+        self.times = []
+        with PduRecorder(self.path, index_interval=1.0, clock=self.clock.ns) as recorder:
+            for _ in range(5000):
+                self.clock.now += random.uniform(0.0, 0.01)
+                datagram = os.urandom(random.randint(12, 1400))
+                recorder.record(memoryview(datagram))
+                self.datagrams.append(datagram)
+                self.times.append(self.clock.now)
+
+    def test_round_trip_and_seek(self):
+        with PduCapture(self.path) as capture:
+            records = list(capture.records())
+            self.assertEqual([datagram for _, datagram in records], self.datagrams)
+            self.assertAlmostEqual(records[-1][0], self.times[-1] - self.times[0] + records[0][0],
+                                   places=6)
+            self.assertAlmostEqual(capture.duration(), records[-1][0], places=9)
+
+            start, end = 7.3, 12.1
+            section = list(capture.records(start, end))
+            expected = [r for r in records if start <= r[0] < end]
+            self.assertEqual(section, expected)
+
+    def test_truncated_capture(self):
+        size = os.path.getsize(self.path)
+        with open(self.path, "r+b") as f:
+            f.truncate(size - 5)    # Crash in the middle of the last record
+        with PduCapture(self.path) as capture:
+            datagrams = [datagram for _, datagram in capture.records()]
+        self.assertEqual(datagrams, self.datagrams[:-1])
+
+    def test_replay_speed(self):
+        with PduCapture(self.path) as capture:
+            records = list(capture.records(5.0, 10.0))
+            for speed in (1.0, 4.0):
+                clock = FakeClock()
+                sent = []
+                replayer = PduReplayer(capture, lambda data: sent.append((clock.now, data)), speed,
+                                       clock=clock, sleep=clock.sleep)
+                self.assertEqual(replayer.play(5.0, 10.0), len(records))
+                self.assertEqual([data for _, data in sent], [data for _, data in records])
+                for (sent_at, _), (elapsed, _) in zip(sent, records):
+                    self.assertAlmostEqual(sent_at, (elapsed - records[0][0]) / speed, places=6)
+
+            clock = FakeClock()
+            replayer = PduReplayer(capture, lambda data: None, 0, clock=clock, sleep=clock.sleep)
+            replayer.play()
+            self.assertEqual(clock.now, 0.0)    # As fast as possible never sleeps
+            self.assertEqual(replayer.sent, len(self.datagrams))
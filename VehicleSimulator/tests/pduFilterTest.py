@@ -0,0 +1,62 @@
+import unittest
+
+from lib.utils.pduFilter import WILDCARD, PduFilter, PduFilterSet
+
+
+class TestPduFilterSet(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_exact_match(self):
+        filter_set = PduFilterSet([PduFilter(1, 2, 3), PduFilter(4, 5, 6)])
+
+        self.assertEqual(len(filter_set), 2)
+        self.assertTrue(filter_set.matches(1, 2, 3))
+        self.assertTrue(filter_set.matches(4, 5, 6))
+        self.assertFalse(filter_set.matches(1, 2, 4))
+        self.assertFalse(filter_set.matches(1, 5, 6))    # Fields of different entries
+        self.assertFalse(filter_set.matches(3, 2, 1))    # exercise, app, site order
+        self.assertIn(PduFilter(4, 5, 6), filter_set)
+        self.assertNotIn(PduFilter(4, 5, 7), filter_set)
+
+        filter_set.add(PduFilter(1, 2, 3))    # Duplicate
+        self.assertEqual(len(filter_set), 2)
+
+    def test_wildcards(self):
+        filter_set = PduFilterSet.from_json([
+            {"exercise_id": 1, "application_id": 1, "site_id": 1},
+            {"exercise_id": 2, "application_id": WILDCARD, "site_id": 7},
+            {"exercise_id": 3},    # Missing fields are wildcards
+        ])
+
+        self.assertTrue(filter_set.matches(1, 1, 1))
+        self.assertFalse(filter_set.matches(1, 1, 2))
+        self.assertTrue(filter_set.matches(2, 0, 7))
+        self.assertTrue(filter_set.matches(2, 65535, 7))
+        self.assertFalse(filter_set.matches(2, 1, 1))
+        self.assertTrue(filter_set.matches(3, 9, 9))
+        self.assertFalse(filter_set.matches(4, 1, 1))
+        self.assertEqual(filter_set._layouts[0], (False, False, False))    # Exact probed first
+
+        match_all = PduFilterSet.from_json([{}])
+        self.assertTrue(match_all.matches(200, 300, 400))
+
+    def test_non_id_pdu_types(self):
+        """PDUs without entity ID are matched with application and site -1."""
+        filter_set = PduFilterSet.from_json([{"exercise_id": 1, "application_id": 1,
+                                              "site_id": 1},
+                                             {"exercise_id": 2}])
+
+        self.assertFalse(filter_set.matches(1, -1, -1))
+        self.assertTrue(filter_set.matches(2, -1, -1))
+        self.assertFalse(filter_set.matches(3, -1, -1))
+        filter_set.add(PduFilter(3, -1, -1))
+        self.assertTrue(filter_set.matches(3, -1, -1))
+
+    def test_empty_filter(self):
+        filter_set = PduFilterSet()
+
+        self.assertEqual(len(filter_set), 0)
+        self.assertFalse(filter_set.matches(1, 1, 1))
+        self.assertFalse(filter_set.matches(0, -1, -1))
+        self.assertFalse(PduFilterSet.from_json([]).matches(1, 1, 1))
@@ -0,0 +1,101 @@
+import itertools
+import unittest
+
+from io import BytesIO
+
+from opendis.DataOutputStream import DataOutputStream
+from opendis.dis7 import (
+    AcknowledgePdu,
+    CommentPdu,
+    EntityStatePdu,
+    FirePdu,
+    StartResumePdu,
+    StopFreezePdu,
+)
+from opendis.PduFactory import createPdu
+
+from lib.simulation import simulationManager
+from lib.simulation.communication.pduPreFilter import PduPreFilter
+from lib.utils.pduFilter import PduFilterSet
+
+
+def _encoded(pdu) -> bytes:
+    memory_stream = BytesIO()
+    pdu.serialize(DataOutputStream(memory_stream))
+    return memory_stream.getvalue()
+
+
+def _pdu(pdu_class, exercise: int, app: int, site: int):
+    pdu = pdu_class()
+    pdu.exerciseID = exercise
+    for name in ("entityID", "originatingEntityID", "firingEntityID"):
+        entity_id = getattr(pdu, name, None)
+        if entity_id is not None:
+            entity_id.applicationID = app
+            entity_id.siteID = site
+            break
+    return pdu
+
+
+class TestPduPreFilter(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.filters = [{"exercise_id": 1, "application_id": 1, "site_id": 1},
+                        {"exercise_id": 2},    # Any application and site
+                        {"site_id": 5}]    # Any exercise and application
+
+    def test_agrees_with_can_process_pdu(self):
+        sim = simulationManager.SimulationManager(start_threads=False)
+        try:
+            sim.pdu_filter_set = PduFilterSet.from_json(self.filters)
+            pre_filter = PduPreFilter(sim.matches_filters)
+            pdu_classes = (EntityStatePdu, StartResumePdu, StopFreezePdu, AcknowledgePdu,
+                           FirePdu, CommentPdu)
+            accepted = 0
+            for pdu_class, exercise, app, site in itertools.product(pdu_classes, (1, 2, 3),
+                                                                    (1, 5), (1, 5)):
+                data = _encoded(_pdu(pdu_class, exercise, app, site))
+                expected = sim.can_process_pdu(createPdu(data))
+                self.assertEqual(pre_filter.accept(data), expected,
+                                 f"{pdu_class.__name__} {exercise}/{app}/{site}")
+                accepted += expected
+            stats = pre_filter.get_stats()
+            self.assertEqual(stats["received"], len(pdu_classes) * 12)
+            self.assertEqual(stats["accepted"], accepted)
+            self.assertEqual(stats["rejected"], stats["received"] - accepted)
+        finally:
+            sim.multicast_manager.sock.close()
+
+    def test_non_entity_pdu_types(self):
+        pre_filter = PduPreFilter(PduFilterSet.from_json(self.filters).matches)
+        # Bytes 12-15 hold a matching site and application, not read for these types
+        self.assertFalse(pre_filter.accept(_encoded(_pdu(AcknowledgePdu, 1, 1, 1))))
+        self.assertFalse(pre_filter.accept(_encoded(_pdu(FirePdu, 3, 5, 5))))
+        self.assertTrue(pre_filter.accept(_encoded(_pdu(CommentPdu, 2, 9, 9))))    # Exercise 2
+        self.assertTrue(pre_filter.accept(_encoded(_pdu(EntityStatePdu, 3, 1, 5))))
+
+    def test_malformed_headers(self):
+        pre_filter = PduPreFilter(lambda exercise, app, site: True)
+        data = _encoded(_pdu(EntityStatePdu, 1, 1, 1))
+        for size in (0, 1, 11):    # Shorter than the PDU header
+            self.assertFalse(pre_filter.accept(data[:size]))
+        self.assertTrue(pre_filter.accept(data[:12]))    # Header only, left to the decoder
+        self.assertTrue(pre_filter.accept(data[:16]))    # Header is enough, body is not read
+        self.assertTrue(pre_filter.accept(memoryview(data)))
+
+        stats = pre_filter.get_stats()
+        self.assertEqual((stats["received"], stats["accepted"], stats["malformed"]), (6, 3, 3))
+        self.assertEqual(stats["rejected_bytes"], 0 + 1 + 11)
+        self.assertAlmostEqual(stats["decode_avoided_ratio"], 3 / 6)
+        pre_filter.reset_stats()
+        self.assertEqual(pre_filter.get_stats()["received"], 0)
+
+    def test_truncated_entity_id(self):
+        pre_filter = PduPreFilter(PduFilterSet.from_json(self.filters).matches)
+        for pdu_class in (EntityStatePdu, CommentPdu):
+            data = _encoded(_pdu(pdu_class, 2, 1, 1))[:14]    # Site only, no application
+            self.assertTrue(pre_filter.accept(data))    # Exercise 2 takes any site and application
+            data = _encoded(_pdu(pdu_class, 1, 1, 1))[:14]
+            self.assertFalse(pre_filter.accept(data))    # Checked with site and application -1
+        stats = pre_filter.get_stats()
+        self.assertEqual((stats["accepted"], stats["rejected"], stats["malformed"]), (2, 2, 0))
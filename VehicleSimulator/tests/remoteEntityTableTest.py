@@ -0,0 +1,104 @@
+import unittest
+
+import numpy as np
+
+from opendis.dis7 import EntityStatePdu
+
+from lib.entity.remoteEntityTable import RemoteEntityTable
+from lib.entity.spatialIndex import SpatialIndex
+from lib.kinematics.deadReckoning import DeadReckoningAlgorithm, extrapolate
+from lib.kinematics.kinematicsManager import KinematicsManager
+
+from fakeClock import FakeClock
+
+
+def _espdu(entity, location, velocity, algorithm=DeadReckoningAlgorithm.FPW):
+    pdu = EntityStatePdu()
+    pdu.entityID.siteID, pdu.entityID.applicationID, pdu.entityID.entityID = 2, 8, entity
+    pdu.entityLocation.x, pdu.entityLocation.y, pdu.entityLocation.z = location
+    pdu.entityLinearVelocity.x, pdu.entityLinearVelocity.y, pdu.entityLinearVelocity.z = velocity
+    pdu.deadReckoningParameters.deadReckoningAlgorithm = algorithm
+    return pdu
+
+
+class TestRemoteEntityTable(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.clock = FakeClock(100.0)
+        self.table = RemoteEntityTable(capacity=1, clock=self.clock)
+
+    def test_extrapolate(self):
+        tol_position = 1e-3    # 1 mm, velocities are stored as float32
+        count = 2000
+        locations = np.random.uniform(-7e6, 7e6, (count, 3))
+        velocities = np.random.uniform(-300, 300, (count, 3)).astype(np.float32)
+        for i in range(count):
+            self.table.set_data(_espdu(i, locations[i], velocities[i]))
+        self.table.add_entity((2, 8, count))    # Local entity, no receive time
+
+        self.clock.now += 2.5
+        result, _ = self.table.extrapolate()
+        expected, _ = extrapolate(DeadReckoningAlgorithm.FPW, locations, velocities,
+                                  np.zeros((count, 3)), np.zeros((count, 3)),
+                                  np.zeros((count, 3)), 2.5)
+
+        self.assertEqual(len(result), count + 1)
+        self.assertLess(np.abs(result[:count] - expected).max(), tol_position)
+        self.assertTrue(np.array_equal(result[count], np.zeros(3)))
+
+        subset, _ = self.table.extrapolate(entity_ids=[(2, 8, 7)])
+        self.assertLess(np.abs(subset[0] - expected[7]).max(), tol_position)
+        ids, snapshot, _ = self.table.snapshot()
+        self.assertEqual(ids, self.table.get_entity_ids())
+        self.assertTrue(np.array_equal(snapshot, result))
+        for entity_id in self.table.get_entity_ids():
+            self.table.remove_entity(entity_id)
+
+    def test_expire(self):
+        for i in range(10):
+            self.table.set_data(_espdu(i, (1.0, 2.0, 3.0), (0.0, 0.0, 0.0)))
+            self.clock.now += 1.0
+        self.table.add_entity((2, 8, 99))    # Local entity, never expires
+
+        expired = self.table.expire(timeout=5.5)    # Last 5 updates are recent enough
+
+        self.assertEqual(sorted(expired), [(2, 8, i) for i in range(5)])
+        self.assertEqual(sorted(self.table.get_entity_ids()),
+                         [(2, 8, i) for i in range(5, 10)] + [(2, 8, 99)])
+        self.assertTrue(np.all(self.clock.now - self.table.get_update_times([(2, 8, 9)]) == 1.0))
+
+        self.table.set_data(_espdu(5, (1.0, 2.0, 3.0), (0.0, 0.0, 0.0)))    # Refreshed
+        self.clock.now += 5.0
+        self.assertEqual(sorted(self.table.expire(timeout=5.5)), [(2, 8, i) for i in range(6, 10)])
+        self.assertEqual(sorted(self.table.get_entity_ids()), [(2, 8, 5), (2, 8, 99)])
+
+    def test_spatial_index(self):
+        index = SpatialIndex(cell_size=10000.0, capacity=1)
+        table = RemoteEntityTable(capacity=1, clock=self.clock, spatial_index=index)
+        origin = np.array([6378137.0, 0.0, 0.0])
+        for i in range(10):
+            table.set_data(_espdu(i, origin + (0.0, 1000.0 * i, 0.0), (0.0, 100.0, 0.0)))
+        self.assertEqual(index.query_radius(origin, 2500.0), [(2, 8, 0), (2, 8, 1), (2, 8, 2)])
+
+        self.clock.now += 10.0    # Dead reckoned 1 km further along y
+        table.snapshot()
+        self.assertEqual(index.query_radius(origin, 2500.0), [(2, 8, 0), (2, 8, 1)])
+
+        self.clock.now += 100.0
+        table.set_data(_espdu(3, origin, (0.0, 0.0, 0.0)))
+        table.expire(timeout=50.0)
+        self.assertEqual(index.get_entity_ids(), [(2, 8, 3)])
+        self.assertEqual(index.query_radius(origin, 1.0), [(2, 8, 3)])
+
+        kinematics = KinematicsManager(table)    # Locally simulated entity, moved by its steps
+        table.add_entity((1, 1, 1))
+        kinematics.set_position(0.0, 0.0, 0.0, (1, 1, 1))
+        kinematics.set_orientation(0.0, 0.0, 0.0, (1, 1, 1))
+        kinematics.set_speed(100.0, (1, 1, 1))
+        kinematics.process_entities_kinematics(10.0)
+        self.assertTrue(np.array_equal(index.get_positions([(1, 1, 1)]),
+                                       table.get_locations([(1, 1, 1)])))
+        self.assertEqual(index.query_radius(origin, 1500.0), [(2, 8, 3), (1, 1, 1)])
+
+        table.clear()
+        self.assertEqual(len(index), 0)
@@ -0,0 +1,153 @@
+import threading
+import time
+import unittest
+
+from lib.core.scheduler import OverrunPolicy, Scheduler
+from lib.simulation.simulationManager import ExerciseState, ExerciseStatus
+
+from fakeClock import FakeClock
+
+
+class TestScheduler(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.clock = FakeClock(50.0)
+
+    def _run_for(self, scheduler, duration):
+        """Run scheduler sleeping exactly as requested, like the real run loop."""
+        end = self.clock.now + duration
+        while self.clock.now < end - 1e-6:
+            self.clock.now += scheduler.run_pending()
+
+    def test_no_drift(self):
+        scheduler = Scheduler(self.clock)
+        starts = []
+
+        def work():
+            starts.append(self.clock.now)
+            self.clock.now += 0.004    # Work takes 4 ms of the 1/60 s frame
+
+        scheduler.add_task("physics", 1 / 60, work)
+        self._run_for(scheduler, 10.0)
+
+        self.assertEqual(len(starts), 600)
+        for frame, start in enumerate(starts):
+            self.assertAlmostEqual(start, 50.0 + frame / 60, places=9)
+        self.assertEqual(scheduler.get_stats()["physics"]["overruns"], 0)
+
+    def test_periods(self):
+        scheduler = Scheduler(self.clock)
+        counts = {"kinematics": 0, "sensors": 0, "fuel": 0}
+
+        def counter(name):
+            def count():
+                counts[name] += 1
+            return count
+
+        scheduler.add_task("kinematics", 1 / 60, counter("kinematics"))
+        scheduler.add_task("sensors", 1 / 10, counter("sensors"))
+        scheduler.add_task("fuel", 1.0, counter("fuel"))
+        self._run_for(scheduler, 5.0)
+
+        self.assertEqual(counts, {"kinematics": 300, "sensors": 50, "fuel": 5})
+
+    def test_overrun_policies(self):
+        for policy, expected_frames in ((OverrunPolicy.SKIP, 8), (OverrunPolicy.CATCH_UP, 10)):
+            self.clock.now = 50.0
+            scheduler = Scheduler(self.clock)
+            frames = []
+
+            def work():
+                frames.append(self.clock.now)
+                if len(frames) == 2:
+                    self.clock.now += 0.35    # One slow frame, the 2 next slots are missed
+
+            task = scheduler.add_task("tick", 0.1, work, policy)
+            self._run_for(scheduler, 0.95)
+
+            self.assertEqual(len(frames), expected_frames)
+            self.assertEqual(task.overruns, 1)
+            self.assertEqual(task.skipped_frames, 10 - expected_frames)
+            # Cadence stays on the original grid afterwards
+            self.assertAlmostEqual((frames[-1] - 50.0) % 0.1, 0.0, places=9)
+
+    def test_failing_task(self):
+        self.clock.now = 50.0
+        scheduler = Scheduler(self.clock)
+        counts = {"kinematics": 0, "fuel": 0}
+
+        def kinematics():
+            counts["kinematics"] += 1
+
+        def fuel():
+            counts["fuel"] += 1
+            raise ZeroDivisionError("float division by zero")
+
+        scheduler.add_task("kinematics", 0.1, kinematics)
+        scheduler.add_task("fuel", 0.5, fuel)
+        with self.assertLogs("Scheduler", "ERROR") as logs:
+            self._run_for(scheduler, 2.0)
+
+        self.assertEqual(counts, {"kinematics": 20, "fuel": 4})    # Failing task keeps its cadence
+        self.assertEqual(len(logs.records), 1)    # Rate limited
+        stats = scheduler.get_stats()
+        self.assertEqual(stats["fuel"]["errors"], 4)
+        self.assertEqual(stats["fuel"]["frames"], 4)
+        self.assertEqual(stats["kinematics"]["errors"], 0)
+
+    def test_pause_resume(self):
+        scheduler = Scheduler(paused=True)
+        state = ExerciseState()
+        state.add_listener(lambda old, new: scheduler.resume() if new == ExerciseStatus.RUNNING
+                           else scheduler.pause())
+        frames = []
+        first_frame = threading.Event()
+
+        def work():
+            frames.append(time.monotonic())
+            first_frame.set()
+
+        scheduler.add_task("tick", 0.01, work)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        time.sleep(0.1)
+        self.assertEqual(frames, [])    # Idle while paused
+
+        started = time.monotonic()
+        state.set(ExerciseStatus.RUNNING)
+        self.assertTrue(first_frame.wait(1.0))
+        self.assertLess(frames[0] - started, 0.05)    # Woken, not polled
+
+        time.sleep(0.1)
+        state.set(ExerciseStatus.PAUSED)
+        time.sleep(0.02)    # Let a frame in progress finish
+        count = len(frames)
+        time.sleep(0.1)
+        self.assertEqual(len(frames), count)
+
+        self.assertFalse(state.set(ExerciseStatus.PAUSED))
+        self.assertTrue(state.wait_for(ExerciseStatus.PAUSED, ExerciseStatus.TERMINATED, timeout=0))
+        scheduler.stop()
+        thread.join(1.0)
+        self.assertFalse(thread.is_alive())
+
+    def test_call_soon(self):
+        scheduler = Scheduler(paused=True)
+        calls = []
+        done = threading.Event()
+
+        def fail():
+            raise RuntimeError("Expected failure")
+
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        with self.assertLogs("Scheduler", "ERROR"):
+            scheduler.call_soon(lambda: calls.append(threading.current_thread()))
+            scheduler.call_soon(fail)    # Logged, the next call still runs
+            scheduler.call_soon(done.set)
+            self.assertTrue(done.wait(1.0))    # Run while paused, woken right away
+        self.assertEqual(calls, [thread])
+
+        scheduler.call_soon(scheduler.stop)
+        thread.join(1.0)
+        self.assertFalse(thread.is_alive())
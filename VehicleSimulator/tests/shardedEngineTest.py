@@ -0,0 +1,79 @@
+import random
+import unittest
+
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from lib.kinematics.shardedEngine import ShardedEngine
+
+
+class TestShardedEngine(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_add_remove_entity(self):
+        with ShardedEngine(100) as engine:
+            indexes = [engine.add_entity(0.0, 0.0, 0.0) for _ in range(100)]
+
+            self.assertEqual(len(engine), 100)
+            self.assertEqual(indexes, list(range(100)))
+
+            engine.remove_entity(42)
+            self.assertEqual(len(engine), 99)
+            self.assertRaises(IndexError, engine.get_speed, 42)
+            self.assertEqual(engine.add_entity(1.0, 2.0, 3.0), 42)    # Slot is reused
+
+    def test_step_matches_engine(self):
+        count = 5000
+        with ShardedEngine(count, workers=0) as reference, \
+                ShardedEngine(count, workers=3, consumption_rate=5.0, initial_fuel=5.0,
+                              min_shard_size=100) as sharded:
+            for _ in range(count):
+                entity = (random.uniform(-80.0, 80.0), random.uniform(-180.0, 180.0),
+                          random.uniform(0, 1000), 0.0, random.uniform(-30.0, 30.0),
+                          random.uniform(0.0, 360.0), random.uniform(0, 300.0))
+                reference.add_entity(*entity)
+                sharded.add_entity(*entity)
+            self.assertEqual(len(sharded._shards()), 3)
+            for _ in range(5):
+                reference.step(1.0)
+                sharded.step(1.0)
+
+            for expected, actual in zip(reference.get_positions(), sharded.get_positions()):
+                self.assertTrue(np.array_equal(expected, actual))    # Same code, same rounding
+            expected_fuel = np.maximum(5.0 - 5.0 * reference._speed[:count] * 5 / 1000, 0.0)
+            self.assertLess(np.abs(sharded.get_fuel_quantities() - expected_fuel).max(), 1e-9)
+            self.assertEqual(sharded.get_fuel_quantities().min(), 0.0)    # Fast ones ran dry
+
+            self.assertRaises(ValueError, sharded.add_entity, 0.0, 0.0, 0.0)    # Capacity fixed
+            name = sharded.memory_name
+        self.assertFalse(any(process.is_alive() for process in sharded._processes))
+        self.assertRaises(FileNotFoundError, shared_memory.SharedMemory, name=name)
+
+    def test_small_fleet_steps_inline(self):
+        with ShardedEngine(10, workers=2, initial_fuel=1.0) as sharded:
+            index = sharded.add_entity(0.0, 0.0, 0.0, yaw=90.0, speed=100.0, fuel=2.0)
+            self.assertEqual(sharded._shards(), [(0, 1)])    # Below min_shard_size
+            sharded.step(1.0)
+            self.assertGreater(sharded.get_lat_lon_alt(index)[1], 0.0)
+            self.assertEqual(sharded.get_fuel(index), 2.0)    # No consumption rate
+
+    def test_save_restore_state(self):
+        with ShardedEngine(3, initial_fuel=1.0) as engine:
+            first = engine.add_entity(10.0, 20.0, 30.0, yaw=90.0, speed=100.0)
+            state = engine.save_state()
+            engine.step(1.0)
+            engine.set_speed(first, 5.0)
+            second = engine.add_entity(0.0, 0.0, 0.0)
+            velocity = engine.get_ecef_velocities([first])[0]
+            self.assertAlmostEqual(np.linalg.norm(velocity), 5.0)
+
+            engine.restore_state(state)
+            self.assertEqual(len(engine), 1)
+            self.assertEqual(engine.get_speed(first), 100.0)
+            lat, lon, alt = engine.get_lat_lon_alt(first)
+            self.assertAlmostEqual(lat, 10.0)
+            self.assertAlmostEqual(lon, 20.0)
+            self.assertRaises(IndexError, engine.get_speed, second)
+            self.assertEqual(engine.add_entity(0.0, 0.0, 0.0), second)
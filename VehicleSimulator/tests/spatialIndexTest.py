@@ -0,0 +1,105 @@
+import threading
+import unittest
+
+import numpy as np
+
+from lib.entity.spatialIndex import SpatialIndex
+
+
+def _random_positions(count):
+    """ECEF positions on a 5 x 6 degrees patch of the Earth surface, up to 10 km high."""
+    lat = np.radians(np.random.uniform(40.0, 45.0, count))
+    lon = np.radians(np.random.uniform(-3.0, 3.0, count))
+    radius = 6378137.0 + np.random.uniform(0.0, 10000.0, count)
+    return np.column_stack((radius * np.cos(lat) * np.cos(lon),
+                            radius * np.cos(lat) * np.sin(lon),
+                            radius * np.sin(lat)))
+
+
+class TestSpatialIndex(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.count = 1500
+        self.ids = [(1, 1, i) for i in range(self.count)]
+        self.positions = _random_positions(self.count)
+        self.index = SpatialIndex(cell_size=10000.0, capacity=1)
+        self.index.update(self.ids, self.positions)
+
+    def _distances(self):
+        return np.linalg.norm(self.positions[:, None] - self.positions[None], axis=2)
+
+    def test_radius_and_knn(self):
+        distances = self._distances()
+        for i in range(50):
+            radius = np.random.uniform(1000.0, 40000.0)
+            result = self.index.query_radius(self.positions[i], radius)
+            expected = np.flatnonzero(distances[i] <= radius)
+            self.assertEqual(sorted(e[2] for e in result), sorted(expected.tolist()))
+
+            nearest, nearest_distances = self.index.query_knn(self.positions[i], 8)
+            self.assertEqual([e[2] for e in nearest], np.argsort(distances[i])[:8].tolist())
+            self.assertTrue(np.allclose(nearest_distances, np.sort(distances[i])[:8]))
+
+    def test_pairs(self):
+        radius = 5000.0
+        first, second, _ = self.index.query_pairs(radius)
+        rows = self.index.get_entity_ids()
+        found = {(rows[a][2], rows[b][2]) for a, b in zip(first, second)}
+        found = {(min(pair), max(pair)) for pair in found}
+        expected_first, expected_second = np.nonzero(np.triu(self._distances() <= radius, 1))
+        self.assertEqual(found, set(zip(expected_first.tolist(), expected_second.tolist())))
+        self.assertEqual(len(found), len(first))
+
+    def test_incremental_update(self):
+        moved = self.positions + np.random.normal(0.0, 3000.0, self.positions.shape)
+        self.index.update(self.ids, moved)
+        self.positions = moved
+        removed = self.ids[:100]
+        for entity_id in removed:
+            self.index.remove(entity_id)
+        self.ids = self.ids[100:]
+        self.positions = self.positions[100:]
+
+        for entity_id in removed:
+            self.assertNotIn(entity_id, self.index)
+        nearest, _ = self.index.query_knn(self.positions[0], 1)
+        self.assertEqual(nearest, [self.ids[0]])
+        self.test_pairs_after_sync()
+
+    def test_pairs_after_sync(self):
+        self.index.sync(self.ids, self.positions)
+        self.assertEqual(sorted(self.index.get_entity_ids()), sorted(self.ids))
+        first, second, distances = self.index.query_pairs(8000.0)
+        rows = self.index.get_entity_ids()
+        positions = self.index.get_positions()
+        self.assertTrue(np.all(distances <= 8000.0))
+        self.assertTrue(np.allclose(np.linalg.norm(positions[first] - positions[second], axis=1),
+                                    distances))
+        self.assertTrue(np.allclose(positions, self.index.get_positions(rows)))
+
+    def test_concurrent_updates(self):
+        """Queries from one thread while another moves, adds and removes entities."""
+        errors = []
+        done = threading.Event()
+
+        def writer():
+            try:
+                for i in range(200):
+                    moved = self.positions + np.random.normal(0.0, 3000.0, self.positions.shape)
+                    self.index.update(self.ids, moved)
+                    self.index.remove(self.ids[i])
+                    self.index.update([self.ids[i]], self.positions[i])
+            except Exception as error:    # Reported by the main thread
+                errors.append(error)
+            finally:
+                done.set()
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        while not done.is_set():
+            for entity_id in self.index.query_radius(self.positions[0], 20000.0):
+                self.assertIn(entity_id[2], range(self.count))
+            self.index.query_knn(self.positions[0], 8)
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.index), len(self.ids))
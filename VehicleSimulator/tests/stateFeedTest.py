@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import unittest
+
+import numpy as np
+
+from multiprocessing import shared_memory
+
+from lib.simulation.communication import stateFeed
+
+
+def _read_frames(name: str, frames: int, result) -> None:
+    """Read frames in another process, counting the torn ones (mixed values in a frame)."""
+    reader = stateFeed.StateFeedReader(name)
+    torn = read = 0
+    last = -1
+    while read < frames:
+        frame = reader.read()
+        if frame is None or frame.sequence == last or not len(frame.records):
+            continue
+        last = frame.sequence
+        marker = frame.records["location"][0, 0]
+        if frame.time != marker or np.any(frame.records["location"] != marker) or \
+                len(frame.records) != 100 + int(marker) % 50:
+            torn += 1
+        read += 1
+    reader.close()
+    result.value = torn
+
+
+class TestStateFeed(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.name = f"state_feed_test_{os.getpid()}"
+
+    def test_publish_read(self):
+        publisher = stateFeed.StateFeedPublisher(self.name, capacity=3)
+        reader = stateFeed.StateFeedReader(self.name)
+        self.assertEqual(reader.capacity, 3)
+        self.assertEqual(len(reader.read().records), 0)
+
+        entity_ids = [(1, 2, 3), (1, 2, 4)]
+        locations = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        orientations = np.array([[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]])
+        publisher.publish(entity_ids, locations, orientations, now=12.5)
+        frame = reader.read()
+        self.assertEqual(frame.sequence, publisher.sequence)
+        self.assertEqual(frame.sequence % 2, 0)
+        self.assertEqual(frame.time, 12.5)
+        self.assertEqual([tuple(ids) for ids in frame.records[["site", "application", "entity"]]
+                          .tolist()], entity_ids)
+        self.assertTrue(np.array_equal(frame.records["location"], locations))
+        self.assertTrue(np.array_equal(frame.records["orientation"], orientations))
+
+        publisher.publish(entity_ids * 2, np.vstack((locations,) * 2),
+                          np.vstack((orientations,) * 2))    # Over capacity
+        self.assertEqual(len(reader.read().records), 3)
+        self.assertTrue(publisher.truncated)
+
+        publisher._header["sequence"] += 1    # Publisher died while writing
+        self.assertIsNone(reader.read(max_retries=3))
+
+        reader.close()
+        publisher.close()
+        self.assertRaises(FileNotFoundError, stateFeed.StateFeedReader, self.name)
+
+        other = shared_memory.SharedMemory(name=self.name, create=True, size=128)
+        self.assertRaises(ValueError, stateFeed.StateFeedReader, self.name)
+        publisher = stateFeed.StateFeedPublisher(self.name, capacity=1)    # Replaces the block
+        self.assertEqual(stateFeed.StateFeedReader(self.name).capacity, 1)
+        other.close()
+        publisher.close()
+
+    def test_concurrent_reader(self):
+        frames = 200
+        publisher = stateFeed.StateFeedPublisher(self.name, capacity=200)
+        context = multiprocessing.get_context("spawn")
+        torn = context.Value("q", -1)
+        reader = context.Process(target=_read_frames, args=(self.name, frames, torn))
+        reader.start()
+        marker = 0
+        while reader.is_alive():
+            count = 100 + marker % 50
+            values = np.full((count, 3), float(marker))
+            publisher.publish([(1, 1, i) for i in range(count)], values, values, now=marker)
+            marker += 1
+        reader.join()
+        self.assertEqual(torn.value, 0)
+        self.assertGreater(marker, frames)
+        stateFeed.StateFeedReader(self.name).close()    # Reader exit did not unlink the block
+        publisher.close()
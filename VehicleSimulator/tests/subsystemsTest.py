@@ -0,0 +1,89 @@
+import unittest
+
+from lib.core import subsystems
+from lib.core.scheduler import Scheduler
+from lib.fuel.fuelManager import FuelManager
+from lib.kinematics.kinematicsManager import KinematicsManager
+
+from fakeClock import FakeClock
+
+
+class RecordingSubsystem(subsystems.Subsystem):
+    def __init__(self, name, clock, cost):
+        self.name = name
+        self.clock = clock
+        self.cost = cost
+        self.steps = []
+
+    def step(self, dt):
+        self.steps.append(dt)
+        self.clock.now += self.cost
+
+
+class TestSubsystems(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.clock = FakeClock(10.0)
+
+    def _run_for(self, scheduler, duration):
+        end = self.clock.now + duration
+        while self.clock.now < end - 1e-6:
+            self.clock.now += scheduler.run_pending()
+
+    def test_rates_and_timing(self):
+        scheduler = Scheduler(self.clock)
+        pipeline = subsystems.SubsystemPipeline(scheduler, self.clock)
+        kinematics = RecordingSubsystem("kinematics", self.clock, 0.001)
+        fuel = RecordingSubsystem("fuel", self.clock, 0.0)
+        sensors = RecordingSubsystem("sensors", self.clock, 0.02)    # Over its 10 ms budget
+        pipeline.register(kinematics, 60)
+        pipeline.register(fuel, 1)
+        pipeline.register(sensors, 10, budget=0.01)
+        self._run_for(scheduler, 5.0)
+
+        self.assertEqual(len(kinematics.steps), 300)
+        self.assertEqual(len(fuel.steps), 5)
+        self.assertEqual(len(sensors.steps), 50)
+        self.assertEqual(set(kinematics.steps), {1 / 60})    # Fixed time step
+        self.assertEqual(set(fuel.steps), {1.0})
+
+        stats = pipeline.get_stats()
+        self.assertAlmostEqual(stats["kinematics"]["mean_time"], 0.001)
+        self.assertAlmostEqual(stats["kinematics"]["load"], 0.06)
+        self.assertEqual(stats["kinematics"]["over_budget"], 0)
+        self.assertEqual(stats["sensors"]["over_budget"], 50)
+        self.assertAlmostEqual(stats["sensors"]["max_time"], 0.02)
+
+        pipeline.unregister("sensors")
+        self._run_for(scheduler, 1.0)
+        self.assertEqual(len(sensors.steps), 50)
+        self.assertNotIn("subsystem.sensors", scheduler.get_stats())
+
+    def test_vehicle_subsystems(self):
+        kinematics_system = KinematicsManager()
+        fuel_system = FuelManager()
+        kinematics_system.set_position(36.98, -7.93, 100.0)
+        kinematics_system.set_orientation(0.0, 0.0, 90.0)
+        kinematics_system.set_speed(100.0)
+        fuel_system.reset_fuel()
+
+        scheduler = Scheduler(self.clock)
+        pipeline = subsystems.SubsystemPipeline(scheduler, self.clock)
+        pipeline.register(subsystems.KinematicsSubsystem(kinematics_system), 60)
+        pipeline.register(subsystems.FuelSubsystem(fuel_system, kinematics_system), 1)
+        self._run_for(scheduler, 3.0)
+
+        lat, lon, alt = kinematics_system.get_lat_lon_alt()
+        self.assertAlmostEqual(lat, 36.98, places=4)
+        self.assertGreater(lon, -7.93 + 0.003)    # About 300 m east
+        consumed = fuel_system.initial_fuel_quantity - fuel_system.get_fuel_quantity()
+        self.assertAlmostEqual(consumed, fuel_system._consumption_rate * 0.3, places=6)
+
+    def test_abstract_subsystem(self):
+        class Incomplete(subsystems.Subsystem):
+            name = "incomplete"
+
+        with self.assertRaises(TypeError):
+            subsystems.Subsystem()
+        with self.assertRaises(TypeError):
+            Incomplete()    # step not implemented
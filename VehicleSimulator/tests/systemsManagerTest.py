@@ -0,0 +1,121 @@
+import math
+import sys
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from lib.core.systemsManager import SystemsManager
+from lib.kinematics.kinematicsManager import INITIAL_POSITION
+from lib.simulation.simulationManager import ExerciseStatus
+
+FLEET = [{"entity_id": 101, "lat": 40.0, "lon": -3.0, "heading": 90.0, "speed": 200.0}]
+
+
+class TestSystemsManager(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+
+    def test_terminate_restart(self):
+        manager = SystemsManager(start_threads=False)
+        state = manager.simulation_system.exercise_state
+        try:
+            manager.kinematics_system.set_speed(100.0)
+            state.set(ExerciseStatus.RUNNING)
+            manager.scheduler.run_pending()    # Frames right after a resume are due at once
+            self.assertEqual(manager.exercise_time, 1)
+
+            state.set(ExerciseStatus.TERMINATED)
+            manager.scheduler.run_calls()    # As the scheduler thread does while paused
+            self.assertEqual(manager.exercise_time, 0)
+            lat, lon, alt = manager.kinematics_system.get_lat_lon_alt()
+            self.assertAlmostEqual(lat, INITIAL_POSITION[0], places=9)
+            self.assertAlmostEqual(lon, INITIAL_POSITION[1], places=9)
+            self.assertAlmostEqual(alt, INITIAL_POSITION[2], places=3)
+
+            state.set(ExerciseStatus.RUNNING)
+            manager.scheduler.run_pending()
+            stats = manager.scheduler.get_stats()
+            self.assertEqual(stats["subsystem.kinematics"]["frames"], 2)
+            self.assertEqual(sum(task["errors"] for task in stats.values()), 0)
+            self.assertEqual(manager.kinematics_system.get_speed(), 0.0)    # Cleared, not moving
+            self.assertAlmostEqual(manager.kinematics_system.get_lat_lon_alt()[0],
+                                   INITIAL_POSITION[0], places=9)
+        finally:
+            state.set(ExerciseStatus.TERMINATED)
+            manager.simulation_system.multicast_manager.sock.close()
+            manager.close()
+
+    def test_terminate_while_running(self):
+        """Terminating from another thread never hands a cleared own entity to a running frame."""
+        manager = SystemsManager(start_threads=False)
+        state = manager.simulation_system.exercise_state
+        thread = threading.Thread(target=manager.scheduler.run)
+        reset_threads = set()
+        reset = manager.kinematics_system.reset
+
+        def recording_reset():
+            reset_threads.add(threading.current_thread())
+            reset()
+        manager.kinematics_system.reset = recording_reset
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)    # Switch threads often, inside the reset too
+        thread.start()
+        try:
+            for i in range(1000):
+                manager.scheduler.call_soon(lambda: manager.kinematics_system.set_speed(300.0))
+                state.set(ExerciseStatus.RUNNING)    # Runs a frame at once, on the other thread
+                if i % 100 == 0:
+                    time.sleep(0.05)    # A few 60 Hz kinematics frames
+                state.set(ExerciseStatus.TERMINATED)
+            manager.scheduler.call_soon(manager.scheduler.stop)    # After the last reset
+            thread.join(5.0)
+            self.assertFalse(thread.is_alive())
+
+            self.assertEqual(reset_threads, {thread})    # Serialized with the frames
+            stats = manager.scheduler.get_stats()
+            self.assertGreater(stats["subsystem.kinematics"]["frames"], 10)
+            self.assertEqual(sum(task["errors"] for task in stats.values()), 0)
+            lat, lon, alt = manager.kinematics_system.get_lat_lon_alt()
+            self.assertFalse(math.isnan(lat))
+            self.assertAlmostEqual(lat, INITIAL_POSITION[0], places=9)
+            self.assertAlmostEqual(lon, INITIAL_POSITION[1], places=9)
+        finally:
+            sys.setswitchinterval(switch_interval)
+            manager.scheduler.stop()
+            thread.join()
+            manager.simulation_system.multicast_manager.sock.close()
+            manager.close()
+
+    def test_fleet(self):
+        manager = SystemsManager(start_threads=False)
+        state = manager.simulation_system.exercise_state
+        own_entity = [{"entity_id": manager.simulation_system.entity_id, "lat": 0.0, "lon": 0.0}]
+        self.assertRaises(ValueError, manager.create_fleet, own_entity)
+        self.assertIsNone(manager.fleet)
+        try:
+            manager.create_fleet(FLEET, workers=1, rate=10.0)
+            fleet = manager.fleet
+            self.assertEqual(manager.simulation_system.fleet, fleet)
+            _, start, _ = fleet.snapshot()
+            entity_ids, locations, _ = manager._entity_states()
+            self.assertEqual(entity_ids[-2:], [fleet.entity_ids[0], (
+                manager.simulation_system.site_id, manager.simulation_system.application_id,
+                manager.simulation_system.entity_id)])    # Fleet, then own entity last
+            self.assertTrue(np.array_equal(locations[-2], start[0]))
+
+            state.set(ExerciseStatus.RUNNING)
+            manager.scheduler.run_pending()    # Frames right after a resume are due at once
+            self.assertEqual(manager.scheduler.get_stats()["subsystem.fleet"]["frames"], 1)
+            _, stepped, _ = fleet.snapshot()
+            self.assertAlmostEqual(np.linalg.norm(stepped[0] - start[0]), 20.0, delta=0.1)
+
+            state.set(ExerciseStatus.TERMINATED)
+            manager.scheduler.run_calls()
+            self.assertTrue(np.array_equal(fleet.snapshot()[1], start))
+        finally:
+            state.set(ExerciseStatus.TERMINATED)
+            manager.simulation_system.multicast_manager.sock.close()
+            manager.close()
+        self.assertFalse(any(process.is_alive() for process in fleet.engine._processes))
@@ -1,4 +1,26 @@
+import acknowledgeTest
+import asyncMulticastManagerTest
+import deadReckoningTest
+import entityStoreTest
+import espduEncoderTest
+import fleetTest
+import geodesyTest
+import kinematicsEngineTest
 import kinematicsManagerTest
+import logUtilsTest
+import metricsTest
+import multicastManagerTest
+import pduCaptureTest
+import pduFilterTest
+import pduPreFilterTest
+import remoteEntityTableTest
+import schedulerTest
+import shardedEngineTest
+import spatialIndexTest
+import stateFeedTest
+import subsystemsTest
+import systemsManagerTest
+import trafficGeneratorTest
 
 def run_kinematics_tests():
     test = kinematicsManagerTest.TestKinematicsManager()
@@ -12,3 +34,243 @@ def run_kinematics_tests():
     print("Set speed test passed. OK")
     test.test_process_kinematics
     print("Process kinematics test passed. OK")
+    test.test_geodetic_cache()
+    print("Cached geodetic state tests passed. OK")
+    test.test_dead_reckoning_rates()
+    print("Dead reckoning rates tests passed. OK")
+
+
+def run_kinematics_engine_tests():
+    test = kinematicsEngineTest.TestKinematicsEngine()
+    test.test_step_matches_scalar_path()
+    print("Batch step vs scalar path tests passed. OK")
+    test.test_engine_steps_store_rows()
+    print("Engine step of store rows tests passed. OK")
+
+
+def run_sharded_engine_tests():
+    test = shardedEngineTest.TestShardedEngine()
+    test.test_add_remove_entity()
+    print("Add/remove entity tests passed. OK")
+    test.test_step_matches_engine()
+    print("Sharded step vs single process engine tests passed. OK")
+    test.test_small_fleet_steps_inline()
+    print("Sharded small fleet tests passed. OK")
+    test.test_save_restore_state()
+    print("Sharded engine state save/restore tests passed. OK")
+
+
+def run_fleet_tests():
+    test = fleetTest.TestFleet()
+    test.test_step_reset()
+    print("Fleet step and reset tests passed. OK")
+    test.test_espdus()
+    print("Fleet ESPDU round robin tests passed. OK")
+    test.test_loopback_ignored()
+    print("Fleet ESPDU loopback tests passed. OK")
+
+
+def run_entity_store_tests():
+    test = entityStoreTest.TestEntityStore()
+    test.test_add_remove_entity()
+    print("Add/remove entity tests passed. OK")
+    test.test_fuel_consumption()
+    print("Fleet fuel consumption tests passed. OK")
+    test.test_set_data()
+    print("Set data from ESPDU tests passed. OK")
+    test.test_kinematics_by_entity_id()
+    print("Kinematics by entity ID tests passed. OK")
+
+
+def run_espdu_encoder_tests():
+    test = espduEncoderTest.TestEntityStatePduEncoder()
+    test.test_byte_identical()
+    print("Byte-identical encoding tests passed. OK")
+    test.test_dynamic_fields_only()
+    print("Dynamic fields encoding tests passed. OK")
+    test.test_round_trip()
+    print("Encode/decode round trip tests passed. OK")
+    test.test_static_update_during_send()
+    print("Static fields updated during send tests passed. OK")
+    test.test_dead_reckoning_parameters()
+    print("ESPDU dead reckoning parameters tests passed. OK")
+
+
+def run_dead_reckoning_tests():
+    test = deadReckoningTest.TestDeadReckoning()
+    test.test_euler_matrix_round_trip()
+    print("Euler/matrix round trip tests passed. OK")
+    test.test_world_algorithms()
+    print("World coordinates algorithms tests passed. OK")
+    test.test_rotating_body_algorithms()
+    print("Rotating body coordinates algorithms tests passed. OK")
+    test.test_batch_matches_single()
+    print("Batch vs single extrapolation tests passed. OK")
+    test.test_thresholds()
+    print("Threshold emission tests passed. OK")
+    test.test_check_rates()
+    print("Dead reckoning check and heartbeat rates tests passed. OK")
+
+
+def run_remote_entity_table_tests():
+    test = remoteEntityTableTest.TestRemoteEntityTable()
+    test.test_extrapolate()
+    print("Remote entity extrapolation tests passed. OK")
+    test.test_expire()
+    print("Remote entity expiry tests passed. OK")
+    test.test_spatial_index()
+    print("Remote entity spatial index tests passed. OK")
+
+
+def run_spatial_index_tests():
+    test = spatialIndexTest.TestSpatialIndex()
+    test.test_radius_and_knn()
+    print("Radius and nearest neighbour query tests passed. OK")
+    test.test_pairs()
+    print("Proximity pairs tests passed. OK")
+    test.test_incremental_update()
+    print("Incremental update tests passed. OK")
+    test.test_concurrent_updates()
+    print("Concurrent update and query tests passed. OK")
+
+
+def run_scheduler_tests():
+    test = schedulerTest.TestScheduler()
+    test.test_no_drift()
+    print("Drift-free cadence tests passed. OK")
+    test.test_periods()
+    print("Per-task period tests passed. OK")
+    test.test_overrun_policies()
+    print("Overrun policy tests passed. OK")
+    test.test_failing_task()
+    print("Failing task isolation tests passed. OK")
+    test.test_pause_resume()
+    print("Pause/resume on exercise state tests passed. OK")
+    test.test_call_soon()
+    print("One-shot calls on the scheduler thread tests passed. OK")
+
+
+def run_log_utils_tests():
+    test = logUtilsTest.TestLogUtils()
+    test.test_lazy_dump()
+    print("Lazy PDU dump tests passed. OK")
+    test.test_rate_limit()
+    print("Debug rate limit tests passed. OK")
+
+
+def run_pdu_capture_tests():
+    test = pduCaptureTest.TestPduCapture()
+    test.test_round_trip_and_seek()
+    print("Capture round trip and seek tests passed. OK")
+    test.test_replay_speed()
+    print("Replay speed tests passed. OK")
+    test.test_truncated_capture()
+    print("Truncated capture tests passed. OK")
+
+
+def run_traffic_generator_tests():
+    test = trafficGeneratorTest.TestTrafficGenerator()
+    test.test_match_ratio_and_mix()
+    print("Generated traffic match ratio and mix tests passed. OK")
+    test.test_rate()
+    print("Generated traffic rate tests passed. OK")
+
+
+def run_async_multicast_manager_tests():
+    test = asyncMulticastManagerTest.TestAsyncMulticastManager()
+    test.test_loopback_round_trip()
+    print("asyncio transport loopback round trip tests passed. OK")
+
+
+def run_multicast_manager_tests():
+    test = multicastManagerTest.TestMulticastManager()
+    test.test_receive_burst()
+    print("Burst receive tests passed. OK")
+    test.test_truncated_datagrams()
+    print("Truncated datagram tests passed. OK")
+    test.test_kernel_drops()
+    print("Kernel drop counter tests passed. OK")
+    test.test_undecodable_datagrams()
+    print("Undecodable datagram tests passed. OK")
+
+
+def run_pdu_filter_tests():
+    test = pduFilterTest.TestPduFilterSet()
+    test.test_exact_match()
+    print("PDU filter exact match tests passed. OK")
+    test.test_wildcards()
+    print("PDU filter wildcard tests passed. OK")
+    test.test_non_id_pdu_types()
+    print("PDU filter non entity PDU types tests passed. OK")
+    test.test_empty_filter()
+    print("Empty PDU filter tests passed. OK")
+
+
+def run_pdu_pre_filter_tests():
+    test = pduPreFilterTest.TestPduPreFilter()
+    test.test_agrees_with_can_process_pdu()
+    print("Pre-filter agrees with decoded PDU filter tests passed. OK")
+    test.test_non_entity_pdu_types()
+    print("Pre-filter non entity PDU types tests passed. OK")
+    test.test_malformed_headers()
+    print("Pre-filter malformed header tests passed. OK")
+    test.test_truncated_entity_id()
+    print("Pre-filter truncated entity ID tests passed. OK")
+
+
+def run_geodesy_tests():
+    test = geodesyTest.TestGeodesy()
+    test.test_lla_ecef()
+    print("Batch LLA/ECEF vs opendis tests passed. OK")
+    test.test_closed_form_accuracy()
+    print("Closed-form ECEF to LLA accuracy tests passed. OK")
+    test.test_local_frames()
+    print("NED/ENU local frame vs opendis tests passed. OK")
+    test.test_great_circle_destination()
+    print("Batch great-circle destination tests passed. OK")
+
+
+def run_state_feed_tests():
+    test = stateFeedTest.TestStateFeed()
+    test.test_publish_read()
+    print("State feed publish/read tests passed. OK")
+    test.test_concurrent_reader()
+    print("State feed concurrent reader tests passed. OK")
+
+
+def run_metrics_tests():
+    test = metricsTest.TestMetrics()
+    test.test_exposition()
+    print("Prometheus exposition tests passed. OK")
+    test.test_http_endpoint()
+    print("Metrics HTTP endpoint tests passed. OK")
+    test.test_timed_lock()
+    print("Timed lock tests passed. OK")
+    test.test_receive_path_counters()
+    print("Receive path counters tests passed. OK")
+
+
+def run_acknowledge_tests():
+    test = acknowledgeTest.TestAcknowledge()
+    test.test_acknowledge()
+    print("Acknowledge PDU tests passed. OK")
+
+
+def run_subsystems_tests():
+    test = subsystemsTest.TestSubsystems()
+    test.test_rates_and_timing()
+    print("Subsystem pipeline rates and timing tests passed. OK")
+    test.test_vehicle_subsystems()
+    print("Kinematics and fuel subsystems tests passed. OK")
+    test.test_abstract_subsystem()
+    print("Abstract subsystem tests passed. OK")
+
+
+def run_systems_manager_tests():
+    test = systemsManagerTest.TestSystemsManager()
+    test.test_terminate_restart()
+    print("Terminate and restart exercise tests passed. OK")
+    test.test_terminate_while_running()
+    print("Terminate while kinematics runs tests passed. OK")
+    test.test_fleet()
+    print("Fleet stepping, state feed and reset tests passed. OK")
@@ -0,0 +1,48 @@
+import collections
+import unittest
+
+from opendis.PduFactory import createPdu
+
+from lib.simulation.communication.pduPreFilter import PduPreFilter
+from lib.simulation.communication.trafficGenerator import TrafficGenerator, parse_mix
+from lib.utils.pduFilter import PduFilterSet
+
+from fakeClock import FakeClock
+
+
+class TestTrafficGenerator(unittest.TestCase):
+    def __init__(self):
+        super().__init__()
+        self.filters = [{"exercise_id": 1, "application_id": 1, "site_id": 1},
+                        {"exercise_id": 3, "application_id": 0, "site_id": 0}]    # Any app/site
+        self.generator = TrafficGenerator(self.filters, entity_count=50, match_ratio=0.3,
+                                          mix=parse_mix("espdu=0.8,start_resume=0.1,stop_freeze=0.1"),
+                                          exclude_entity=7, pool_size=4000)
+
+    def test_match_ratio_and_mix(self):
+        pre_filter = PduPreFilter(PduFilterSet.from_json(self.filters).matches)
+        accepted = sum(pre_filter.accept(data) for data in self.generator.datagrams)
+        self.assertEqual(accepted, self.generator.matching)
+        self.assertAlmostEqual(accepted / 4000, 0.3, delta=0.03)
+
+        pdus = [createPdu(data) for data in self.generator.datagrams]
+        kinds = collections.Counter(pdu.pduType for pdu in pdus)
+        self.assertAlmostEqual(kinds[1] / 4000, 0.8, delta=0.03)
+        self.assertAlmostEqual(kinds[13] / 4000, 0.1, delta=0.03)
+        self.assertAlmostEqual(kinds[14] / 4000, 0.1, delta=0.03)
+        for pdu in pdus:
+            if pdu.pduType == 1:
+                self.assertNotEqual(pdu.entityID.entityID, 7)
+            elif pdu.pduType == 14:
+                self.assertNotEqual(pdu.reason, 2)    # Must not terminate the receiver
+        with self.assertRaises(ValueError):
+            parse_mix("espdu=1,fire=1")
+
+    def test_rate(self):
+        clock = FakeClock()
+        sent = []
+        count = self.generator.run(sent.append, rate=2500, duration=2.0, clock=clock,
+                                   sleep=clock.sleep)
+        self.assertEqual(count, len(sent))
+        self.assertAlmostEqual(count, 5000, delta=1)
+        self.assertEqual(sent[:10], self.generator.datagrams[:10])